@@ -0,0 +1,127 @@
+"""
+Admission control: bounded concurrency and queueing per route and backend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, Dict
+
+from app.config import Settings
+from app.services.exceptions import OverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimiter:
+    """
+    Semaphore with a bounded wait queue.
+
+    Callers beyond ``max_concurrent`` wait for a slot, but at most
+    ``max_queue`` of them and for at most ``queue_timeout`` seconds; anyone
+    else is rejected immediately with ``OverloadedError``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        *,
+        max_queue: int | None = None,
+        queue_timeout: float = 1.0,
+        retry_after: int = 1,
+    ) -> None:
+        self.name = name
+        self._max_concurrent = max_concurrent
+        self._max_queue = max_concurrent if max_queue is None else max_queue
+        self._queue_timeout = queue_timeout
+        self._retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked():
+            if self.waiting >= self._max_queue:
+                self.rejected += 1
+                raise OverloadedError(self.name, self._retry_after)
+            self.waiting += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self._queue_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise OverloadedError(self.name, self._retry_after) from None
+            finally:
+                self.waiting -= 1
+                waited = time.monotonic() - started
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self._max_concurrent,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+class AdmissionController:
+    """Named limiters configured from ``Settings.admission_limits``."""
+
+    def __init__(self, settings: Settings) -> None:
+        self._limiters: Dict[str, ConcurrencyLimiter] = {
+            name: ConcurrencyLimiter(
+                name,
+                limit,
+                max_queue=settings.admission_queue_limits.get(name),
+                queue_timeout=settings.admission_queue_timeout,
+                retry_after=settings.admission_retry_after,
+            )
+            for name, limit in settings.admission_limits.items()
+        }
+
+    def get(self, name: str) -> ConcurrencyLimiter | None:
+        """Return the limiter for ``name`` or None when it is unlimited."""
+        return self._limiters.get(name)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+def limiter_slot(
+    limiter: ConcurrencyLimiter | None,
+) -> contextlib.AbstractAsyncContextManager[None]:
+    """``limiter.slot()`` or a no-op context when no limit is configured."""
+    if limiter is None:
+        return contextlib.nullcontext()
+    return limiter.slot()
@@ -0,0 +1,338 @@
+"""
+Durable audit trail of security events and their policy decisions.
+
+``OPAClient`` hands every evaluated event to an ``AuditLog``, which only
+appends it to a bounded in-memory ring buffer. A background task drains the
+buffer in batches to a sink: rotating gzip-compressed JSON Lines files or a
+Postgres table loaded with ``COPY``. Serialisation and I/O never run on the
+request path.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Literal, Protocol, Sequence
+
+import asyncpg  # type: ignore[import-untyped]
+
+logger = logging.getLogger(__name__)
+
+OverflowPolicy = Literal["drop_newest", "drop_oldest", "block"]
+
+
+class AuditRecord:
+    """One evaluated event: the policy input exactly as sent, plus the outcome."""
+
+    __slots__ = ("timestamp", "policy_path", "event", "allow", "reason")
+
+    def __init__(
+        self,
+        timestamp: float,
+        policy_path: str,
+        event: Dict[str, Any],
+        allow: bool,
+        reason: str | None,
+    ) -> None:
+        self.timestamp = timestamp
+        self.policy_path = policy_path
+        self.event = event
+        self.allow = allow
+        self.reason = reason
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The event with its ``decision`` filled in, as ``with_decision`` does."""
+        return {
+            "ts": datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat(),
+            "policy": self.policy_path.strip("/"),
+            "event": {
+                **self.event,
+                "decision": {"allow": self.allow, "reason": self.reason},
+            },
+        }
+
+
+class AuditSink(Protocol):
+    """Destination for batches of audit records."""
+
+    async def write(self, records: Sequence[AuditRecord]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class JSONLFileSink:
+    """
+    Appends batches to ``<directory>/<prefix>-<UTC time>.jsonl.gz``.
+
+    Every batch is written as its own gzip member, so a file is readable with
+    ``zcat`` up to the last completed batch even after a crash. A new file is
+    started once the current one reaches ``max_bytes`` or ``max_age`` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        prefix: str = "audit",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._directory = directory
+        self._prefix = prefix
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._clock = clock
+        self._path: str | None = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self.files = 0
+
+    @property
+    def path(self) -> str | None:
+        """File currently being appended to."""
+        return self._path
+
+    def _rotate(self) -> str:
+        now = self._clock()
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime("%Y%m%dT%H%M%S")
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, f"{self._prefix}-{stamp}.jsonl.gz")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(
+                self._directory, f"{self._prefix}-{stamp}-{suffix}.jsonl.gz"
+            )
+            suffix += 1
+        self._path, self._opened_at, self._size = path, now, 0
+        self.files += 1
+        return path
+
+    def _write(self, records: Sequence[AuditRecord]) -> None:
+        payload = "".join(
+            json.dumps(record.as_dict(), separators=(",", ":")) + "\n"
+            for record in records
+        ).encode()
+        path = self._path
+        if (
+            path is None
+            or self._size >= self._max_bytes
+            or self._clock() - self._opened_at >= self._max_age
+        ):
+            path = self._rotate()
+        member = gzip.compress(payload, compresslevel=6)
+        with open(path, "ab") as handle:
+            handle.write(member)
+        self._size += len(member)
+
+    async def write(self, records: Sequence[AuditRecord]) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._write, records)
+
+    async def close(self) -> None:
+        self._path = None
+
+
+class PostgresCopySink:
+    """Loads batches into an audit table with ``COPY`` (one round-trip each)."""
+
+    _COLUMNS = ("ts", "policy", "allow", "reason", "event")
+
+    def __init__(self, dsn: str, table: str = "asb_audit_events") -> None:
+        self._dsn = dsn
+        self._table = table
+        self._connection: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> asyncpg.Connection:
+        if self._connection is None or self._connection.is_closed():
+            connection = await asyncpg.connect(dsn=self._dsn)
+            await connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "id BIGSERIAL PRIMARY KEY, ts TIMESTAMPTZ NOT NULL, "
+                "policy TEXT NOT NULL, allow BOOLEAN NOT NULL, reason TEXT, "
+                "event JSONB NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    async def write(self, records: Sequence[AuditRecord]) -> None:
+        rows = [
+            (
+                datetime.fromtimestamp(record.timestamp, timezone.utc),
+                record.policy_path.strip("/"),
+                record.allow,
+                record.reason,
+                json.dumps(record.as_dict()["event"]),
+            )
+            for record in records
+        ]
+        async with self._lock:
+            connection = await self._connect()
+            try:
+                await connection.copy_records_to_table(
+                    self._table, records=rows, columns=self._COLUMNS
+                )
+            except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+                await connection.close()
+                self._connection = None
+                raise
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class AuditLog:
+    """
+    Bounded buffer of audit records flushed to ``sink`` in the background.
+
+    ``record`` is O(1). When ``capacity`` records are waiting, ``overflow``
+    decides what gives: ``drop_newest`` discards the incoming record,
+    ``drop_oldest`` the oldest buffered one, and ``block`` makes the caller
+    wait up to ``block_timeout`` seconds for the flusher before dropping.
+    A batch is written every ``flush_interval`` seconds, or as soon as
+    ``batch_size`` records are buffered. ``close`` drains everything.
+    """
+
+    def __init__(
+        self,
+        sink: AuditSink,
+        *,
+        capacity: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: OverflowPolicy = "drop_newest",
+        block_timeout: float = 0.05,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._sink = sink
+        self._capacity = capacity
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._overflow = overflow
+        self._block_timeout = block_timeout
+        self._clock = clock
+        self._buffer: Deque[AuditRecord] = deque()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def sink(self) -> AuditSink:
+        return self._sink
+
+    def start(self) -> None:
+        """Start the background flusher on the running loop."""
+        if self._task is None:
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def record(
+        self,
+        policy_path: str,
+        event: Dict[str, Any],
+        allow: bool,
+        reason: str | None = None,
+    ) -> bool:
+        """Buffer one decision; returns False when it was dropped."""
+        buffer = self._buffer
+        if len(buffer) >= self._capacity:
+            if self._overflow == "drop_oldest":
+                buffer.popleft()
+                self.dropped += 1
+            elif self._overflow == "block" and self._task is not None:
+                self.blocked += 1
+                if not await self._wait_for_room():
+                    self.dropped += 1
+                    return False
+            else:
+                self.dropped += 1
+                return False
+        buffer.append(AuditRecord(self._clock(), policy_path, event, allow, reason))
+        self.enqueued += 1
+        if len(buffer) >= self._batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _wait_for_room(self) -> bool:
+        self._wakeup.set()
+        deadline = time.monotonic() + self._block_timeout
+        while len(self._buffer) >= self._capacity:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer and not self._closed:
+                await self._flush_batch()
+
+    async def _flush_batch(self) -> None:
+        buffer = self._buffer
+        batch = [buffer.popleft() for _ in range(min(self._batch_size, len(buffer)))]
+        self._drained.set()
+        try:
+            await self._sink.write(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.warning("Dropped %d audit records", len(batch), exc_info=True)
+        else:
+            self.written += len(batch)
+            self.batches += 1
+
+    async def flush(self) -> None:
+        """Write out everything buffered so far."""
+        while self._buffer:
+            await self._flush_batch()
+
+    async def close(self) -> None:
+        """Stop the flusher, drain the buffer and close the sink."""
+        self._closed = True
+        task, self._task = self._task, None
+        if task is not None:
+            self._wakeup.set()
+            try:
+                await task
+            except Exception:
+                logger.warning("Audit flusher failed", exc_info=True)
+        await self.flush()
+        await self._sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self._capacity,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
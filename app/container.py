@@ -2,22 +2,249 @@
 Simple dependency container helpers for FastAPI dependencies.
 """
 
+import logging
+import time
 from functools import lru_cache
+from typing import AsyncIterator, Callable
 
+from fastapi import Depends, Header
+
+from app import metrics
+from app.admission import AdmissionController, limiter_slot
+from app.audit import AuditLog, AuditSink, JSONLFileSink, PostgresCopySink
 from app.config import Settings, get_settings
-from app.opa_client import OPAClient
+from app.embeddings import (
+    Embedder,
+    EmbeddingProvider,
+    LocalEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+)
+from app.idempotency import IdempotencyStore
+from app.opa_client import HTTPPolicyBackend, OPAClient, PolicyBackend
+from app.policy_cache import PolicyDecisionCache
+from app.policy_engine import EmbeddedPolicyBackend
+from app.policy_resilience import CircuitBreaker, ResilientPolicyBackend
+from app.rag_cache import RAGResultCache
+from app.rate_limit import (
+    BucketBackend,
+    MemoryBucketBackend,
+    PostgresBucketBackend,
+    RateLimiter,
+    TenantQuota,
+)
+from app.response_cache import (
+    MemoryResponseStore,
+    ResponseCache,
+    ResponseStore,
+    SQLiteResponseStore,
+)
 from app.services.agent_service import AgentService
 from app.services.rag_service import RAGService
+from app.singleflight import SingleFlight
+from app.upstream import UpstreamClientPool
+from app.vector_index import load_index
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache
+def get_admission() -> AdmissionController:
+    return AdmissionController(get_settings())
+
+
+def admission_slot(name: str) -> Callable[[], AsyncIterator[None]]:
+    """FastAPI dependency holding a slot of the ``name`` limiter per request."""
+
+    async def dependency(
+        admission: AdmissionController = Depends(get_admission),
+    ) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        async with limiter_slot(admission.get(name)):
+            metrics.observe_dependency("admission", time.perf_counter() - started)
+            yield
+
+    return dependency
+
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter | None:
+    settings = get_settings()
+    backend: BucketBackend
+    if settings.rate_limit_backend == "postgres":
+        backend = PostgresBucketBackend(settings.database_url)
+    else:
+        backend = MemoryBucketBackend()
+    limiter = RateLimiter(settings, backend)
+    return limiter if limiter.enabled else None
+
+
+async def get_tenant_quota(
+    user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
+    limiter: RateLimiter | None = Depends(get_rate_limiter),
+) -> TenantQuota | None:
+    """FastAPI dependency shedding over-limit tenants before any backend call."""
+    if limiter is None:
+        return None
+    started = time.perf_counter()
+    try:
+        return await limiter.admit(user_id)
+    finally:
+        metrics.observe_dependency("rate_limit", time.perf_counter() - started)
+
+
+async def get_llm_tenant_quota(
+    user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
+    limiter: RateLimiter | None = Depends(get_rate_limiter),
+) -> TenantQuota | None:
+    """``get_tenant_quota`` that also enforces the tenant's LLM token budget."""
+    if limiter is None:
+        return None
+    started = time.perf_counter()
+    try:
+        return await limiter.admit(user_id, llm=True)
+    finally:
+        metrics.observe_dependency("rate_limit", time.perf_counter() - started)
+
+
+@lru_cache
+def get_audit_log() -> AuditLog | None:
+    settings = get_settings()
+    sink: AuditSink
+    if settings.audit_backend == "file":
+        sink = JSONLFileSink(
+            settings.audit_path,
+            max_bytes=settings.audit_rotate_bytes,
+            max_age=settings.audit_rotate_seconds,
+        )
+    elif settings.audit_backend == "postgres":
+        sink = PostgresCopySink(settings.database_url, settings.audit_table)
+    else:
+        return None
+    return AuditLog(
+        sink,
+        capacity=settings.audit_buffer_size,
+        batch_size=settings.audit_batch_size,
+        flush_interval=settings.audit_flush_interval,
+        overflow=settings.audit_overflow,
+        block_timeout=settings.audit_block_timeout,
+    )
 
 
 @lru_cache
 def get_opa_client() -> OPAClient:
-    return OPAClient(get_settings().opa_url)
+    settings = get_settings()
+    cache = None
+    if settings.opa_cache_policies:
+        cache = PolicyDecisionCache(
+            settings.opa_cache_policies,
+            max_entries=settings.opa_cache_max_entries,
+            ttl_seconds=settings.opa_cache_ttl,
+        )
+    backend: PolicyBackend
+    if settings.policy_backend == "embedded":
+        backend = EmbeddedPolicyBackend()
+    else:
+        backend = ResilientPolicyBackend(
+            HTTPPolicyBackend(
+                settings.opa_url,
+                max_connections=settings.opa_max_connections,
+                max_keepalive_connections=settings.opa_max_keepalive_connections,
+                keepalive_expiry=settings.opa_keepalive_expiry,
+                timeout=settings.opa_timeout,
+                connect_timeout=settings.opa_connect_timeout,
+            ),
+            fail_modes=settings.opa_fail_modes,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.opa_breaker_failure_threshold,
+                reset_timeout=settings.opa_breaker_reset_timeout,
+            ),
+            retries=settings.opa_retries,
+            retry_backoff=settings.opa_retry_backoff,
+            max_timeout=settings.opa_timeout,
+            min_timeout=settings.opa_timeout_min,
+            timeout_multiplier=settings.opa_timeout_multiplier,
+            hedge=settings.opa_hedge,
+        )
+    return OPAClient(
+        settings.opa_url,
+        cache=cache,
+        limiter=get_admission().get("opa"),
+        backend=backend,
+        audit=get_audit_log(),
+    )
+
+
+@lru_cache
+def get_upstream_pool() -> UpstreamClientPool:
+    return UpstreamClientPool(get_settings(), limiter=get_admission().get("upstream"))
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache | None:
+    settings = get_settings()
+    store: ResponseStore
+    if settings.llm_cache_backend == "memory":
+        store = MemoryResponseStore(
+            settings.llm_cache_max_entries, settings.llm_cache_ttl
+        )
+    elif settings.llm_cache_backend == "sqlite":
+        store = SQLiteResponseStore(
+            settings.llm_cache_path,
+            settings.llm_cache_max_entries,
+            settings.llm_cache_ttl,
+        )
+    else:
+        return None
+    return ResponseCache(store)
+
+
+@lru_cache
+def get_llm_flights() -> SingleFlight | None:
+    settings = get_settings()
+    if not settings.llm_coalesce_requests:
+        return None
+    return SingleFlight(max_waiters=settings.llm_coalesce_max_waiters)
+
+
+@lru_cache
+def get_embedder() -> Embedder:
+    settings = get_settings()
+    provider: EmbeddingProvider
+    if settings.embedding_backend == "openai":
+        provider = OpenAIEmbeddingProvider(settings, get_upstream_pool())
+    else:
+        provider = LocalEmbeddingProvider(settings.embedding_dimensions)
+    return Embedder(
+        provider,
+        max_entries=settings.embedding_cache_size,
+        batch_size=settings.embedding_batch_size,
+        batch_wait=settings.embedding_batch_wait,
+    )
 
 
 @lru_cache
 def get_rag_service() -> RAGService:
-    return RAGService(get_settings(), get_opa_client())
+    settings = get_settings()
+    result_cache = None
+    if settings.rag_cache_enabled:
+        result_cache = RAGResultCache(
+            max_entries=settings.rag_cache_max_entries,
+            ttl_seconds=settings.rag_cache_ttl,
+        )
+    local_index = None
+    if settings.rag_local_index_path:
+        try:
+            local_index = load_index(settings.rag_local_index_path)
+        except (OSError, ValueError) as exc:
+            logger.warning("RAG local index not loaded: %s", exc)
+    return RAGService(
+        settings,
+        get_opa_client(),
+        db_limiter=get_admission().get("postgres"),
+        embedder=get_embedder(),
+        result_cache=result_cache,
+        local_index=local_index,
+    )
 
 
 @lru_cache
@@ -25,5 +252,24 @@ def get_agent_service() -> AgentService:
     return AgentService(get_settings(), get_opa_client())
 
 
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore | None:
+    settings = get_settings()
+    store: ResponseStore
+    if settings.agent_idempotency_backend == "memory":
+        store = MemoryResponseStore(
+            settings.agent_idempotency_max_entries, settings.agent_idempotency_ttl
+        )
+    elif settings.agent_idempotency_backend == "sqlite":
+        store = SQLiteResponseStore(
+            settings.agent_idempotency_path,
+            settings.agent_idempotency_max_entries,
+            settings.agent_idempotency_ttl,
+        )
+    else:
+        return None
+    return IdempotencyStore(store)
+
+
 def get_config() -> Settings:
     return get_settings()
@@ -0,0 +1,194 @@
+"""
+Query embedding for RAG: pluggable providers, micro-batching and an LRU cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Protocol, Sequence, Set
+
+from app import metrics
+from app.admission import limiter_slot
+from app.config import Settings
+from app.upstream import UpstreamClientPool
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(Protocol):
+    """Turns a batch of texts into float32 vectors, in order."""
+
+    async def embed(self, texts: Sequence[str]) -> List[array]: ...
+
+    async def close(self) -> None: ...
+
+
+class LocalEmbeddingProvider:
+    """Deterministic toy embedding based on character codes; no model needed."""
+
+    def __init__(self, dimensions: int = 6) -> None:
+        self._dimensions = dimensions
+
+    async def embed(self, texts: Sequence[str]) -> List[array]:
+        return [self.embed_one(text) for text in texts]
+
+    def embed_one(self, text: str) -> array:
+        dims = self._dimensions
+        values = array("f", bytes(4 * dims))
+        for index, ch in enumerate(text[: dims * 4]):
+            values[index % dims] += (ord(ch) % 32) / 100.0
+        return values
+
+    async def close(self) -> None:
+        return None
+
+
+class OpenAIEmbeddingProvider:
+    """Calls an OpenAI-compatible ``/v1/embeddings`` endpoint over the upstream pool."""
+
+    def __init__(self, settings: Settings, upstream: UpstreamClientPool) -> None:
+        self._settings = settings
+        self._upstream = upstream
+
+    async def embed(self, texts: Sequence[str]) -> List[array]:
+        settings = self._settings
+        client = self._upstream.get(settings.openai_base_url)
+        payload: Dict[str, object] = {
+            "model": settings.embedding_model,
+            "input": list(texts),
+        }
+        if settings.embedding_dimensions:
+            payload["dimensions"] = settings.embedding_dimensions
+        async with limiter_slot(self._upstream.limiter):
+            response = await client.post(
+                "/v1/embeddings",
+                headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+                json=payload,
+            )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [array("f", item["embedding"]) for item in data]
+
+    async def close(self) -> None:
+        # The HTTP clients belong to the shared upstream pool.
+        return None
+
+
+class Embedder:
+    """
+    Embeds query texts through a provider with caching and micro-batching.
+
+    Vectors are kept in an LRU of ``max_entries`` float32 arrays. Cache misses
+    from concurrent callers are collected for up to ``batch_wait`` seconds (or
+    until ``batch_size`` texts are waiting) and sent to the provider in one
+    call; identical texts in flight share a single slot in the batch.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        *,
+        max_entries: int = 10_000,
+        batch_size: int = 64,
+        batch_wait: float = 0.002,
+    ) -> None:
+        self._provider = provider
+        self._max_entries = max_entries
+        self._batch_size = batch_size
+        self._batch_wait = batch_wait
+        self._entries: OrderedDict[str, array] = OrderedDict()
+        self._pending: Dict[str, asyncio.Future[array]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: Set[asyncio.Task[None]] = set()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    async def embed(self, text: str) -> array:
+        vector = self._entries.get(text)
+        if vector is not None:
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return vector
+        self.misses += 1
+        future = self._pending.get(text)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[text] = future
+            if len(self._pending) >= self._batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self._batch_wait, self._flush)
+        # Shielded so one cancelled caller does not fail the others.
+        return await asyncio.shield(future)
+
+    async def embed_many(self, texts: Sequence[str]) -> List[array]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, asyncio.Future[array]]) -> None:
+        texts = list(batch)
+        self.batches += 1
+        self.batched_texts += len(texts)
+        try:
+            with metrics.timed("embed"):
+                vectors = await self._provider.embed(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"Embedding provider returned {len(vectors)} vectors "
+                    f"for {len(texts)} texts"
+                )
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+                # Mark the exception as retrieved even if every caller went away.
+                future.exception()
+            return
+        for text, vector in zip(texts, vectors):
+            self._store(text, vector)
+            future = batch[text]
+            if not future.done():
+                future.set_result(vector)
+
+    def _store(self, text: str, vector: array) -> None:
+        if self._max_entries <= 0:
+            return
+        self._entries[text] = vector
+        self._entries.move_to_end(text)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._entries.clear()
+        await self._provider.close()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": (
+                round(self.batched_texts / self.batches, 2) if self.batches else 0.0
+            ),
+        }
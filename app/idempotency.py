@@ -0,0 +1,128 @@
+"""
+Idempotency keys for agent actions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.models.agent import AgentActionRequest, AgentActionResponse
+from app.policy_input import dumps
+from app.response_cache import ResponseStore
+from app.services.exceptions import IdempotencyKeyReusedError
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(request: AgentActionRequest) -> str:
+    """Hash of the request body a key was first used with."""
+    return hashlib.sha256(dumps(request.model_dump(), sort_keys=True)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Replays the stored ``AgentActionResponse`` for a repeated ``Idempotency-Key``.
+
+    Keys are scoped per caller. The first request with a key runs in its own
+    task; duplicates arriving before it finishes join that task, and later
+    ones are answered from ``store`` without policy evaluation or a tool run.
+    Only successful responses are kept, so a denied, failed or timed-out
+    action is evaluated afresh on retry. Reusing a key with a different body
+    raises ``IdempotencyKeyReusedError``.
+    """
+
+    def __init__(self, store: ResponseStore) -> None:
+        self._store = store
+        self._in_flight: Dict[str, Tuple[str, asyncio.Task[AgentActionResponse]]] = {}
+        self.replayed = 0
+        self.joined = 0
+        self.executed = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def key(idempotency_key: str, scope: str | None) -> str:
+        return hashlib.sha256(
+            f"{scope or 'anonymous'}\0{idempotency_key}".encode()
+        ).hexdigest()
+
+    async def run(
+        self,
+        idempotency_key: str,
+        scope: str | None,
+        request: AgentActionRequest,
+        call: Callable[[], Awaitable[AgentActionResponse]],
+    ) -> Tuple[AgentActionResponse, bool]:
+        """Return the response for ``request`` and whether it was replayed."""
+        key = self.key(idempotency_key, scope)
+        fingerprint = request_fingerprint(request)
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._check(pending[0], fingerprint)
+            self.joined += 1
+            return await asyncio.shield(pending[1]), True
+
+        stored = await self._store.get(key)
+        if stored is not None:
+            entry: Dict[str, Any] = json.loads(stored)
+            self._check(entry["fingerprint"], fingerprint)
+            self.replayed += 1
+            return AgentActionResponse.model_validate(entry["response"]), True
+
+        # The store lookup yielded; another duplicate may have started meanwhile.
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._check(pending[0], fingerprint)
+            self.joined += 1
+            return await asyncio.shield(pending[1]), True
+
+        # Its own task, so a disconnecting caller does not cancel it for the
+        # duplicates that joined, and the response is stored for their retry.
+        task = asyncio.ensure_future(self._execute(key, fingerprint, call))
+        self._in_flight[key] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._finish(key, done))
+        self.executed += 1
+        return await asyncio.shield(task), False
+
+    def _check(self, expected: str, fingerprint: str) -> None:
+        if expected != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyKeyReusedError()
+
+    async def _execute(
+        self,
+        key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[AgentActionResponse]],
+    ) -> AgentActionResponse:
+        response = await call()
+        entry = {"fingerprint": fingerprint, "response": response.model_dump()}
+        try:
+            await self._store.set(key, dumps(entry))
+        except Exception:
+            logger.warning("Idempotency store write failed", exc_info=True)
+        return response
+
+    def _finish(self, key: str, task: asyncio.Task[AgentActionResponse]) -> None:
+        self._in_flight.pop(key, None)
+        # Mark the exception as retrieved even if every caller went away.
+        if not task.cancelled():
+            task.exception()
+
+    async def close(self) -> None:
+        await self._store.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._store),
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "joined": self.joined,
+            "conflicts": self.conflicts,
+            "evictions": getattr(self._store, "evictions", 0),
+        }
@@ -6,12 +6,32 @@ from __future__ import annotations
 
 import logging
 from contextlib import asynccontextmanager
+from typing import Any
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app import metrics
 from app.config import get_settings
-from app.container import get_agent_service, get_opa_client, get_rag_service
+from app.container import (
+    get_admission,
+    get_agent_service,
+    get_audit_log,
+    get_idempotency_store,
+    get_llm_flights,
+    get_opa_client,
+    get_rag_service,
+    get_rate_limiter,
+    get_response_cache,
+    get_upstream_pool,
+)
+from app.policy_resilience import ResilientPolicyBackend
 from app.routes import agent, llm, rag
+from app.services.exceptions import (
+    OverloadedError,
+    PolicyUnavailableError,
+    RateLimitedError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,14 +40,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(_: FastAPI):
     settings = get_settings()
     logger.info("Starting %s", settings.app_name)
+    metrics.set_enabled(settings.metrics_enabled)
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.start()
     # Prime singletons so we can close them later.
-    get_rag_service()
+    await get_rag_service().start()
     get_agent_service()
+    get_upstream_pool()
     try:
         yield
     finally:
         await get_rag_service().close()
+        get_agent_service().close()
         await get_opa_client().close()
+        await get_upstream_pool().close()
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            await rate_limiter.close()
+        response_cache = get_response_cache()
+        if response_cache is not None:
+            await response_cache.close()
+        idempotency = get_idempotency_store()
+        if idempotency is not None:
+            await idempotency.close()
+        if audit_log is not None:
+            # Last, so decisions made while shutting down are written too.
+            await audit_log.close()
         logger.info("Shutdown complete")
 
 
@@ -38,6 +77,45 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(_: Request, exc: OverloadedError) -> JSONResponse:
+    """Shed load quickly instead of queueing without bound."""
+    metrics.record_error(exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": {"message": str(exc)}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PolicyUnavailableError)
+async def policy_unavailable_handler(
+    _: Request, exc: PolicyUnavailableError
+) -> JSONResponse:
+    """Fail closed, and fast, while the policy backend is unreachable."""
+    metrics.record_error(exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": {"message": str(exc)}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(_: Request, exc: RateLimitedError) -> JSONResponse:
+    """Reject over-limit tenants before any policy or upstream call."""
+    metrics.record_error(exc)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": {"message": str(exc)}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 app.include_router(llm.router)
 app.include_router(rag.router)
 app.include_router(agent.router)
@@ -47,3 +125,55 @@ app.include_router(agent.router)
 async def health() -> dict[str, str]:
     """Simple health check endpoint."""
     return {"status": "ok"}
+
+
+@app.get("/stats", tags=["system"])
+async def stats() -> dict[str, object]:
+    """In-process counters for sizing pools, limits and caches per replica."""
+    return dict(_collect_stats())
+
+
+@app.get("/metrics", tags=["system"], response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus exposition: stage histograms, counters and the /stats gauges."""
+    body = metrics.REGISTRY.render() + metrics.render_gauges(_collect_stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+def _collect_stats() -> dict[str, dict[str, Any]]:
+    report: dict[str, dict[str, Any]] = {
+        "rag_pool": get_rag_service().pool_stats(),
+        "embeddings": get_rag_service().embedder.stats(),
+        "admission": get_admission().stats(),
+        "agent_tools": get_agent_service().tools.stats(),
+    }
+    if get_settings().rag_result_policy:
+        report["rag_result_filter"] = get_rag_service().result_filter_stats()
+    local_index = get_rag_service().local_index
+    if local_index is not None:
+        report["rag_local_index"] = local_index.stats()
+    rag_cache = get_rag_service().result_cache
+    if rag_cache is not None:
+        report["rag_cache"] = rag_cache.stats()
+    policy_backend = get_opa_client().backend
+    if isinstance(policy_backend, ResilientPolicyBackend):
+        report["policy_backend"] = policy_backend.stats()
+    policy_cache = get_opa_client().cache
+    if policy_cache is not None:
+        report["policy_cache"] = policy_cache.stats()
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        report["response_cache"] = response_cache.stats()
+    idempotency = get_idempotency_store()
+    if idempotency is not None:
+        report["agent_idempotency"] = idempotency.stats()
+    flights = get_llm_flights()
+    if flights is not None:
+        report["llm_coalescing"] = flights.stats()
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is not None:
+        report["rate_limit"] = rate_limiter.stats()
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        report["audit"] = audit_log.stats()
+    return report
@@ -0,0 +1,383 @@
+"""
+Prometheus metrics for the gateway, rendered in the text exposition format.
+
+Counters and histograms are plain dicts and lists updated without locks: the
+gateway runs on one event loop per process, so increments never interleave.
+Per-stage latency lands in ``asb_stage_duration_seconds`` via ``timed``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import math
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Seconds; spans in-process work (sub-millisecond) up to upstream calls.
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_enabled = True
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turn recording on or off (rendering still works, with frozen values)."""
+    global _enabled
+    _enabled = enabled
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if _enabled:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            formatted = _format_labels(self.labelnames, labels)
+            yield f"{self.name}{formatted} {_format_value(value)}"
+
+
+class _Series:
+    """Buckets, sum and count of one label combination of a histogram."""
+
+    __slots__ = ("_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if _enabled:
+            self.counts[bisect.bisect_left(self._bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_series", "_started")
+
+    def __init__(self, series: _Series) -> None:
+        self._series = series
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self._series.observe(time.perf_counter() - self._started)
+
+
+class Histogram:
+    """Histogram with fixed buckets; ``labels`` returns the series to observe."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._bounds = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+
+    def labels(self, *labels: str) -> _Series:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(self._bounds)
+        return series
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._bounds + (math.inf,), series.counts):
+                cumulative += count
+                formatted = _format_labels(names, labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{formatted} {cumulative}"
+            formatted = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{formatted} {_format_value(series.sum)}"
+            yield f"{self.name}_count{formatted} {series.count}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Counter | Histogram] = []
+
+    def register(self, metric: Counter | Histogram) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "asb_stage_duration_seconds",
+        "Time spent in each stage of request handling.",
+        ["stage"],
+    )
+)
+REQUEST_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "asb_request_duration_seconds",
+        "Time from request arrival to the end of the response.",
+        ["route", "method"],
+    )
+)
+REQUESTS: Counter = REGISTRY.register(
+    Counter(
+        "asb_requests_total",
+        "HTTP responses by route, method and status code.",
+        ["route", "method", "status"],
+    )
+)
+POLICY_DECISIONS: Counter = REGISTRY.register(
+    Counter(
+        "asb_policy_decisions_total",
+        "Policy decisions by policy path and outcome.",
+        ["policy", "decision"],
+    )
+)
+ERRORS: Counter = REGISTRY.register(
+    Counter(
+        "asb_errors_total",
+        "Requests that ended in an exception, by exception class.",
+        ["error"],
+    )
+)
+
+
+def timed(stage: str) -> _Timer:
+    """``with timed("policy"): ...`` records the block in the stage histogram."""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_decision(policy_path: str, allow: bool) -> None:
+    POLICY_DECISIONS.inc(policy_path.strip("/"), "allow" if allow else "deny")
+
+
+def record_error(exc: BaseException) -> None:
+    ERRORS.inc(type(exc).__name__)
+
+
+_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def render_gauges(report: Dict[str, Dict[str, Any]], prefix: str = "asb") -> str:
+    """
+    Render a ``/stats`` style report as gauges.
+
+    ``{"rag_pool": {"in_use": 2}}`` becomes ``asb_rag_pool_in_use 2``; a
+    nested dict (one per named limiter) becomes a ``name`` label, and string
+    values become an ``_info`` gauge with a ``value`` label.
+    """
+    samples: Dict[str, List[Tuple[str, float]]] = {}
+
+    def add(name: str, labels: str, value: Any) -> None:
+        name = _NAME.sub("_", name)
+        if isinstance(value, str):
+            value_label = f'value="{_escape(value)}"'
+            labels = "{" + ",".join(filter(None, [labels[1:-1], value_label])) + "}"
+            samples.setdefault(f"{name}_info", []).append((labels, 1.0))
+        elif isinstance(value, (int, float)):
+            samples.setdefault(name, []).append((labels, float(value)))
+
+    for section, values in report.items():
+        for key, value in values.items():
+            if isinstance(value, dict):
+                labels = _format_labels(("name",), (key,))
+                for field, inner in value.items():
+                    add(f"{prefix}_{section}_{field}", labels, inner)
+            else:
+                add(f"{prefix}_{section}_{key}", "", value)
+
+    lines: List[str] = []
+    for name, points in samples.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(
+            f"{name}{labels} {_format_value(value)}" for labels, value in points
+        )
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+class _RequestTiming:
+    __slots__ = ("started", "endpoint_finished", "dependencies")
+
+    def __init__(self, started: float) -> None:
+        self.started = started
+        self.endpoint_finished: float | None = None
+        self.dependencies = 0.0
+
+
+_TIMING: contextvars.ContextVar[_RequestTiming | None] = contextvars.ContextVar(
+    "asb_request_timing", default=None
+)
+
+
+def observe_dependency(stage: str, seconds: float) -> None:
+    """Record a dependency stage (e.g. an admission queue wait) and leave it
+    out of the request's ``parse`` stage."""
+    observe_stage(stage, seconds)
+    timing = _TIMING.get()
+    if timing is not None:
+        timing.dependencies += seconds
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting responses and timing whole requests.
+
+    With ``TimedRoute`` it also splits out the ``parse`` stage (routing, body
+    validation and dependencies, up to the endpoint, minus the stages
+    reported with ``observe_dependency``) and the ``serialize`` stage
+    (endpoint return to response start).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+        timing = _RequestTiming(time.perf_counter())
+        token = _TIMING.set(timing)
+        status = 500
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timing.endpoint_finished is not None:
+                    observe_stage(
+                        "serialize", time.perf_counter() - timing.endpoint_finished
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception as exc:
+            record_error(exc)
+            raise
+        finally:
+            _TIMING.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope.get("method", "")
+            REQUEST_SECONDS.labels(path, method).observe(
+                time.perf_counter() - timing.started
+            )
+            REQUESTS.inc(path, method, str(status))
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(endpoint)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        timing = _TIMING.get()
+        if timing is not None:
+            observe_stage(
+                "parse",
+                time.perf_counter() - timing.started - timing.dependencies,
+            )
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timing is not None:
+                timing.endpoint_finished = time.perf_counter()
+
+    wrapper.asb_timed = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """``APIRoute`` whose async endpoint reports the parse/serialize stages."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        # include_router rebuilds routes from the (already wrapped) endpoint.
+        if asyncio.iscoroutinefunction(endpoint) and not getattr(
+            endpoint, "asb_timed", False
+        ):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
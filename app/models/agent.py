@@ -4,9 +4,9 @@ Models for the agent action execution API.
 
 from __future__ import annotations
 
-from typing import Dict, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class AgentActionRequest(BaseModel):
@@ -19,3 +19,18 @@ class AgentActionResponse(BaseModel):
     tool: str
     output: Dict[str, str]
     status: str = "success"
+
+
+class AgentBatchRequest(BaseModel):
+    actions: List[AgentActionRequest] = Field(min_length=1)
+
+
+class AgentBatchItem(BaseModel):
+    tool: str
+    status: Literal["success", "denied", "timeout", "error"]
+    output: Optional[Dict[str, str]] = None
+    reason: Optional[str] = None
+
+
+class AgentBatchResponse(BaseModel):
+    results: List[AgentBatchItem]
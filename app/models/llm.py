@@ -29,6 +29,12 @@ class ChatCompletionChoice(BaseModel):
     finish_reason: Optional[str] = "stop"
 
 
+class ChatCompletionUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+
 class ChatCompletionResponse(BaseModel):
     id: str = Field(default_factory=lambda: "asb-response")
     object: str = "chat.completion"
@@ -37,3 +43,4 @@ class ChatCompletionResponse(BaseModel):
     )
     model: str
     choices: List[ChatCompletionChoice]
+    usage: Optional[ChatCompletionUsage] = None
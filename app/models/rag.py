@@ -13,6 +13,11 @@ class RAGSearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = None
     embedding: Optional[List[float]] = None
+    # Metadata must contain every key/value pair (JSONB containment).
+    filters: Optional[Dict[str, str]] = None
+    # Per-request ANN search breadth; defaults come from Settings.
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1, le=1000)
 
 
 class RAGSearchResult(BaseModel):
@@ -24,3 +29,20 @@ class RAGSearchResult(BaseModel):
 
 class RAGSearchResponse(BaseModel):
     results: List[RAGSearchResult]
+    # Rows among the top_k nearest withheld by the result policy.
+    filtered: int = 0
+
+
+class RAGBatchSearchRequest(BaseModel):
+    queries: List[RAGSearchRequest] = Field(min_length=1)
+
+
+class RAGBatchSearchItem(BaseModel):
+    allow: bool
+    reason: Optional[str] = None
+    results: List[RAGSearchResult] = Field(default_factory=list)
+    filtered: int = 0
+
+
+class RAGBatchSearchResponse(BaseModel):
+    results: List[RAGBatchSearchItem]
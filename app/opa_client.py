@@ -4,16 +4,25 @@ Lightweight async client for communicating with the co-located OPA instance.
 
 from __future__ import annotations
 
+import json
 import logging
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List, Protocol, Sequence, Tuple
 
 import httpx
+from pydantic import BaseModel
 
-from app.config import get_settings
-from .models.events import SecurityEvent
+from app import metrics
+from app.admission import ConcurrencyLimiter, limiter_slot
+from app.policy_input import batch_body, encode_input
+
+if TYPE_CHECKING:
+    from app.audit import AuditLog
+    from app.policy_cache import PolicyDecisionCache
 
 logger = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class OPADecision:
     """Container for results returned by OPA policies."""
@@ -23,59 +32,300 @@ class OPADecision:
         self.reason = reason
         self.raw = raw
 
+    @classmethod
+    def from_result(cls, result: Any) -> "OPADecision":
+        """Build a decision from the ``result`` member of an OPA data response."""
+        if result is None:
+            return cls(allow=False, reason="Policy returned no decision")
+        if isinstance(result, bool):
+            return cls(allow=result, raw=result)
+        allow = bool(result.get("allow", False))
+        reason = result.get("reason")
+        return cls(allow=allow, reason=reason, raw=result)
+
     def __repr__(self) -> str:  # pragma: no cover - debugging helper
         return f"OPADecision(allow={self.allow}, reason={self.reason})"
 
 
-class OPAClient:
-    """Minimal HTTP client for posting ASB events to OPA."""
+class BatchResults(List[Any]):
+    """``query_many`` results plus the ``provenance`` the backend reported."""
 
-    def __init__(self, base_url: str) -> None:
-        self._base_url = base_url.rstrip("/")
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(5.0, connect=3.0))
+    __slots__ = ("provenance",)
+
+    def __init__(
+        self, results: Sequence[Any] = (), provenance: Dict[str, Any] | None = None
+    ) -> None:
+        super().__init__(results)
+        self.provenance = provenance
 
-    async def evaluate(self, policy_path: str, event: SecurityEvent) -> OPADecision:
+
+class PolicyBackend(Protocol):
+    """Anything that can answer an OPA Data API query."""
+
+    async def query(
+        self, policy_path: str, input_doc: Dict[str, Any], *, provenance: bool = False
+    ) -> Dict[str, Any]:
+        """Return the OPA-style response body (``result`` and ``provenance``)."""
+        ...
+
+    async def query_many(
+        self, queries: Sequence[Tuple[str, Dict[str, Any]]], *, provenance: bool = False
+    ) -> List[Any]:
         """
-        Send an evaluation request to OPA.
+        Return the ``result`` for each (policy_path, input) pair, or None.
 
-        Args:
-            policy_path: Path under /v1/data/, e.g. "prompt/allow".
-            event: Security event payload following ASB schema.
+        With ``provenance``, a ``BatchResults`` carrying the policy revision
+        when the backend can report it.
         """
+        ...
+
+    async def close(self) -> None: ...
+
+
+class HTTPPolicyBackend:
+    """Posts queries to an OPA server over a pooled HTTP client."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 5.0,
+        connect_timeout: float = 3.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            transport=transport,
+        )
+
+    async def query(
+        self, policy_path: str, input_doc: Dict[str, Any], *, provenance: bool = False
+    ) -> Dict[str, Any]:
         url = f"{self._base_url}/v1/data/{policy_path.lstrip('/')}"
-        payload: Dict[str, Any] = {"input": event.model_dump()}
         logger.debug("Sending event to OPA %s", url)
-
-        response = await self._client.post(url, json=payload)
+        params = {"provenance": "true"} if provenance else None
+        response = await self._client.post(
+            url,
+            content=b'{"input":' + encode_input(input_doc) + b"}",
+            params=params,
+            headers=_JSON_HEADERS,
+        )
         response.raise_for_status()
+        return response.json()
+
+    async def query_many(
+        self, queries: Sequence[Tuple[str, Dict[str, Any]]], *, provenance: bool = False
+    ) -> List[Any]:
+        """
+        Evaluate several policies in one ``POST /v1/query`` round-trip.
 
-        data = response.json().get("result", {})
-        if isinstance(data, bool):
-            return OPADecision(allow=data, raw=data)
+        Each pair becomes ``rN := [x | x := data.<path> with input as input.qN]``
+        so an undefined policy yields an empty list instead of failing the
+        whole conjunction. OPA versions whose Query API does not report
+        provenance leave ``BatchResults.provenance`` as None.
+        """
+        if not queries:
+            return []
+        expressions = []
+        for index, (policy_path, _) in enumerate(queries):
+            ref = "data" + "".join(
+                f"[{json.dumps(part)}]" for part in policy_path.strip("/").split("/")
+            )
+            expressions.append(
+                f"r{index} := [x | x := {ref} with input as input.q{index}]"
+            )
+
+        url = f"{self._base_url}/v1/query"
+        logger.debug("Sending %d batched events to OPA %s", len(queries), url)
+        body = batch_body(
+            "; ".join(expressions), [input_doc for _, input_doc in queries]
+        )
+        params = {"provenance": "true"} if provenance else None
+        response = await self._client.post(
+            url, content=body, params=params, headers=_JSON_HEADERS
+        )
+        response.raise_for_status()
 
-        allow = bool(data.get("allow", False))
-        reason = data.get("reason")
-        return OPADecision(allow=allow, reason=reason, raw=data)
+        payload = response.json()
+        bindings = (payload.get("result") or [{}])[0]
+        results = BatchResults(provenance=payload.get("provenance"))
+        for index in range(len(queries)):
+            values = bindings.get(f"r{index}") or []
+            results.append(values[0] if values else None)
+        return results
 
     async def close(self) -> None:
-        """Close the underlying HTTP client."""
         await self._client.aclose()
 
 
-async def evaluate_policy(path: str, input_event: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Evaluate an OPA policy by posting the provided event as input.
+def _input_doc(event: BaseModel | Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(event, dict):
+        return event
+    return event.model_dump(mode="json")
 
-    Args:
-        path: Policy path under /v1/data (e.g. "asb/prompt").
-        input_event: Serialized security event payload.
-    """
-    settings = get_settings()
-    base_url = settings.opa_url.rstrip("/")
-    url = f"{base_url}/v1/data/{path.lstrip('/')}"
-    logger.debug("Evaluating OPA policy at %s", url)
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(5.0, connect=3.0)) as client:
-        response = await client.post(url, json={"input": input_event})
-        response.raise_for_status()
-        return response.json()
+class OPAClient:
+    """Policy client for ASB events backed by OPA or an in-process engine."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 5.0,
+        connect_timeout: float = 3.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+        cache: "PolicyDecisionCache | None" = None,
+        limiter: ConcurrencyLimiter | None = None,
+        backend: PolicyBackend | None = None,
+        audit: "AuditLog | None" = None,
+    ) -> None:
+        self._cache = cache
+        self._audit = audit
+        self._limiter = limiter
+        self._backend: PolicyBackend = backend or HTTPPolicyBackend(
+            base_url,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            timeout=timeout,
+            connect_timeout=connect_timeout,
+            transport=transport,
+        )
+
+    async def evaluate(
+        self,
+        policy_path: str,
+        event: BaseModel | Dict[str, Any],
+        *,
+        audit: bool = True,
+    ) -> OPADecision:
+        """
+        Evaluate an event against a policy.
+
+        Args:
+            policy_path: Path under /v1/data/, e.g. "prompt/allow".
+            event: Security event payload following ASB schema, as a model or
+                as the document it dumps to (see ``app.policy_input``).
+            audit: False leaves recording the decision to the caller, e.g.
+                one record per streamed response rather than per window.
+        """
+        input_doc = _input_doc(event)
+
+        cache = self._cache
+        cache_key: str | None = None
+        if cache is not None and cache.enabled_for(policy_path):
+            cache_key = cache.key(policy_path, input_doc)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                metrics.record_decision(policy_path, cached.allow)
+                if audit and self._audit is not None:
+                    await self._audit.record(
+                        policy_path, input_doc, cached.allow, cached.reason
+                    )
+                return cached
+
+        # Ask for provenance so the cache can notice policy/bundle updates.
+        with metrics.timed("policy"):
+            async with limiter_slot(self._limiter):
+                body = await self._backend.query(
+                    policy_path, input_doc, provenance=cache_key is not None
+                )
+        decision = OPADecision.from_result(body.get("result"))
+        if cache is not None and cache_key is not None:
+            # Only decisions OPA reports a revision for are cached; a fallback
+            # from ``ResilientPolicyBackend`` carries none and must not outlive
+            # the outage.
+            reported = body.get("provenance")
+            cache.observe_revision(reported)
+            if reported:
+                cache.put(cache_key, decision)
+        metrics.record_decision(policy_path, decision.allow)
+        if audit and self._audit is not None:
+            await self._audit.record(
+                policy_path, input_doc, decision.allow, decision.reason
+            )
+        return decision
+
+    async def evaluate_many(
+        self, checks: Sequence[Tuple[str, BaseModel | Dict[str, Any]]]
+    ) -> List[OPADecision]:
+        """
+        Evaluate several (policy_path, event) pairs in a single backend round-trip.
+
+        Cached decisions are served locally; only the misses are sent to the
+        backend. Decisions are returned in the same order as ``checks``.
+        """
+        decisions: List[OPADecision | None] = [None] * len(checks)
+        pending: List[Tuple[int, str, Dict[str, Any], str | None]] = []
+        input_docs: List[Dict[str, Any]] = []
+        cache = self._cache
+        for index, (policy_path, event) in enumerate(checks):
+            input_doc = _input_doc(event)
+            input_docs.append(input_doc)
+            cache_key: str | None = None
+            if cache is not None and cache.enabled_for(policy_path):
+                cache_key = cache.key(policy_path, input_doc)
+                decisions[index] = cache.get(cache_key)
+                if decisions[index] is not None:
+                    continue
+            pending.append((index, policy_path, input_doc, cache_key))
+
+        if pending:
+            cacheable = any(cache_key is not None for *_, cache_key in pending)
+            with metrics.timed("policy"):
+                async with limiter_slot(self._limiter):
+                    results = await self._backend.query_many(
+                        [(path, input_doc) for _, path, input_doc, _ in pending],
+                        provenance=cacheable,
+                    )
+            if cache is not None and cacheable:
+                # As in ``evaluate``: a new policy revision clears the cache.
+                # Without a reported revision, the decisions are not cached.
+                reported = getattr(results, "provenance", None)
+                cache.observe_revision(reported)
+                cacheable = bool(reported)
+            for (index, _, _, cache_key), result in zip(pending, results):
+                decision = OPADecision.from_result(result)
+                decisions[index] = decision
+                if cache is not None and cacheable and cache_key is not None:
+                    cache.put(cache_key, decision)
+
+        resolved = [decision for decision in decisions if decision is not None]
+        for (policy_path, _), input_doc, decision in zip(checks, input_docs, resolved):
+            metrics.record_decision(policy_path, decision.allow)
+            if self._audit is not None:
+                await self._audit.record(
+                    policy_path, input_doc, decision.allow, decision.reason
+                )
+        return resolved
+
+    @property
+    def backend(self) -> PolicyBackend:
+        """Backend answering the queries that miss the decision cache."""
+        return self._backend
+
+    @property
+    def audit(self) -> "AuditLog | None":
+        """Audit trail every evaluated event is recorded to, if configured."""
+        return self._audit
+
+    @property
+    def cache(self) -> "PolicyDecisionCache | None":
+        """Decision cache in front of the policy backend, if configured."""
+        return self._cache
+
+    async def close(self) -> None:
+        """Close the underlying policy backend."""
+        await self._backend.close()
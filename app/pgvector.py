@@ -0,0 +1,68 @@
+"""
+Binary wire codec for the pgvector ``vector`` type.
+
+pgvector's binary format is an int16 dimension count, an unused int16 and the
+values as big-endian float32, which lets embeddings travel as a single buffer
+instead of a formatted text literal.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from typing import Iterable, Union
+
+import asyncpg  # type: ignore[import-untyped]
+
+_HEADER = struct.Struct(">HH")
+_SWAP = sys.byteorder == "little"
+
+
+class Vector:
+    """
+    An embedding passed as a query parameter.
+
+    asyncpg treats nested sequences as multi-dimensional arrays, so elements
+    of a ``vector[]`` parameter must be wrapped to be encoded one by one.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable[float]) -> None:
+        self.values = values
+
+
+def encode_vector(value: Union[Vector, Iterable[float]]) -> bytes:
+    """Pack a float sequence or buffer as a pgvector binary value."""
+    floats = array("f", value.values if isinstance(value, Vector) else value)
+    if _SWAP:
+        floats.byteswap()
+    return _HEADER.pack(len(floats), 0) + floats.tobytes()
+
+
+def decode_vector(data: bytes) -> array:
+    """Unpack a pgvector binary value into a float32 ``array``."""
+    dims, _ = _HEADER.unpack_from(data)
+    floats = array("f")
+    floats.frombytes(data[_HEADER.size : _HEADER.size + dims * 4])
+    if _SWAP:
+        floats.byteswap()
+    return floats
+
+
+async def register_vector_codec(connection: asyncpg.Connection) -> None:
+    """Send and receive ``vector`` values in binary on ``connection``."""
+    schema = await connection.fetchval(
+        "SELECT typnamespace::regnamespace::text FROM pg_type "
+        "WHERE typname = 'vector'"
+    )
+    if schema is None:
+        return
+    await connection.set_type_codec(
+        "vector",
+        schema=schema,
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary",
+    )
@@ -0,0 +1,109 @@
+"""
+In-process LRU + TTL cache for OPA policy decisions.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from app.opa_client import OPADecision
+from app.policy_input import dumps
+
+logger = logging.getLogger(__name__)
+
+# Fields that change on every request but never influence a policy decision.
+VOLATILE_FIELDS = frozenset({"event_id", "timestamp", "decision"})
+
+
+class PolicyDecisionCache:
+    """Bounded decision cache keyed on the decision-relevant part of an event."""
+
+    def __init__(
+        self,
+        policy_paths: Iterable[str],
+        *,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._policy_paths = {path.strip("/") for path in policy_paths}
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, Tuple[float, OPADecision]] = OrderedDict()
+        self._revision: str | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def enabled_for(self, policy_path: str) -> bool:
+        """Return True when decisions for ``policy_path`` may be cached."""
+        return policy_path.strip("/") in self._policy_paths
+
+    @staticmethod
+    def key(policy_path: str, input_doc: Dict[str, Any]) -> str:
+        """Canonical hash of the policy path and decision-relevant input."""
+        relevant = {k: v for k, v in input_doc.items() if k not in VOLATILE_FIELDS}
+        encoded = dumps([policy_path.strip("/"), relevant], sort_keys=True)
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> OPADecision | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, decision = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, key: str, decision: OPADecision) -> None:
+        self._entries[key] = (self._clock() + self._ttl, decision)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def observe_revision(self, provenance: Dict[str, Any] | None) -> None:
+        """Drop every cached decision when OPA reports a new policy revision."""
+        if not provenance:
+            return
+        bundles = provenance.get("bundles") or {}
+        revision = json.dumps(
+            {
+                "revision": provenance.get("revision"),
+                "bundles": {
+                    name: (info or {}).get("revision")
+                    for name, info in sorted(bundles.items())
+                },
+            },
+            sort_keys=True,
+        )
+        if self._revision is not None and revision != self._revision:
+            logger.info("OPA policy revision changed; clearing decision cache")
+            self.clear()
+        self._revision = revision
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
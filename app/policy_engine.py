@@ -0,0 +1,223 @@
+"""
+In-process evaluator for the gateway policies shipped in ``policies/*.rego``.
+
+Each policy follows the same shape: a set of ``deny_reasons`` rules and an
+``allow`` document that is ``{"allow": true}`` unless at least one reason
+fires, in which case the sorted reasons are joined with ``"; "``. Policies
+that judge retrieved rows also define ``denied_results`` (positions in
+``input.resource.documents``) and a ``results`` document listing them. The rules
+below mirror those files one-to-one; ``tests/test_policy_parity.py`` keeps
+them in sync with OPA.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from app.opa_client import BatchResults
+
+_UNDEFINED = object()
+
+DenyRule = Tuple[Callable[[Dict[str, Any]], bool], str]
+
+
+def _lookup(document: Any, *path: str) -> Any:
+    """Resolve ``input.a.b.c`` the way Rego does, yielding _UNDEFINED when absent."""
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return _UNDEFINED
+        document = document[key]
+    return document
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _equals(expected: Any, *path: str) -> Callable[[Dict[str, Any]], bool]:
+    return lambda doc: _lookup(doc, *path) == expected
+
+
+def _greater_than(limit: float, *path: str) -> Callable[[Dict[str, Any]], bool]:
+    def check(doc: Dict[str, Any]) -> bool:
+        value = _lookup(doc, *path)
+        return _is_number(value) and value > limit
+
+    return check
+
+
+def _count_greater_than(limit: int, *path: str) -> Callable[[Dict[str, Any]], bool]:
+    def check(doc: Dict[str, Any]) -> bool:
+        value = _lookup(doc, *path)
+        return isinstance(value, (list, dict, str)) and len(value) > limit
+
+    return check
+
+
+def _exceeds(
+    path: Tuple[str, ...], limit_path: Tuple[str, ...]
+) -> Callable[[Dict[str, Any]], bool]:
+    def check(doc: Dict[str, Any]) -> bool:
+        value, limit = _lookup(doc, *path), _lookup(doc, *limit_path)
+        return _is_number(value) and _is_number(limit) and value > limit
+
+    return check
+
+
+def _contains_lower(needle: str, *path: str) -> Callable[[Dict[str, Any]], bool]:
+    def check(doc: Dict[str, Any]) -> bool:
+        value = _lookup(doc, *path)
+        return isinstance(value, str) and needle in value.lower()
+
+    return check
+
+
+POLICIES: Dict[str, List[DenyRule]] = {
+    "agent": [
+        (_equals("http_get", "resource", "name"), "network access disabled"),
+        (_equals("suspended", "subject", "user_id"), "subject suspended"),
+    ],
+    "prompt": [
+        (_equals("blocked", "subject", "user_id"), "blocked user"),
+        (
+            _greater_than(1.0, "context", "metadata", "temperature"),
+            "temperature too high",
+        ),
+        (
+            _count_greater_than(32, "context", "metadata", "message_roles"),
+            "too many messages",
+        ),
+        (
+            _exceeds(
+                ("context", "metadata", "max_tokens"),
+                ("context", "budget", "tokens_remaining"),
+            ),
+            "max_tokens exceeds token budget",
+        ),
+    ],
+    "output": [
+        (
+            _contains_lower("-----begin", "resource", "llm", "output"),
+            "private key material in output",
+        ),
+    ],
+    "rag": [
+        (_greater_than(10, "context", "metadata", "top_k"), "top_k too large"),
+        (
+            _greater_than(2000, "context", "metadata", "query_length"),
+            "query too long",
+        ),
+    ],
+}
+
+
+DocumentRule = Callable[[Dict[str, Any], Dict[str, Any]], bool]
+
+
+def _document_differs(
+    document_path: Tuple[str, ...], input_path: Tuple[str, ...]
+) -> DocumentRule:
+    def check(doc: Dict[str, Any], document: Dict[str, Any]) -> bool:
+        value = _lookup(document, *document_path)
+        expected = _lookup(doc, *input_path)
+        return _UNDEFINED not in (value, expected) and value != expected
+
+    return check
+
+
+def _document_equals(expected: Any, *path: str) -> DocumentRule:
+    return lambda doc, document: _lookup(document, *path) == expected
+
+
+# Rules over each entry of ``input.resource.documents`` (``denied_results``).
+DOCUMENT_POLICIES: Dict[str, List[DocumentRule]] = {
+    "rag": [
+        _document_differs(("metadata", "tenant_id"), ("subject", "tenant_id")),
+        _document_equals("restricted", "metadata", "classification"),
+    ],
+}
+
+
+class EmbeddedPolicyEngine:
+    """Evaluates ``<package>/allow`` and ``<package>/deny_reasons`` in-process."""
+
+    def __init__(
+        self,
+        policies: Dict[str, List[DenyRule]] | None = None,
+        document_policies: Dict[str, List[DocumentRule]] | None = None,
+    ) -> None:
+        self._policies = POLICIES if policies is None else policies
+        self._document_policies = (
+            DOCUMENT_POLICIES if document_policies is None else document_policies
+        )
+
+    def deny_reasons(self, package: str, input_doc: Dict[str, Any]) -> List[str]:
+        rules: Sequence[DenyRule] = self._policies.get(package, ())
+        return sorted({reason for check, reason in rules if check(input_doc)})
+
+    def denied_results(self, package: str, input_doc: Dict[str, Any]) -> List[int]:
+        documents = _lookup(input_doc, "resource", "documents")
+        if not isinstance(documents, list):
+            return []
+        rules = self._document_policies.get(package, ())
+        return [
+            index
+            for index, document in enumerate(documents)
+            if any(check(input_doc, document) for check in rules)
+        ]
+
+    def evaluate(self, policy_path: str, input_doc: Dict[str, Any]) -> Any:
+        """Return what OPA would put under ``result`` for ``policy_path``."""
+        package, _, rule = policy_path.strip("/").partition("/")
+        if package not in self._policies:
+            return None
+        reasons = self.deny_reasons(package, input_doc)
+        if rule == "deny_reasons":
+            return reasons
+        if rule == "allow":
+            if reasons:
+                return {"allow": False, "reason": "; ".join(reasons)}
+            return {"allow": True}
+        if package in self._document_policies:
+            if rule == "denied_results":
+                return self.denied_results(package, input_doc)
+            if rule == "results":
+                return {
+                    "allow": True,
+                    "denied": self.denied_results(package, input_doc),
+                }
+        return None
+
+
+# The embedded policies are code: their revision never changes at runtime.
+_PROVENANCE = {"revision": "embedded"}
+
+
+class EmbeddedPolicyBackend:
+    """``PolicyBackend`` that answers queries with the in-process engine."""
+
+    def __init__(self, engine: EmbeddedPolicyEngine | None = None) -> None:
+        self._engine = engine or EmbeddedPolicyEngine()
+
+    async def query(
+        self, policy_path: str, input_doc: Dict[str, Any], *, provenance: bool = False
+    ) -> Dict[str, Any]:
+        result = self._engine.evaluate(policy_path, input_doc)
+        body: Dict[str, Any] = {} if result is None else {"result": result}
+        if provenance:
+            body["provenance"] = _PROVENANCE
+        return body
+
+    async def query_many(
+        self, queries: Sequence[Tuple[str, Dict[str, Any]]], *, provenance: bool = False
+    ) -> List[Any]:
+        return BatchResults(
+            [
+                self._engine.evaluate(policy_path, input_doc)
+                for policy_path, input_doc in queries
+            ],
+            _PROVENANCE if provenance else None,
+        )
+
+    async def close(self) -> None:
+        return None
@@ -0,0 +1,136 @@
+"""
+Fast construction and encoding of policy input documents.
+
+The Pydantic models in ``app.models.events`` and ``app.models.asb_events``
+remain the schema of record. On the request path the services build the
+same documents as plain dicts instead (``model_dump(mode="json")`` output,
+key for key), and each document carries its JSON encoding so the HTTP
+policy backend, retries and hedges reuse one encoding. orjson is used when
+installed; ``tests/test_policy_input.py`` checks parity with the models.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+try:
+    import orjson  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+from app.models.events import EVENT_SCHEMA
+
+LLM_SCHEMA_VERSION = "asb-sec-0.1"
+
+
+def _stdlib_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    return json.dumps(
+        value,
+        sort_keys=sort_keys,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    ).encode()
+
+
+def _orjson_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    return orjson.dumps(
+        value,
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if sort_keys else 0,
+    )
+
+
+# Compact JSON as UTF-8 bytes; unknown types are encoded with ``str``.
+dumps: Callable[..., bytes] = _stdlib_dumps if orjson is None else _orjson_dumps
+
+
+class PolicyInput(Dict[str, Any]):
+    """A policy input document that encodes itself to JSON at most once."""
+
+    __slots__ = ("_encoded",)
+
+    def encoded(self) -> bytes:
+        try:
+            return self._encoded
+        except AttributeError:
+            self._encoded: bytes = dumps(self)
+            return self._encoded
+
+
+def encode_input(input_doc: Dict[str, Any]) -> bytes:
+    """JSON for ``input_doc``, reusing the cached encoding of a ``PolicyInput``."""
+    if isinstance(input_doc, PolicyInput):
+        return input_doc.encoded()
+    return dumps(input_doc)
+
+
+def security_event(
+    user_id: str,
+    operation: Dict[str, Any],
+    resource: Dict[str, Any],
+    metadata: Dict[str, Any] | None = None,
+    *,
+    tenant_id: str | None = None,
+) -> PolicyInput:
+    """
+    ``SecurityEvent(...).model_dump(mode="json")`` without the models.
+
+    ``operation`` is typically a module-level constant; documents are never
+    mutated after they are built, so it is shared rather than copied.
+    """
+    return PolicyInput(
+        schema_=EVENT_SCHEMA,
+        subject={
+            "user_id": user_id,
+            "token_id": None,
+            "tenant_id": tenant_id,
+            "platform": "api",
+        },
+        operation=operation,
+        resource=resource,
+        context={"metadata": metadata if metadata is not None else {}, "tags": {}},
+        decision=None,
+    )
+
+
+def llm_event(
+    event_id: str,
+    timestamp: datetime,
+    *,
+    app_id: str | None,
+    env: str | None,
+    subject: Dict[str, Any],
+    operation: Dict[str, Any],
+    resource: Dict[str, Any],
+    context: Dict[str, Any] | None = None,
+    tenant_id: str | None = None,
+) -> PolicyInput:
+    """``SecurityEventLlmInput(...).model_dump(mode="json")`` without the model."""
+    return PolicyInput(
+        schema_version=LLM_SCHEMA_VERSION,
+        event_id=event_id,
+        # Pydantic writes UTC as "Z" rather than "+00:00".
+        timestamp=timestamp.isoformat().replace("+00:00", "Z"),
+        tenant_id=tenant_id,
+        app_id=app_id,
+        env=env,
+        subject=subject,
+        operation=operation,
+        resource=resource,
+        context=context if context is not None else {},
+    )
+
+
+def batch_body(query: str, input_docs: List[Dict[str, Any]]) -> bytes:
+    """``{"query": ..., "input": {"q0": ..., ...}}`` from per-document encodings."""
+    parts = [b'{"query":', dumps(query), b',"input":{']
+    for index, input_doc in enumerate(input_docs):
+        if index:
+            parts.append(b",")
+        parts.append(b'"q%d":' % index)
+        parts.append(encode_input(input_doc))
+    parts.append(b"}}")
+    return b"".join(parts)
@@ -0,0 +1,341 @@
+"""
+Circuit breaking, retries, hedging and adaptive timeouts for policy calls.
+
+``ResilientPolicyBackend`` wraps another ``PolicyBackend`` (normally the OPA
+HTTP one). When the backend is failing, each policy path either fails closed
+with ``PolicyUnavailableError`` or answers from its last known decision.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Literal, Sequence, Tuple
+
+import httpx
+
+from app.opa_client import PolicyBackend
+from app.policy_cache import PolicyDecisionCache
+from app.services.exceptions import PolicyUnavailableError
+
+logger = logging.getLogger(__name__)
+
+FailMode = Literal["closed", "cached", "open"]
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._min_samples = min_samples
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """The ``q`` quantile of the window, or None until it has enough samples."""
+        if len(self._samples) < self._min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    ``failure_threshold`` consecutive failures open the circuit; after
+    ``reset_timeout`` seconds one probe call is let through, and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if (
+            self.state == "open"
+            and self._clock() >= self.opened_at + self._reset_timeout
+        ):
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """Free the probe slot of a call that ended without an outcome."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self._failure_threshold:
+            if self.state != "open":
+                logger.warning("Policy circuit opened after %d failures", self.failures)
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = self._clock()
+
+    def retry_after(self) -> int:
+        """Seconds until the next probe, for ``Retry-After``."""
+        if self.state != "open":
+            return 1
+        return max(1, math.ceil(self.opened_at + self._reset_timeout - self._clock()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+def _is_outage(exc: BaseException) -> bool:
+    """Errors that say the backend is unhealthy, as opposed to a bad request."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, OSError))
+
+
+class ResilientPolicyBackend:
+    """
+    ``PolicyBackend`` adding a circuit breaker, retries and hedging.
+
+    Each attempt gets a timeout of ``timeout_multiplier`` x the observed p99
+    latency, clamped to [``min_timeout``, ``max_timeout``]. Outage errors are
+    retried ``retries`` times with full-jitter exponential backoff. With
+    ``hedge`` a second request is sent when the first has not answered by
+    the observed p95 and the faster answer wins.
+
+    ``fail_modes`` maps policy paths to what happens when no decision can be
+    obtained: ``closed`` (the default) raises ``PolicyUnavailableError``,
+    ``cached`` serves the last decision seen for the same input or raises,
+    and ``open`` serves that decision or allows.
+    """
+
+    def __init__(
+        self,
+        backend: PolicyBackend,
+        *,
+        fail_modes: Dict[str, FailMode] | None = None,
+        breaker: CircuitBreaker | None = None,
+        retries: int = 1,
+        retry_backoff: float = 0.05,
+        max_timeout: float = 5.0,
+        min_timeout: float = 0.1,
+        timeout_multiplier: float = 4.0,
+        hedge: bool = False,
+        max_remembered: int = 10_000,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self._backend = backend
+        self._fail_modes = {
+            path.strip("/"): mode for path, mode in (fail_modes or {}).items()
+        }
+        self.breaker = breaker or CircuitBreaker()
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        self._max_timeout = max_timeout
+        self._min_timeout = min_timeout
+        self._timeout_multiplier = timeout_multiplier
+        self._hedge = hedge
+        self._rng = rng
+        self.latency = LatencyTracker()
+        # Last decision per (path, input) for paths that may fall back to it.
+        self._remembered: OrderedDict[str, Any] = OrderedDict()
+        self._max_remembered = max_remembered
+        self.retries = 0
+        self.hedges = 0
+        self.timeouts = 0
+        self.served_cached = 0
+        self.failed_open = 0
+        self.failed_closed = 0
+
+    async def query(
+        self, policy_path: str, input_doc: Dict[str, Any], *, provenance: bool = False
+    ) -> Dict[str, Any]:
+        try:
+            body = await self._call(
+                lambda: self._backend.query(
+                    policy_path, input_doc, provenance=provenance
+                )
+            )
+        except Exception as exc:
+            if not _is_outage(exc) and not isinstance(exc, PolicyUnavailableError):
+                raise
+            return {"result": self._fallback(policy_path, input_doc, exc)}
+        self._remember(policy_path, input_doc, body.get("result"))
+        return body
+
+    async def query_many(
+        self, queries: Sequence[Tuple[str, Dict[str, Any]]], *, provenance: bool = False
+    ) -> List[Any]:
+        try:
+            results = await self._call(
+                lambda: self._backend.query_many(queries, provenance=provenance)
+            )
+        except Exception as exc:
+            if not _is_outage(exc) and not isinstance(exc, PolicyUnavailableError):
+                raise
+            return [self._fallback(path, input_doc, exc) for path, input_doc in queries]
+        for (policy_path, input_doc), result in zip(queries, results):
+            self._remember(policy_path, input_doc, result)
+        return results
+
+    def timeout(self) -> float:
+        """Per-attempt timeout derived from recent latency."""
+        p99 = self.latency.quantile(0.99)
+        if p99 is None:
+            return self._max_timeout
+        return min(
+            self._max_timeout, max(self._min_timeout, p99 * self._timeout_multiplier)
+        )
+
+    async def _call(self, send: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.breaker.allow():
+            raise PolicyUnavailableError("circuit open", self.breaker.retry_after())
+        probe = self.breaker.state == "half_open"
+        try:
+            for attempt in range(self._retries + 1):
+                try:
+                    result = await self._attempt(send)
+                except Exception as exc:
+                    if not _is_outage(exc):
+                        # The backend answered; a bad request says nothing
+                        # about health.
+                        self.breaker.record_success()
+                        raise
+                    if isinstance(exc, asyncio.TimeoutError):
+                        self.timeouts += 1
+                    if attempt == self._retries:
+                        self.breaker.record_failure()
+                        raise
+                    self.retries += 1
+                    await asyncio.sleep(self._rng() * self._retry_backoff * 2**attempt)
+                else:
+                    self.breaker.record_success()
+                    return result
+        finally:
+            if probe:
+                # A cancelled probe must not hold the half-open slot forever.
+                self.breaker.release()
+
+    async def _attempt(self, send: Callable[[], Awaitable[Any]]) -> Any:
+        timeout = self.timeout()
+        started = time.monotonic()
+        hedge_after = self.latency.quantile(0.95) if self._hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            result = await asyncio.wait_for(send(), timeout)
+        else:
+            result = await self._hedged(send, hedge_after, timeout)
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(
+        self, send: Callable[[], Awaitable[Any]], hedge_after: float, timeout: float
+    ) -> Any:
+        pending = {asyncio.ensure_future(send())}
+        error: BaseException | None = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        hedged = False
+        try:
+            while pending:
+                wait = deadline - loop.time()
+                if not hedged:
+                    wait = min(wait, hedge_after)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wait), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not done and loop.time() >= deadline:
+                    raise asyncio.TimeoutError
+                if not hedged and not done:
+                    # The first try is slower than usual: race a second one.
+                    hedged = True
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(send()))
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _remember(
+        self, policy_path: str, input_doc: Dict[str, Any], result: Any
+    ) -> None:
+        if result is None or self._fail_modes.get(policy_path.strip("/")) is None:
+            return
+        key = PolicyDecisionCache.key(policy_path, input_doc)
+        self._remembered[key] = result
+        self._remembered.move_to_end(key)
+        while len(self._remembered) > self._max_remembered:
+            self._remembered.popitem(last=False)
+
+    def _fallback(
+        self, policy_path: str, input_doc: Dict[str, Any], exc: BaseException
+    ) -> Any:
+        mode = self._fail_modes.get(policy_path.strip("/"), "closed")
+        if mode != "closed":
+            key = PolicyDecisionCache.key(policy_path, input_doc)
+            if key in self._remembered:
+                self.served_cached += 1
+                logger.warning("Serving last known %s decision: %s", policy_path, exc)
+                return self._remembered[key]
+            if mode == "open":
+                self.failed_open += 1
+                logger.warning("Failing open for %s: %s", policy_path, exc)
+                return {"allow": True}
+        self.failed_closed += 1
+        raise PolicyUnavailableError(policy_path, self.breaker.retry_after()) from exc
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency.quantile(0.5)
+        p99 = self.latency.quantile(0.99)
+        return {
+            **self.breaker.stats(),
+            "timeout_seconds": round(self.timeout(), 6),
+            "latency_p50_seconds": None if p50 is None else round(p50, 6),
+            "latency_p99_seconds": None if p99 is None else round(p99, 6),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "timeouts": self.timeouts,
+            "served_cached": self.served_cached,
+            "failed_open": self.failed_open,
+            "failed_closed": self.failed_closed,
+        }
+
+    async def close(self) -> None:
+        await self._backend.close()
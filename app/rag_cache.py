@@ -0,0 +1,172 @@
+"""
+Result cache for RAG searches, invalidated by Postgres NOTIFY on table writes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import asyncpg  # type: ignore[import-untyped]
+
+from app.models.rag import RAGSearchResult
+
+logger = logging.getLogger(__name__)
+
+
+class RAGResultCache:
+    """
+    Bounded TTL cache of search results keyed on (table, embedding, top_k, filters).
+
+    ``invalidate`` bumps a generation counter, so a search that started before
+    a write cannot store its (possibly stale) rows afterwards.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, Tuple[float, List[RAGSearchResult]]] = (
+            OrderedDict()
+        )
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(
+        table: str,
+        embedding: Sequence[float],
+        top_k: int,
+        filters: Dict[str, Any] | None = None,
+        tuning: Dict[str, int] | None = None,
+    ) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{table}\0{top_k}\0".encode())
+        digest.update(
+            json.dumps([filters or {}, tuning or {}], sort_keys=True).encode()
+        )
+        # Hash the float32 bytes the database will see, not the Python floats.
+        digest.update(array("f", embedding).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> List[RAGSearchResult] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, key: str, results: List[RAGSearchResult], generation: int) -> None:
+        if generation != self.generation or self._max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + self._ttl, list(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class NotifyInvalidator:
+    """
+    Clears a ``RAGResultCache`` whenever Postgres sends a NOTIFY on ``channel``.
+
+    Uses its own connection outside the query pool. While that connection is
+    down ``listening`` is False and callers should bypass the cache; it is
+    re-established every ``retry_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str,
+        cache: RAGResultCache,
+        *,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self._dsn = dsn
+        self._channel = channel
+        self._cache = cache
+        self._retry_interval = retry_interval
+        self._connection: asyncpg.Connection | None = None
+        self._reconnect: asyncio.Task[None] | None = None
+        self._closed = False
+
+    @property
+    def listening(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    async def start(self) -> None:
+        try:
+            await self._connect()
+        except Exception as exc:  # pragma: no cover - database unavailable
+            logger.warning("RAG cache invalidation unavailable: %s", exc)
+            self._schedule_reconnect()
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(dsn=self._dsn)
+        await connection.add_listener(self._channel, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        # Anything cached before we were listening may have missed a write.
+        self._cache.invalidate()
+        self._connection = connection
+
+    def _on_notify(self, _: Any, __: int, channel: str, payload: str) -> None:
+        logger.debug("Invalidating RAG cache on %s: %s", channel, payload)
+        self._cache.invalidate()
+
+    def _on_terminate(self, _: Any) -> None:
+        self._connection = None
+        self._cache.invalidate()
+        if not self._closed:
+            logger.warning("RAG cache invalidation connection lost")
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnect is None or self._reconnect.done():
+            self._reconnect = asyncio.ensure_future(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        while not self._closed and not self.listening:
+            await asyncio.sleep(self._retry_interval)
+            try:
+                await self._connect()
+            except Exception as exc:  # pragma: no cover - database unavailable
+                logger.debug("RAG cache invalidation reconnect failed: %s", exc)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
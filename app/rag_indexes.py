@@ -0,0 +1,71 @@
+"""
+ANN and metadata indexes on the RAG table.
+
+Run once per deployment, not from every worker's startup: an HNSW or
+IVFFlat build on a large table takes minutes to hours.
+
+    python -m app.rag_indexes
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import List
+
+import asyncpg  # type: ignore[import-untyped]
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def index_statements(settings: Settings) -> List[str]:
+    """DDL keeping the configured ANN index and a GIN index for metadata filters."""
+    table = settings.rag_table
+    vector_column = settings.rag_vector_column
+    metadata_column = settings.rag_metadata_column
+    if settings.rag_index_type == "hnsw":
+        create = (
+            f"USING hnsw ({vector_column} vector_cosine_ops) "
+            f"WITH (m = {int(settings.rag_hnsw_m)}, "
+            f"ef_construction = {int(settings.rag_hnsw_ef_construction)})"
+        )
+        stale = "ivfflat"
+    else:
+        create = (
+            f"USING ivfflat ({vector_column} vector_cosine_ops) "
+            f"WITH (lists = {int(settings.rag_ivfflat_lists)})"
+        )
+        stale = "hnsw"
+    return [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{metadata_column}_gin "
+        f"ON {table} USING gin ({metadata_column} jsonb_path_ops)",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        f"{table}_{vector_column}_{settings.rag_index_type} ON {table} {create}",
+        f"DROP INDEX CONCURRENTLY IF EXISTS {table}_{vector_column}_{stale}",
+    ]
+
+
+async def ensure_indexes(settings: Settings) -> None:
+    """
+    Create the configured ANN index and a GIN index for metadata filters.
+
+    Indexes are built ``CONCURRENTLY`` so writes continue meanwhile. The
+    other ANN kind is dropped when ``rag_index_type`` changes.
+    """
+    if settings.rag_index_type == "none":
+        return
+    # A dedicated connection: builds outlast the pool's command timeout.
+    connection = await asyncpg.connect(dsn=settings.database_url)
+    try:
+        for statement in index_statements(settings):
+            logger.info("RAG index: %s", statement)
+            await connection.execute(statement)
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(ensure_indexes(get_settings()))
@@ -0,0 +1,226 @@
+"""
+Per-tenant token-bucket rate limiting and LLM token budgets.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Protocol, Tuple
+
+import asyncpg  # type: ignore[import-untyped]
+
+from app.config import Settings
+from app.services.exceptions import RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+
+class BucketBackend(Protocol):
+    """Storage for token buckets, local to the process or shared by replicas."""
+
+    async def consume(
+        self, key: str, cost: float, rate: float, capacity: float, force: bool = False
+    ) -> Tuple[bool, float]:
+        """
+        Refill ``key`` at ``rate`` tokens/s up to ``capacity`` and take ``cost``.
+
+        Returns (allowed, tokens left). Without ``force`` nothing is taken
+        unless the bucket holds at least ``cost``; with it the balance may go
+        negative (used to charge usage after the fact).
+        """
+        ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryBucketBackend:
+    """Process-local buckets; the least recently used tenants are dropped first."""
+
+    def __init__(
+        self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    async def consume(
+        self, key: str, cost: float, rate: float, capacity: float, force: bool = False
+    ) -> Tuple[bool, float]:
+        now = self._clock()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = force or tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+class PostgresBucketBackend:
+    """Buckets in a shared Postgres table so every replica sees the same balance."""
+
+    _REFILL = (
+        "LEAST($4::float8, b.tokens + "
+        "EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at)::float8 * $3::float8)"
+    )
+    _SQL = (
+        "INSERT INTO asb_rate_limits AS b (key, tokens, updated_at, allowed) "
+        "VALUES ($1::text, CASE WHEN $5::boolean OR $2::float8 <= $4::float8 "
+        "THEN $4::float8 - $2::float8 ELSE $4::float8 END, "
+        "clock_timestamp(), $5::boolean OR $2::float8 <= $4::float8) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        f"tokens = CASE WHEN $5::boolean OR {_REFILL} >= $2::float8 "
+        f"THEN {_REFILL} - $2::float8 ELSE {_REFILL} END, "
+        "updated_at = clock_timestamp(), "
+        f"allowed = $5::boolean OR {_REFILL} >= $2::float8 "
+        "RETURNING allowed, tokens"
+    )
+    _DDL = (
+        "CREATE TABLE IF NOT EXISTS asb_rate_limits ("
+        "key TEXT PRIMARY KEY, tokens DOUBLE PRECISION NOT NULL, "
+        "updated_at TIMESTAMPTZ NOT NULL, allowed BOOLEAN NOT NULL)"
+    )
+
+    def __init__(self, dsn: str) -> None:
+        self._dsn = dsn
+        self._pool: asyncpg.Pool | None = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    pool = await asyncpg.create_pool(
+                        dsn=self._dsn, min_size=1, max_size=4
+                    )
+                    async with pool.acquire() as connection:
+                        await connection.execute(self._DDL)
+                    self._pool = pool
+        return self._pool
+
+    async def consume(
+        self, key: str, cost: float, rate: float, capacity: float, force: bool = False
+    ) -> Tuple[bool, float]:
+        pool = await self._get_pool()
+        async with pool.acquire() as connection:
+            row = await connection.fetchrow(
+                self._SQL, key, float(cost), float(rate), float(capacity), force
+            )
+        return bool(row["allowed"]), float(row["tokens"])
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+class TenantQuota:
+    """Rate-limit state admitted for one request, passed on to the services."""
+
+    def __init__(
+        self,
+        limiter: "RateLimiter",
+        tenant_id: str,
+        requests_remaining: float | None,
+        tokens_remaining: float | None,
+    ) -> None:
+        self._limiter = limiter
+        self.tenant_id = tenant_id
+        self.requests_remaining = requests_remaining
+        self.tokens_remaining = tokens_remaining
+
+    async def charge_tokens(self, tokens: int) -> None:
+        """Deduct LLM tokens reported by the upstream ``usage`` block."""
+        remaining = await self._limiter.charge_tokens(self.tenant_id, tokens)
+        if remaining is not None:
+            self.tokens_remaining = remaining
+
+    def as_context(self) -> Dict[str, Any]:
+        """Remaining budget as exposed to policies in the event context."""
+        budget: Dict[str, Any] = {"tenant_id": self.tenant_id}
+        if self.requests_remaining is not None:
+            budget["requests_remaining"] = math.floor(self.requests_remaining)
+        if self.tokens_remaining is not None:
+            budget["tokens_remaining"] = math.floor(self.tokens_remaining)
+        return budget
+
+
+class RateLimiter:
+    """Enforces a request-rate bucket and an LLM token budget per tenant."""
+
+    def __init__(self, settings: Settings, backend: BucketBackend) -> None:
+        self._backend = backend
+        self._request_rate = settings.rate_limit_requests_per_second
+        self._request_burst = float(settings.rate_limit_burst)
+        self._token_budget = float(settings.llm_token_budget)
+        self._token_rate = (
+            self._token_budget / settings.llm_token_budget_period
+            if settings.llm_token_budget
+            else 0.0
+        )
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._request_rate or self._token_budget)
+
+    async def admit(self, tenant_id: str | None, *, llm: bool = False) -> TenantQuota:
+        """
+        Take one request token; raise ``RateLimitedError`` when exhausted.
+
+        The LLM token budget only gates ``llm`` requests, and is checked first
+        so a tenant refused for tokens does not also lose a request token.
+        """
+        tenant = tenant_id or "anonymous"
+        requests_remaining: float | None = None
+        tokens_remaining: float | None = None
+
+        if llm and self._token_budget:
+            _, tokens_remaining = await self._backend.consume(
+                f"tok:{tenant}", 0, self._token_rate, self._token_budget
+            )
+            if tokens_remaining <= 0:
+                self.limited += 1
+                retry_after = (1 - tokens_remaining) / self._token_rate
+                raise RateLimitedError(
+                    "LLM token budget exhausted", math.ceil(retry_after)
+                )
+
+        if self._request_rate:
+            allowed, requests_remaining = await self._backend.consume(
+                f"req:{tenant}", 1, self._request_rate, self._request_burst
+            )
+            if not allowed:
+                self.limited += 1
+                retry_after = (1 - requests_remaining) / self._request_rate
+                raise RateLimitedError(
+                    "Request rate limit exceeded", math.ceil(retry_after)
+                )
+
+        self.allowed += 1
+        return TenantQuota(self, tenant, requests_remaining, tokens_remaining)
+
+    async def charge_tokens(self, tenant_id: str, tokens: int) -> float | None:
+        if not self._token_budget or tokens <= 0:
+            return None
+        _, remaining = await self._backend.consume(
+            f"tok:{tenant_id}", tokens, self._token_rate, self._token_budget, True
+        )
+        return remaining
+
+    async def close(self) -> None:
+        await self._backend.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"allowed": self.allowed, "limited": self.limited}
@@ -0,0 +1,205 @@
+"""
+Exact-match response cache for deterministic chat completions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Protocol, Tuple
+
+from app.models.llm import ChatCompletionRequest, ChatCompletionResponse
+
+logger = logging.getLogger(__name__)
+
+
+def is_deterministic(request: ChatCompletionRequest) -> bool:
+    """Only non-streaming temperature-0 requests have a reusable answer."""
+    return request.temperature == 0 and not request.stream
+
+
+def completion_key(request: ChatCompletionRequest, tenant_id: str | None) -> str:
+    """Hash of the tenant plus the fields that determine the completion."""
+    normalized = json.dumps(
+        {
+            "tenant": tenant_id or "anonymous",
+            "model": request.model,
+            "messages": [[m.role, m.content] for m in request.messages],
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class ResponseStore(Protocol):
+    """Storage backend for serialized chat completion responses."""
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes) -> None: ...
+
+    async def close(self) -> None: ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryResponseStore:
+    """In-process LRU store with per-entry TTL."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._entries[key] = (self._clock() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseStore:
+    """Local on-disk store so cached answers survive restarts."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.evictions = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    def _get(self, key: str) -> bytes | None:
+        now = self._clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.evictions += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            return bytes(row[0])
+
+    def _set(self, key: str, value: bytes) -> None:
+        now = self._clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, now + self._ttl, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            overflow = self._count() - self._max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def _count(self) -> int:
+        return int(self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0])
+
+    async def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class ResponseCache:
+    """Serves repeated temperature-0 chat completions per tenant."""
+
+    cacheable = staticmethod(is_deterministic)
+    key = staticmethod(completion_key)
+
+    def __init__(self, store: ResponseStore) -> None:
+        self._store = store
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> ChatCompletionResponse | None:
+        value = await self._store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ChatCompletionResponse.model_validate_json(value)
+
+    async def set(self, key: str, response: ChatCompletionResponse) -> None:
+        await self._store.set(key, response.model_dump_json().encode())
+
+    async def close(self) -> None:
+        await self._store.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": getattr(self._store, "evictions", 0),
+        }
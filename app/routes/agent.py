@@ -2,29 +2,149 @@
 Agent action execution endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from typing import Awaitable, TypeVar
 
-from app.models.agent import AgentActionRequest, AgentActionResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+
+from app.config import Settings
+from app.idempotency import IdempotencyStore
+from app.metrics import TimedRoute
+from app.models.agent import (
+    AgentActionRequest,
+    AgentActionResponse,
+    AgentBatchRequest,
+    AgentBatchResponse,
+)
 from app.services.agent_service import AgentService
-from app.services.exceptions import PolicyDeniedError
-from app.container import get_agent_service
+from app.services.exceptions import (
+    IdempotencyKeyReusedError,
+    PolicyDeniedError,
+    ToolTimeoutError,
+)
+from app.container import (
+    admission_slot,
+    get_agent_service,
+    get_config,
+    get_idempotency_store,
+    get_tenant_quota,
+)
+
+router = APIRouter(prefix="/v1/agent", tags=["agent"], route_class=TimedRoute)
+
+T = TypeVar("T")
+
+# nginx's "client closed request"; nobody is left to read it.
+CLIENT_CLOSED_REQUEST = 499
 
-router = APIRouter(prefix="/v1/agent", tags=["agent"])
+
+class _ClientDisconnected(Exception):
+    pass
+
+
+async def _cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await ``work``, cancelling it (and its running tools) if the client leaves."""
+    task = asyncio.ensure_future(work)
+
+    async def watch() -> None:
+        # The body has been read, so the next message is the disconnect.
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        task.cancel()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if watcher.done() and not watcher.cancelled():
+            raise _ClientDisconnected from None
+        raise
+    finally:
+        watcher.cancel()
 
 
 @router.post(
     "/action/execute",
     response_model=AgentActionResponse,
     summary="Execute a pre-approved agent tool",
+    dependencies=[
+        Depends(get_tenant_quota),
+        Depends(admission_slot("agent_execute")),
+    ],
 )
 async def execute_action(
     request: AgentActionRequest,
+    raw_request: Request,
+    response: Response,
     service: AgentService = Depends(get_agent_service),
-) -> AgentActionResponse:
+    idempotency: IdempotencyStore | None = Depends(get_idempotency_store),
+    idempotency_key: str | None = Header(
+        default=None, alias="Idempotency-Key", min_length=1, max_length=255
+    ),
+    user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
+) -> AgentActionResponse | Response:
+    """
+    With an ``Idempotency-Key`` header, a retry of a successful call gets the
+    stored response back (marked ``Idempotent-Replayed: true``) instead of
+    running policy and the tool again.
+    """
     try:
-        return await service.execute(request)
+        if idempotency is None or idempotency_key is None:
+            return await _cancel_on_disconnect(raw_request, service.execute(request))
+        result, replayed = await _cancel_on_disconnect(
+            raw_request,
+            idempotency.run(
+                idempotency_key, user_id, request, lambda: service.execute(request)
+            ),
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
+    except _ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except IdempotencyKeyReusedError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": str(exc)},
+        ) from exc
     except PolicyDeniedError as exc:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={"message": str(exc)},
         ) from exc
+    except ToolTimeoutError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={"message": str(exc)},
+        ) from exc
+
+
+@router.post(
+    "/action/batch",
+    response_model=AgentBatchResponse,
+    summary="Execute many agent tools concurrently after one policy round-trip",
+    dependencies=[
+        Depends(get_tenant_quota),
+        Depends(admission_slot("agent_execute")),
+    ],
+)
+async def execute_batch(
+    request: AgentBatchRequest,
+    raw_request: Request,
+    service: AgentService = Depends(get_agent_service),
+    settings: Settings = Depends(get_config),
+) -> AgentBatchResponse | Response:
+    if len(request.actions) > settings.agent_batch_max_actions:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "Too many actions in batch "
+                f"(max {settings.agent_batch_max_actions})"
+            },
+        )
+    try:
+        return await _cancel_on_disconnect(
+            raw_request, service.execute_many(request.actions)
+        )
+    except _ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
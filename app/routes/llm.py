@@ -4,13 +4,33 @@ LLM proxy endpoints.
 
 import logging
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 
 from app.config import Settings, get_settings
+from app.container import (
+    admission_slot,
+    get_llm_flights,
+    get_llm_tenant_quota,
+    get_opa_client,
+    get_response_cache,
+    get_upstream_pool,
+)
+from app.metrics import TimedRoute
 from app.models.llm import ChatCompletionRequest, ChatCompletionResponse
+from app.opa_client import OPAClient
+from app.response_cache import ResponseCache
+from app.rate_limit import TenantQuota
+from app.services.exceptions import (
+    OverloadedError,
+    PolicyUnavailableError,
+    RateLimitedError,
+)
 from app.services.llm_proxy import handle_chat_completion
+from app.singleflight import SingleFlight
+from app.upstream import UpstreamClientPool
 
-router = APIRouter(tags=["llm"])
+router = APIRouter(tags=["llm"], route_class=TimedRoute)
 logger = logging.getLogger(__name__)
 
 
@@ -18,15 +38,37 @@ logger = logging.getLogger(__name__)
     "/v1/chat/completions",
     response_model=ChatCompletionResponse,
     summary="OpenAI-compatible chat completions proxy",
+    dependencies=[Depends(get_llm_tenant_quota), Depends(admission_slot("chat"))],
 )
 async def create_chat_completion(
     request: ChatCompletionRequest,
+    response: Response,
     settings: Settings = Depends(get_settings),
+    opa: OPAClient = Depends(get_opa_client),
+    upstream: UpstreamClientPool = Depends(get_upstream_pool),
+    cache: ResponseCache | None = Depends(get_response_cache),
+    flights: SingleFlight | None = Depends(get_llm_flights),
+    quota: TenantQuota | None = Depends(get_llm_tenant_quota),
     user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
-) -> ChatCompletionResponse:
+) -> ChatCompletionResponse | StreamingResponse:
     try:
-        return await handle_chat_completion(request, settings, user_id=user_id)
-    except HTTPException:
+        return await handle_chat_completion(
+            request,
+            settings,
+            opa,
+            upstream,
+            user_id=user_id,
+            cache=cache,
+            flights=flights,
+            quota=quota,
+            response=response,
+        )
+    except (
+        HTTPException,
+        OverloadedError,
+        PolicyUnavailableError,
+        RateLimitedError,
+    ):
         raise
     except Exception as exc:  # pragma: no cover - unexpected bug
         logger.exception("Unexpected error handling chat completion")
@@ -2,29 +2,72 @@
 Secure RAG gateway endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 
-from app.models.rag import RAGSearchRequest, RAGSearchResponse
+from app.config import Settings
+from app.metrics import TimedRoute
+from app.models.rag import (
+    RAGBatchSearchRequest,
+    RAGBatchSearchResponse,
+    RAGSearchRequest,
+    RAGSearchResponse,
+)
 from app.services.exceptions import PolicyDeniedError
 from app.services.rag_service import RAGService
-from app.container import get_rag_service
+from app.container import (
+    admission_slot,
+    get_config,
+    get_rag_service,
+    get_tenant_quota,
+)
 
-router = APIRouter(prefix="/v1/rag", tags=["rag"])
+router = APIRouter(prefix="/v1/rag", tags=["rag"], route_class=TimedRoute)
 
 
 @router.post(
     "/search_safe",
     response_model=RAGSearchResponse,
     summary="Search pgvector corpus with policy enforcement",
+    dependencies=[
+        Depends(get_tenant_quota),
+        Depends(admission_slot("rag_search")),
+    ],
 )
 async def search_safe(
     request: RAGSearchRequest,
     service: RAGService = Depends(get_rag_service),
+    user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
 ) -> RAGSearchResponse:
     try:
-        return await service.search(request)
+        return await service.search(request, tenant_id=user_id)
     except PolicyDeniedError as exc:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={"message": str(exc)},
         ) from exc
+
+
+@router.post(
+    "/search_batch",
+    response_model=RAGBatchSearchResponse,
+    summary="Run many policy-checked searches in one round-trip",
+    dependencies=[
+        Depends(get_tenant_quota),
+        Depends(admission_slot("rag_search")),
+    ],
+)
+async def search_batch(
+    request: RAGBatchSearchRequest,
+    service: RAGService = Depends(get_rag_service),
+    settings: Settings = Depends(get_config),
+    user_id: str | None = Header(default=None, alias="X-ASB-User-Id"),
+) -> RAGBatchSearchResponse:
+    if len(request.queries) > settings.rag_batch_max_queries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "Too many queries in batch "
+                f"(max {settings.rag_batch_max_queries})"
+            },
+        )
+    return await service.search_many(request.queries, tenant_id=user_id)
@@ -4,23 +4,25 @@ Agent action gateway guarded by policy decisions.
 
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
-from typing import Awaitable, Callable, Dict
+from typing import Dict, List
 
+from app import metrics
 from app.config import Settings
-from app.models.agent import AgentActionRequest, AgentActionResponse
-from app.models.events import (
-    EventContext,
-    EventOperation,
-    EventResource,
-    EventSubject,
-    SecurityEvent,
+from app.models.agent import (
+    AgentActionRequest,
+    AgentActionResponse,
+    AgentBatchItem,
+    AgentBatchResponse,
 )
 from app.opa_client import OPAClient
+from app.policy_input import PolicyInput, security_event
+from app.tools import ExecutionMode, ToolHandler, ToolRegistry
 
-from .exceptions import PolicyDeniedError
+from .exceptions import OverloadedError, PolicyDeniedError, ToolTimeoutError
 
-ToolHandler = Callable[[Dict[str, str]], Awaitable[Dict[str, str]]]
+_EXECUTE = {"action": "execute", "component": "agent_gateway"}
 
 
 class AgentService:
@@ -29,33 +31,124 @@ class AgentService:
     def __init__(self, settings: Settings, opa_client: OPAClient) -> None:
         self._settings = settings
         self._opa = opa_client
-        self._tool_registry: Dict[str, ToolHandler] = {
-            "ping": self._tool_ping,
-            "whoami": self._tool_whoami,
-        }
+        self._tools = ToolRegistry(
+            default_timeout=settings.agent_tool_timeout,
+            default_max_concurrent=settings.agent_tool_max_concurrent,
+            thread_workers=settings.agent_thread_workers,
+            process_workers=settings.agent_process_workers,
+            cache_max_entries=settings.agent_tool_cache_max_entries,
+        )
+        self.register_tool("ping", self._tool_ping)
+        self.register_tool("whoami", self._tool_whoami, cache_ttl=60.0)
+
+    @property
+    def tools(self) -> ToolRegistry:
+        return self._tools
+
+    def register_tool(
+        self,
+        name: str,
+        handler: ToolHandler,
+        *,
+        mode: ExecutionMode = "async",
+        cache_ttl: float = 0.0,
+    ) -> None:
+        """
+        Register ``handler`` with the timeout and limit configured for ``name``.
+
+        ``cache_ttl`` is how long the tool's output may be reused for the same
+        input; only pure tools should declare one. Settings can override it.
+        """
+        self._tools.register(
+            name,
+            handler,
+            mode=mode,
+            max_concurrent=self._settings.agent_tool_limits.get(name),
+            timeout=self._settings.agent_tool_timeouts.get(name),
+            cache_ttl=self._settings.agent_tool_cache_ttls.get(name, cache_ttl),
+        )
 
     async def execute(self, request: AgentActionRequest) -> AgentActionResponse:
         if request.tool not in self._settings.agent_allowed_tools:
             raise PolicyDeniedError(f"Tool '{request.tool}' is not allowed")
 
-        event = SecurityEvent(
-            subject=EventSubject(user_id=request.user or "agent"),
-            operation=EventOperation(action="execute", component="agent_gateway"),
-            resource=EventResource(type="tool", name=request.tool),
-            context=EventContext(metadata=request.input or {}),
-        )
+        with metrics.timed("event_build"):
+            event = self._event(request)
 
         decision = await self._opa.evaluate("agent/allow", event)
         if not decision.allow:
             raise PolicyDeniedError(decision.reason)
 
-        handler = self._tool_registry.get(request.tool)
-        if handler is None:
+        if self._tools.get(request.tool) is None:
             raise PolicyDeniedError(f"Tool '{request.tool}' is not implemented")
 
-        output = await handler(request.input or {})
+        output = await self._tools.run(request.tool, request.input or {})
         return AgentActionResponse(tool=request.tool, output=output)
 
+    async def execute_many(
+        self, requests: List[AgentActionRequest]
+    ) -> AgentBatchResponse:
+        """
+        Check every action in one policy round-trip, then run the allowed ones
+        concurrently. Failures are reported per action, in request order.
+        """
+        items: List[AgentBatchItem | None] = [None] * len(requests)
+        checked: List[int] = []
+        for index, request in enumerate(requests):
+            if request.tool not in self._settings.agent_allowed_tools:
+                items[index] = _denied(request, f"Tool '{request.tool}' is not allowed")
+            else:
+                checked.append(index)
+
+        with metrics.timed("event_build"):
+            checks = [("agent/allow", self._event(requests[i])) for i in checked]
+        decisions = await self._opa.evaluate_many(checks)
+
+        runnable: List[int] = []
+        for index, decision in zip(checked, decisions):
+            request = requests[index]
+            if not decision.allow:
+                items[index] = _denied(
+                    request, decision.reason or "Request blocked by policy"
+                )
+            elif self._tools.get(request.tool) is None:
+                items[index] = _denied(
+                    request, f"Tool '{request.tool}' is not implemented"
+                )
+            else:
+                runnable.append(index)
+
+        outputs = await asyncio.gather(*(self._run(requests[i]) for i in runnable))
+        for index, item in zip(runnable, outputs):
+            items[index] = item
+        return AgentBatchResponse(results=[item for item in items if item is not None])
+
+    async def _run(self, request: AgentActionRequest) -> AgentBatchItem:
+        try:
+            output = await self._tools.run(request.tool, request.input or {})
+        except ToolTimeoutError as exc:
+            return AgentBatchItem(tool=request.tool, status="timeout", reason=str(exc))
+        except OverloadedError as exc:
+            return AgentBatchItem(tool=request.tool, status="error", reason=str(exc))
+        except Exception as exc:
+            return AgentBatchItem(
+                tool=request.tool,
+                status="error",
+                reason=f"Tool failed: {type(exc).__name__}",
+            )
+        return AgentBatchItem(tool=request.tool, status="success", output=output)
+
+    def _event(self, request: AgentActionRequest) -> PolicyInput:
+        return security_event(
+            request.user or "agent",
+            _EXECUTE,
+            {"type": "tool", "name": request.tool},
+            request.input or {},
+        )
+
+    def close(self) -> None:
+        self._tools.close()
+
     async def _tool_ping(self, _: Dict[str, str]) -> Dict[str, str]:
         return {
             "message": "pong",
@@ -65,5 +158,13 @@ class AgentService:
     async def _tool_whoami(self, _: Dict[str, str]) -> Dict[str, str]:
         return {
             "service": self._settings.app_name,
-            "policy_backend": self._settings.opa_url,
+            "policy_backend": (
+                self._settings.opa_url
+                if self._settings.policy_backend == "opa"
+                else "embedded"
+            ),
         }
+
+
+def _denied(request: AgentActionRequest, reason: str) -> AgentBatchItem:
+    return AgentBatchItem(tool=request.tool, status="denied", reason=reason)
@@ -8,3 +8,45 @@ class PolicyDeniedError(Exception):
         message = reason or "Request blocked by policy"
         super().__init__(message)
         self.reason = reason
+
+
+class OverloadedError(Exception):
+    """Raised when a route or backend has no capacity left to queue a request."""
+
+    def __init__(self, resource: str, retry_after: int = 1) -> None:
+        super().__init__(f"{resource} is overloaded, retry later")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class RateLimitedError(Exception):
+    """Raised when a tenant exceeds its request rate or token budget."""
+
+    def __init__(self, message: str, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.retry_after = max(1, retry_after)
+
+
+class PolicyUnavailableError(Exception):
+    """Raised when no policy decision can be obtained and the path fails closed."""
+
+    def __init__(self, policy_path: str, retry_after: int = 1) -> None:
+        super().__init__(f"Policy backend unavailable for {policy_path}")
+        self.policy_path = policy_path
+        self.retry_after = max(1, retry_after)
+
+
+class ToolTimeoutError(Exception):
+    """Raised when an agent tool does not finish within its timeout."""
+
+    def __init__(self, tool: str, timeout: float) -> None:
+        super().__init__(f"Tool '{tool}' timed out after {timeout:g}s")
+        self.tool = tool
+        self.timeout = timeout
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when an idempotency key is reused with a different request body."""
+
+    def __init__(self) -> None:
+        super().__init__("Idempotency-Key was already used with a different request")
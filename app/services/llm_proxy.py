@@ -4,71 +4,132 @@ LLM proxy service that enforces policies before forwarding to OpenAI.
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import math
 from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from uuid import uuid4
 
 import httpx
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
 
+from app import metrics
+from app.admission import ConcurrencyLimiter, limiter_slot
 from app.config import Settings
-from app.models.asb_events import SecurityEventLlmInput
 from app.models.llm import (
     ChatCompletionChoice,
     ChatCompletionRequest,
     ChatCompletionResponse,
+    ChatCompletionUsage,
     ChatMessage,
 )
-from app.opa_client import evaluate_policy
+from app.opa_client import OPAClient
+from app.policy_input import PolicyInput, llm_event
+from app.rate_limit import TenantQuota
+from app.response_cache import ResponseCache, completion_key, is_deterministic
+from app.services.exceptions import OverloadedError, PolicyUnavailableError
+from app.singleflight import SingleFlight
+from app.upstream import UpstreamClientPool
 
 logger = logging.getLogger(__name__)
 
+# Used to charge streams that end before the upstream reports ``usage``.
+_CHARS_PER_TOKEN = 4
+
 
 async def handle_chat_completion(
     request: ChatCompletionRequest,
     settings: Settings,
+    opa: OPAClient,
+    upstream: UpstreamClientPool,
     user_id: str | None = None,
-) -> ChatCompletionResponse:
-    """Evaluate policy and forward the chat completion request upstream."""
-    if request.stream:
-        raise HTTPException(
-            status_code=400, detail={"message": "Streaming responses are not supported"}
-        )
+    *,
+    cache: ResponseCache | None = None,
+    flights: SingleFlight | None = None,
+    quota: TenantQuota | None = None,
+    response: Response | None = None,
+) -> ChatCompletionResponse | StreamingResponse:
+    """
+    Evaluate policy and forward the chat completion request upstream.
 
+    When a response cache is configured, deterministic requests are answered
+    from it after the policy check passes; ``response`` receives an
+    ``X-ASB-Cache`` header of HIT, MISS or BYPASS. With ``flights``,
+    concurrent identical deterministic requests share one upstream call.
+    ``quota`` exposes the tenant's remaining budget to the policy and is
+    charged with the upstream ``usage`` token count.
+    """
     if not settings.openai_api_key:
         raise HTTPException(
             status_code=500,
             detail={"message": "OPENAI_API_KEY is not configured for upstream access"},
         )
 
-    event = _build_security_event(request, settings, user_id)
+    with metrics.timed("event_build"):
+        event = _build_security_event(request, settings, user_id, quota)
 
     try:
-        opa_raw = await evaluate_policy("asb/prompt", event.model_dump())
+        decision = await opa.evaluate("prompt/allow", event)
     except httpx.HTTPError as exc:  # pragma: no cover - network failure
-        logger.exception("OPA evaluation failed for event %s", event.event_id)
+        logger.exception("OPA evaluation failed for event %s", event["event_id"])
         raise HTTPException(
             status_code=502, detail={"message": "Policy evaluation failed"}
         ) from exc
 
-    allowed, reason = _parse_policy_result(opa_raw)
-    if not allowed:
-        logger.info("Policy denied event %s: %s", event.event_id, reason)
+    if not decision.allow:
+        logger.info("Policy denied event %s: %s", event["event_id"], decision.reason)
         raise HTTPException(
             status_code=403,
-            detail={"message": reason or "Prompt rejected by policy"},
+            detail={"message": decision.reason or "Prompt rejected by policy"},
         )
 
-    logger.info("Policy allowed event %s", event.event_id)
-    return await _forward_to_upstream(request, settings)
+    logger.info("Policy allowed event %s", event["event_id"])
+    if request.stream:
+        return await _stream_from_upstream(
+            request, settings, opa, upstream, user_id, quota
+        )
+
+    if cache is None and flights is None:
+        return await _forward_to_upstream(request, settings, upstream, quota)
+
+    if not is_deterministic(request):
+        if cache is not None:
+            _set_cache_status(response, "BYPASS")
+        return await _forward_to_upstream(request, settings, upstream, quota)
+
+    key = completion_key(request, user_id)
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            _set_cache_status(response, "HIT")
+            return cached
+        _set_cache_status(response, "MISS")
+
+    async def fetch() -> ChatCompletionResponse:
+        completion = await _forward_to_upstream(request, settings, upstream, quota)
+        if cache is not None:
+            await cache.set(key, completion)
+        return completion
+
+    if flights is None:
+        return await fetch()
+    return await flights.do(key, fetch)
+
+
+def _set_cache_status(response: Response | None, status: str) -> None:
+    if response is not None:
+        response.headers["X-ASB-Cache"] = status
 
 
 def _build_security_event(
-    request: ChatCompletionRequest, settings: Settings, user_id: str | None
-) -> SecurityEventLlmInput:
-    now = datetime.now(tz=timezone.utc)
-    subject = {"user": {"id": user_id or "anonymous"}}
+    request: ChatCompletionRequest,
+    settings: Settings,
+    user_id: str | None,
+    quota: TenantQuota | None = None,
+) -> PolicyInput:
     operation = {
         "category": "llm_completion",
         "name": "chat_completion",
@@ -78,53 +139,91 @@ def _build_security_event(
     }
     resource = {
         "llm": {
-            "messages": [message.model_dump() for message in request.messages],
+            "messages": [
+                {"role": message.role, "content": message.content}
+                for message in request.messages
+            ],
         }
     }
-    context = {
-        "temperature": request.temperature,
-        "max_tokens": request.max_tokens,
+    # ``policies/prompt.rego`` reads the request parameters from
+    # ``context.metadata`` and the budget from ``context.budget``.
+    metadata: Dict[str, Any] = {
+        "message_roles": [message.role for message in request.messages]
     }
-    return SecurityEventLlmInput(
-        event_id=str(uuid4()),
-        timestamp=now,
-        tenant_id=None,
-        app_id=getattr(settings, "app_name", None),
-        env=getattr(settings, "app_env", None),
-        subject=subject,
+    if request.temperature is not None:
+        metadata["temperature"] = request.temperature
+    if request.max_tokens is not None:
+        metadata["max_tokens"] = request.max_tokens
+    context: Dict[str, Any] = {"metadata": metadata}
+    if quota is not None:
+        context["budget"] = quota.as_context()
+    return llm_event(
+        str(uuid4()),
+        datetime.now(tz=timezone.utc),
+        app_id=settings.app_name,
+        env=settings.app_env,
+        subject={"user_id": user_id or "anonymous"},
         operation=operation,
         resource=resource,
-        context={k: v for k, v in context.items() if v is not None},
+        context=context,
     )
 
 
-def _parse_policy_result(response: Dict[str, Any]) -> Tuple[bool, str | None]:
-    result_block = response.get("result")
-    if result_block is None:
-        return False, "Policy returned no decision"
-    if isinstance(result_block, bool):
-        return result_block, None
-    allow = bool(result_block.get("allow", False))
-    reason = result_block.get("reason")
-    return allow, reason
+def _build_output_event(
+    request: ChatCompletionRequest,
+    settings: Settings,
+    user_id: str | None,
+    output: str,
+    offset: int = 0,
+    checked_sha256: str | None = None,
+) -> PolicyInput:
+    llm: Dict[str, Any] = {"output": output}
+    if offset:
+        # ``output`` starts ``offset`` characters into the completion; the
+        # text before it was already checked and hashes to ``checked_sha256``.
+        llm["offset"] = offset
+        llm["checked_sha256"] = checked_sha256
+    return llm_event(
+        str(uuid4()),
+        datetime.now(tz=timezone.utc),
+        app_id=settings.app_name,
+        env=settings.app_env,
+        subject={"user_id": user_id or "anonymous"},
+        operation={
+            "category": "llm_completion",
+            "name": "chat_completion",
+            "direction": "output",
+            "stage": "streaming",
+            "model": {"name": request.model, "provider": "upstream", "mode": "chat"},
+        },
+        resource={"llm": llm},
+    )
 
 
-async def _forward_to_upstream(
-    request: ChatCompletionRequest, settings: Settings
-) -> ChatCompletionResponse:
-    base_url = settings.openai_base_url.rstrip("/")
-    url = f"{base_url}/v1/chat/completions"
-    headers = {
+def _upstream_headers(settings: Settings) -> Dict[str, str]:
+    return {
         "Authorization": f"Bearer {settings.openai_api_key}",
         "Content-Type": "application/json",
     }
+
+
+async def _forward_to_upstream(
+    request: ChatCompletionRequest,
+    settings: Settings,
+    upstream: UpstreamClientPool,
+    quota: TenantQuota | None = None,
+) -> ChatCompletionResponse:
+    client = upstream.get(settings.openai_base_url)
     payload = request.model_dump(exclude_none=True)
     try:
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(30.0, connect=10.0)
-        ) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+        async with limiter_slot(upstream.limiter):
+            with metrics.timed("upstream"):
+                response = await client.post(
+                    "/v1/chat/completions",
+                    headers=_upstream_headers(settings),
+                    json=payload,
+                )
+        response.raise_for_status()
     except httpx.HTTPStatusError as exc:  # pragma: no cover - upstream failure
         logger.warning(
             "Upstream chat completion failed: status=%s body=%s",
@@ -144,7 +243,316 @@ async def _forward_to_upstream(
             status_code=502, detail={"message": "Failed to reach upstream model"}
         ) from exc
 
-    return _map_response(response.json(), request)
+    with metrics.timed("response_map"):
+        completion = _map_response(response.json(), request)
+    if quota is not None and completion.usage is not None:
+        await quota.charge_tokens(completion.usage.total_tokens)
+    return completion
+
+
+async def _stream_from_upstream(
+    request: ChatCompletionRequest,
+    settings: Settings,
+    opa: OPAClient,
+    upstream: UpstreamClientPool,
+    user_id: str | None,
+    quota: TenantQuota | None = None,
+) -> StreamingResponse:
+    client = upstream.get(settings.openai_base_url)
+    payload = request.model_dump(exclude_none=True)
+    if quota is not None and quota.tokens_remaining is not None:
+        # Ask for a final usage chunk so the token budget can be charged.
+        payload["stream_options"] = {"include_usage": True}
+    upstream_request = client.build_request(
+        "POST",
+        "/v1/chat/completions",
+        headers=_upstream_headers(settings),
+        json=payload,
+    )
+    # The upstream slot is held until the relayed stream is closed.
+    limiter = upstream.limiter
+    if limiter is not None:
+        await limiter.acquire()
+    try:
+        # Streams are timed to the upstream's response headers.
+        with metrics.timed("upstream"):
+            response = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as exc:  # pragma: no cover - network failure
+        if limiter is not None:
+            limiter.release()
+        logger.exception("Upstream chat completion network error")
+        raise HTTPException(
+            status_code=502, detail={"message": "Failed to reach upstream model"}
+        ) from exc
+
+    if response.is_error:
+        body = await response.aread()
+        await response.aclose()
+        if limiter is not None:
+            limiter.release()
+        logger.warning(
+            "Upstream chat completion failed: status=%s body=%s",
+            response.status_code,
+            body[:512],
+        )
+        raise HTTPException(
+            status_code=response.status_code,
+            detail={
+                "message": "Upstream model error",
+                "upstream_status": response.status_code,
+            },
+        )
+
+    return StreamingResponse(
+        _relay_stream(response, request, settings, opa, user_id, limiter, quota),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def _relay_stream(
+    response: httpx.Response,
+    request: ChatCompletionRequest,
+    settings: Settings,
+    opa: OPAClient,
+    user_id: str | None,
+    limiter: ConcurrencyLimiter | None = None,
+    quota: TenantQuota | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Relay upstream SSE bytes to the client.
+
+    Without an output policy or quota chunks are passed through untouched.
+    With an output policy, complete lines are held back until another
+    ``stream_output_window_chars`` of completion text has accumulated, that
+    window is checked (see ``_OutputChecker``), and the checked lines are
+    released; a line still being received stays held. A deny ends the stream
+    with an error event. With a quota, the final ``usage`` chunk is charged
+    against the tenant's token budget however the stream ends; a stream cut
+    off before it (by the policy or a client disconnect) is charged an
+    estimate of the prompt and of the completion text relayed so far.
+    """
+    policy_path = settings.stream_output_policy
+    checker = (
+        _OutputChecker(policy_path, request, settings, opa, user_id)
+        if policy_path
+        else None
+    )
+    usage_tokens = 0
+    relayed_chars = 0
+    try:
+        if checker is None and quota is None:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+            return
+
+        held = bytearray()
+        held_chars = 0
+        partial_line = b""
+        released = b"\n\n"
+        async for chunk in response.aiter_bytes():
+            *lines, partial_line = (partial_line + chunk).split(b"\n")
+            for line in lines:
+                payload = _sse_payload(line)
+                if payload is None:
+                    continue
+                text = _delta_text(payload)
+                held_chars += len(text)
+                if checker is not None:
+                    checker.add(text)
+                usage = payload.get("usage")
+                if usage:
+                    usage_tokens = int(usage.get("total_tokens") or 0)
+            if checker is None:
+                yield chunk
+                relayed_chars += held_chars
+                held_chars = 0
+                continue
+            if lines:
+                held += b"\n".join(lines) + b"\n"
+            if checker.pending < checker.window:
+                continue
+            reason = await checker.check()
+            if reason is not None:
+                yield _policy_cutoff(reason, released)
+                return
+            if held:
+                released = bytes(held[-2:])
+                yield bytes(held)
+                relayed_chars += held_chars
+                held_chars = 0
+                held.clear()
+
+        if checker is not None:
+            # The stream is over, so an unterminated last line is complete.
+            payload = _sse_payload(partial_line)
+            if payload is not None:
+                text = _delta_text(payload)
+                held_chars += len(text)
+                checker.add(text)
+            held += partial_line
+            if checker.pending:
+                reason = await checker.check()
+                if reason is not None:
+                    yield _policy_cutoff(reason, released)
+                    return
+            if held:
+                yield bytes(held)
+                relayed_chars += held_chars
+    finally:
+        await response.aclose()
+        if limiter is not None:
+            limiter.release()
+        if checker is not None:
+            await checker.finish()
+        if quota is not None:
+            await quota.charge_tokens(
+                usage_tokens or _estimate_tokens(request, relayed_chars)
+            )
+
+
+def _estimate_tokens(request: ChatCompletionRequest, completion_chars: int) -> int:
+    """Rough token count of the prompt plus ``completion_chars`` of output."""
+    chars = completion_chars + sum(len(message.content) for message in request.messages)
+    return math.ceil(chars / _CHARS_PER_TOKEN)
+
+
+class _OutputChecker:
+    """
+    Checks streamed completion text against the output policy, window by window.
+
+    Each check sends only the text added since the previous one, prefixed by
+    the last ``window`` characters already checked so a match spanning two
+    windows is still seen, together with its ``offset`` in the completion
+    and the SHA-256 of the text checked before it. Policy input therefore
+    stays bounded by the window however long the stream runs, and only the
+    final decision (the deny, or the last allow) is written to the audit log.
+    """
+
+    def __init__(
+        self,
+        policy_path: str,
+        request: ChatCompletionRequest,
+        settings: Settings,
+        opa: OPAClient,
+        user_id: str | None,
+    ) -> None:
+        self._policy_path = policy_path
+        self._request = request
+        self._settings = settings
+        self._opa = opa
+        self._user_id = user_id
+        self.window = max(1, settings.stream_output_window_chars)
+        self._new: List[str] = []
+        self.pending = 0
+        self._tail = ""
+        self._checked_length = 0
+        self._checked = hashlib.sha256()
+        self._last: Tuple[PolicyInput, str | None] | None = None
+
+    def add(self, text: str) -> None:
+        if text:
+            self._new.append(text)
+            self.pending += len(text)
+
+    async def check(self) -> str | None:
+        """Check the pending text; return a deny reason, or None if allowed."""
+        text = "".join(self._new)
+        event, reason = await _check_output(
+            self._policy_path,
+            self._request,
+            self._settings,
+            self._opa,
+            self._user_id,
+            self._tail + text,
+            offset=self._checked_length - len(self._tail),
+            checked_sha256=self._checked.hexdigest(),
+        )
+        self._last = (event, reason)
+        self._checked.update(text.encode())
+        self._checked_length += len(text)
+        self._tail = (self._tail + text)[-self.window :]
+        self._new.clear()
+        self.pending = 0
+        return reason
+
+    async def finish(self) -> None:
+        """Audit the final decision once the stream ends, however it ends."""
+        last, self._last = self._last, None
+        audit = self._opa.audit
+        if last is not None and audit is not None:
+            event, reason = last
+            await audit.record(self._policy_path, event, reason is None, reason)
+
+
+def _sse_payload(line: bytes) -> Dict[str, Any] | None:
+    """Decode the JSON body of one ``data:`` SSE line, if it has one."""
+    if not line.startswith(b"data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == b"[DONE]":
+        return None
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _delta_text(payload: Dict[str, Any]) -> str:
+    """Extract the streamed completion text from one decoded SSE chunk."""
+    return "".join(
+        (choice.get("delta") or {}).get("content") or ""
+        for choice in payload.get("choices") or []
+    )
+
+
+async def _check_output(
+    policy_path: str,
+    request: ChatCompletionRequest,
+    settings: Settings,
+    opa: OPAClient,
+    user_id: str | None,
+    output: str,
+    offset: int = 0,
+    checked_sha256: str | None = None,
+) -> Tuple[PolicyInput, str | None]:
+    """
+    Check one window of streamed output without auditing it.
+
+    Returns the event sent and a deny reason, or None if allowed.
+    """
+    with metrics.timed("event_build"):
+        event = _build_output_event(
+            request, settings, user_id, output, offset, checked_sha256
+        )
+    try:
+        decision = await opa.evaluate(policy_path, event, audit=False)
+    except (
+        httpx.HTTPError,
+        OverloadedError,
+        PolicyUnavailableError,
+    ):  # pragma: no cover - network failure
+        logger.exception(
+            "Output policy evaluation failed for event %s", event["event_id"]
+        )
+        return event, "Output policy evaluation failed"
+    if decision.allow:
+        return event, None
+    logger.info(
+        "Output policy stopped stream %s: %s", event["event_id"], decision.reason
+    )
+    return event, decision.reason or "Response stopped by policy"
+
+
+def _policy_cutoff(reason: str, released: bytes = b"\n\n") -> bytes:
+    """Error event ending a stream whose last released bytes were ``released``."""
+    error = {"error": {"message": reason, "type": "policy_violation"}}
+    event = f"data: {json.dumps(error)}\n\ndata: [DONE]\n\n".encode()
+    # Start on a fresh line after a blank one, so it is an event of its own.
+    if released.endswith(b"\n\n"):
+        return event
+    return (b"\n" if released.endswith(b"\n") else b"\n\n") + event
 
 
 def _map_response(
@@ -167,9 +575,11 @@ def _map_response(
             )
         )
 
+    usage_payload = payload.get("usage")
     return ChatCompletionResponse(
         id=payload.get("id", f"asb-{uuid4().hex}"),
         created=created_ts,
         model=payload.get("model", request.model),
         choices=choices,
+        usage=ChatCompletionUsage(**usage_payload) if usage_payload else None,
     )
@@ -5,118 +5,631 @@ Secure RAG service guarding access to the demo pgvector corpus.
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import json
 import logging
-from typing import List
+import math
+import time
+from typing import Any, AsyncIterator, Dict, List, Sequence, Set, Tuple
 
 import asyncpg  # type: ignore[import-untyped]
 
+from app import metrics
+from app.admission import ConcurrencyLimiter, limiter_slot
 from app.config import Settings
-from app.models.events import (
-    EventContext,
-    EventOperation,
-    EventResource,
-    EventSubject,
-    SecurityEvent,
-)
 from app.models.rag import (
+    RAGBatchSearchItem,
+    RAGBatchSearchResponse,
     RAGSearchRequest,
     RAGSearchResponse,
     RAGSearchResult,
 )
+from app.embeddings import Embedder, LocalEmbeddingProvider
 from app.opa_client import OPAClient
+from app.pgvector import Vector, register_vector_codec
+from app.policy_input import PolicyInput, security_event
+from app.rag_cache import NotifyInvalidator, RAGResultCache
+from app.vector_index import VectorIndex
 
-from .exceptions import PolicyDeniedError
+from .exceptions import OverloadedError, PolicyDeniedError
 
 logger = logging.getLogger(__name__)
 
+_SEARCH = {"action": "search", "component": "rag_gateway"}
+_RETRIEVE = {"action": "retrieve", "component": "rag_gateway"}
+
 
 class RAGService:
     """Performs guarded semantic search against a pgvector-backed table."""
 
-    def __init__(self, settings: Settings, opa_client: OPAClient) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        opa_client: OPAClient,
+        db_limiter: ConcurrencyLimiter | None = None,
+        embedder: Embedder | None = None,
+        result_cache: RAGResultCache | None = None,
+        local_index: VectorIndex | None = None,
+    ) -> None:
         self._settings = settings
         self._opa = opa_client
+        self._db_limiter = db_limiter
+        self._embedder = embedder or Embedder(
+            LocalEmbeddingProvider(settings.embedding_dimensions)
+        )
+        self._cache = result_cache
+        self._local_index = local_index
+        self._local_primary = (
+            local_index is not None and settings.rag_local_index_mode == "primary"
+        )
+        self._invalidator: NotifyInvalidator | None = None
+        if result_cache is not None and settings.rag_cache_notify_channel:
+            self._invalidator = NotifyInvalidator(
+                settings.database_url,
+                settings.rag_cache_notify_channel,
+                result_cache,
+            )
         self._pool: asyncpg.Pool | None = None
         self._pool_lock = asyncio.Lock()
+        # Built once; asyncpg prepares each statement once per connection and
+        # reuses it from the connection's statement cache afterwards.
+        self._search_sql, self._filtered_sql, self._batch_sql = self._build_sql(
+            settings
+        )
+        self.acquires = 0
+        self.results_checked = 0
+        self.results_filtered = 0
+        self.acquire_wait_seconds_total = 0.0
+        self.acquire_wait_seconds_max = 0.0
 
-    async def search(self, request: RAGSearchRequest) -> RAGSearchResponse:
+    async def search(
+        self, request: RAGSearchRequest, tenant_id: str | None = None
+    ) -> RAGSearchResponse:
         """Search the vector store after evaluating security policies."""
         top_k = request.top_k or self._settings.rag_top_k_default
-        event = SecurityEvent(
-            subject=EventSubject(user_id="rag-user"),
-            operation=EventOperation(action="search", component="rag_gateway"),
-            resource=EventResource(type="collection", name=self._settings.rag_table),
-            context=EventContext(
-                metadata={"top_k": top_k, "query_length": len(request.query)}
-            ),
-        )
-
+        with metrics.timed("event_build"):
+            event = self._event(request, top_k, tenant_id)
         decision = await self._opa.evaluate("rag/allow", event)
         if not decision.allow:
             raise PolicyDeniedError(decision.reason)
 
+        embedding: Sequence[float] | None = request.embedding
+        candidates = self._candidate_count(top_k)
+        while True:
+            results, embedding = await self._retrieve(request, embedding, candidates)
+            if not self._settings.rag_result_policy:
+                return RAGSearchResponse(results=results)
+            (denied,) = await self._denied_results(tenant_id, [request], [results])
+            kept = [
+                row for position, row in enumerate(results) if position not in denied
+            ]
+            wider = self._widen(top_k, candidates, len(results), len(kept))
+            if wider is None:
+                return RAGSearchResponse(
+                    results=kept[:top_k], filtered=self._withheld(denied, top_k)
+                )
+            candidates = wider
+
+    async def _retrieve(
+        self,
+        request: RAGSearchRequest,
+        embedding: Sequence[float] | None,
+        top_k: int,
+    ) -> Tuple[List[RAGSearchResult], Sequence[float] | None]:
+        """Nearest ``top_k`` rows for one allowed request, and its embedding."""
         try:
-            rows = await self._query_pgvector(request, top_k)
-            results = []
-            for row in rows:
-                row_dict = dict(row)
-                results.append(
-                    RAGSearchResult(
-                        id=str(row_dict["id"]),
-                        content=row_dict[self._settings.rag_text_column],
-                        score=float(row_dict["score"]),
-                        metadata=row_dict.get(self._settings.rag_metadata_column) or {},
-                    )
+            embedding = embedding or await self._embedder.embed(request.query)
+            if self._local_primary:
+                return self._search_local(request, embedding, top_k), embedding
+            # Policy has already been checked for this request; the cache
+            # only saves the database round-trip.
+            cache = self._active_cache()
+            if cache is not None:
+                key = self._cache_key(cache, request, embedding, top_k)
+                generation = cache.generation
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached, embedding
+            rows = await self._query_pgvector(request, embedding, top_k)
+            with metrics.timed("response_map"):
+                results = [self._to_result(row) for row in rows]
+            if cache is not None:
+                cache.put(key, results, generation)
+        except OverloadedError:
+            raise
+        except Exception as exc:
+            results = self._degraded_results(request, embedding, top_k, exc)
+        return results, embedding
+
+    async def search_many(
+        self, requests: Sequence[RAGSearchRequest], tenant_id: str | None = None
+    ) -> RAGBatchSearchResponse:
+        """
+        Run several searches with one policy round-trip and one SQL statement.
+
+        Each query is still checked on its own; denied queries are reported
+        in place and only the allowed ones are sent to the database.
+        """
+        top_ks = [
+            request.top_k or self._settings.rag_top_k_default for request in requests
+        ]
+        with metrics.timed("event_build"):
+            checks = [
+                ("rag/allow", self._event(request, top_k, tenant_id))
+                for request, top_k in zip(requests, top_ks)
+            ]
+        decisions = await self._opa.evaluate_many(checks)
+        items = [
+            RAGBatchSearchItem(allow=decision.allow, reason=decision.reason)
+            for decision in decisions
+        ]
+        pending = [index for index, item in enumerate(items) if item.allow]
+        embeddings: Dict[int, Sequence[float]] = {}
+        candidates = {index: self._candidate_count(top_ks[index]) for index in pending}
+        while pending:
+            batches = await self._retrieve_many(
+                [requests[index] for index in pending],
+                [embeddings.get(index) for index in pending],
+                [candidates[index] for index in pending],
+            )
+            for index, (_, embedding) in zip(pending, batches):
+                if embedding is not None:
+                    embeddings[index] = embedding
+            if not self._settings.rag_result_policy:
+                for index, (results, _) in zip(pending, batches):
+                    items[index].results = results
+                break
+            # Every candidate of every query goes through one policy evaluation.
+            denied = await self._denied_results(
+                tenant_id,
+                [requests[index] for index in pending],
+                [results for results, _ in batches],
+            )
+            short = []
+            for index, (results, _), dropped in zip(pending, batches, denied):
+                kept = [
+                    row
+                    for position, row in enumerate(results)
+                    if position not in dropped
+                ]
+                wider = self._widen(
+                    top_ks[index], candidates[index], len(results), len(kept)
                 )
-        except Exception as exc:  # pragma: no cover - demo fallback
+                if wider is None:
+                    items[index].results = kept[: top_ks[index]]
+                    items[index].filtered = self._withheld(dropped, top_ks[index])
+                else:
+                    candidates[index] = wider
+                    short.append(index)
+            pending = short
+
+        return RAGBatchSearchResponse(results=items)
+
+    async def _retrieve_many(
+        self,
+        requests: Sequence[RAGSearchRequest],
+        embeddings: Sequence[Sequence[float] | None],
+        top_ks: Sequence[int],
+    ) -> List[Tuple[List[RAGSearchResult], Sequence[float] | None]]:
+        """Nearest rows for allowed requests, using one SQL statement for misses."""
+        results: List[List[RAGSearchResult]] = [[] for _ in requests]
+        vectors: List[Sequence[float]] = []
+        try:
+            vectors = await self._embed_many(requests, embeddings)
+            if self._local_primary:
+                return [
+                    (self._search_local(request, embedding, top_k), embedding)
+                    for request, embedding, top_k in zip(requests, vectors, top_ks)
+                ]
+            misses = list(range(len(requests)))
+            cache = self._active_cache()
+            if cache is not None:
+                keys = [
+                    self._cache_key(cache, request, embedding, top_k)
+                    for request, embedding, top_k in zip(requests, vectors, top_ks)
+                ]
+                generation = cache.generation
+                misses = []
+                for position, key in enumerate(keys):
+                    cached = cache.get(key)
+                    if cached is None:
+                        misses.append(position)
+                    else:
+                        results[position] = cached
+            if misses:
+                rows = await self._query_pgvector_many(
+                    [requests[position] for position in misses],
+                    [vectors[position] for position in misses],
+                    [top_ks[position] for position in misses],
+                )
+                with metrics.timed("response_map"):
+                    for row in rows:
+                        position = misses[row["query_index"] - 1]
+                        results[position].append(self._to_result(row))
+                if cache is not None:
+                    for position in misses:
+                        cache.put(keys[position], results[position], generation)
+        except OverloadedError:
+            raise
+        except Exception as exc:
+            results = [
+                self._degraded_results(
+                    request, vectors[position] if vectors else None, top_k, exc
+                )
+                for position, (request, top_k) in enumerate(zip(requests, top_ks))
+            ]
+        return [
+            (rows, vectors[position] if vectors else None)
+            for position, rows in enumerate(results)
+        ]
+
+    def _candidate_count(self, top_k: int) -> int:
+        """Rows to fetch so that ``top_k`` usually survive result filtering."""
+        settings = self._settings
+        if not settings.rag_result_policy:
+            return top_k
+        wanted = math.ceil(top_k * settings.rag_result_overfetch)
+        return max(top_k, min(wanted, settings.rag_result_max_candidates))
+
+    def _widen(
+        self, top_k: int, candidates: int, fetched: int, kept: int
+    ) -> int | None:
+        """A larger candidate count when denials left a query short, else None."""
+        limit = self._settings.rag_result_max_candidates
+        if kept >= top_k or fetched < candidates or candidates >= limit:
+            return None
+        return min(candidates * 2, limit)
+
+    async def _denied_results(
+        self,
+        tenant_id: str | None,
+        requests: Sequence[RAGSearchRequest],
+        batches: Sequence[Sequence[RAGSearchResult]],
+    ) -> List[Set[int]]:
+        """
+        Positions of the rows each request may not see, from one policy call.
+
+        A missing or non-allowing decision withholds all of that query's rows.
+        """
+        policy = self._settings.rag_result_policy
+        assert policy is not None
+        with metrics.timed("event_build"):
+            checks = [
+                (policy, self._results_event(request, results, tenant_id))
+                for request, results in zip(requests, batches)
+            ]
+        decisions = await self._opa.evaluate_many(checks)
+        denied: List[Set[int]] = []
+        for decision, results in zip(decisions, batches):
+            raw = decision.raw if isinstance(decision.raw, dict) else {}
+            if decision.allow:
+                rows = {int(row) for row in raw.get("denied") or ()}
+            else:
+                rows = set(range(len(results)))
+            denied.append(rows)
+            self.results_checked += len(results)
+        return denied
+
+    def _withheld(self, denied: Set[int], top_k: int) -> int:
+        """
+        Denied rows among the ``top_k`` nearest candidates.
+
+        Those are the rows an unfiltered search would have returned; denied
+        rows further down the over-fetched candidates are not counted.
+        """
+        withheld = sum(1 for position in denied if position < top_k)
+        self.results_filtered += withheld
+        return withheld
+
+    def _search_local(
+        self, request: RAGSearchRequest, embedding: Sequence[float], top_k: int
+    ) -> List[RAGSearchResult]:
+        assert self._local_index is not None
+        return self._local_index.search(embedding, top_k, request.filters)
+
+    def _degraded_results(
+        self,
+        request: RAGSearchRequest,
+        embedding: Sequence[float] | None,
+        top_k: int,
+        exc: Exception,
+    ) -> List[RAGSearchResult]:
+        """Answer from the local snapshot when the database fails, else demo rows."""
+        if self._local_index is not None and embedding is not None:
+            logger.warning("Serving RAG results from the local index: %s", exc)
+            try:
+                return self._search_local(request, embedding, top_k)
+            except Exception as local_exc:  # pragma: no cover - demo fallback
+                logger.warning("Local RAG index failed: %s", local_exc)
+        else:
             logger.warning("Falling back to demo RAG results: %s", exc)
-            results = self._fallback_results(request.query, top_k)
+        return self._fallback_results(request.query, top_k)
+
+    def _active_cache(self) -> RAGResultCache | None:
+        """The result cache, unless invalidation is configured but not connected."""
+        if self._invalidator is not None and not self._invalidator.listening:
+            return None
+        return self._cache
+
+    def _cache_key(
+        self,
+        cache: RAGResultCache,
+        request: RAGSearchRequest,
+        embedding: Sequence[float],
+        top_k: int,
+    ) -> str:
+        return cache.key(
+            self._settings.rag_table,
+            embedding,
+            top_k,
+            request.filters,
+            self._tuning([request]),
+        )
+
+    def _tuning(self, requests: Sequence[RAGSearchRequest]) -> Dict[str, int]:
+        """ANN settings that differ from the session defaults set at connect."""
+        settings = self._settings
+        tuning: Dict[str, int] = {}
+        ef_search = max(
+            (r.ef_search for r in requests if r.ef_search is not None), default=None
+        )
+        if ef_search is not None and ef_search != settings.rag_hnsw_ef_search:
+            tuning["hnsw.ef_search"] = ef_search
+        probes = max((r.probes for r in requests if r.probes is not None), default=None)
+        if probes is not None and probes != settings.rag_ivfflat_probes:
+            tuning["ivfflat.probes"] = probes
+        return tuning
 
-        return RAGSearchResponse(results=results)
+    def _event(
+        self, request: RAGSearchRequest, top_k: int, tenant_id: str | None = None
+    ) -> PolicyInput:
+        return security_event(
+            "rag-user",
+            _SEARCH,
+            {"type": "collection", "name": self._settings.rag_table},
+            {"top_k": top_k, "query_length": len(request.query)},
+            tenant_id=tenant_id,
+        )
+
+    def _results_event(
+        self,
+        request: RAGSearchRequest,
+        results: Sequence[RAGSearchResult],
+        tenant_id: str | None,
+    ) -> PolicyInput:
+        return security_event(
+            "rag-user",
+            _RETRIEVE,
+            # The policy reads ``documents`` (an EventResource extra field).
+            {
+                "type": "documents",
+                "name": self._settings.rag_table,
+                "documents": [
+                    {"id": result.id, "metadata": result.metadata} for result in results
+                ],
+            },
+            {"query_length": len(request.query)},
+            tenant_id=tenant_id,
+        )
+
+    def _to_result(self, row: asyncpg.Record) -> RAGSearchResult:
+        return RAGSearchResult(
+            id=str(row["id"]),
+            content=row[self._settings.rag_text_column],
+            score=float(row["score"]),
+            metadata=row[self._settings.rag_metadata_column] or {},
+        )
+
+    async def _embed_many(
+        self,
+        requests: Sequence[RAGSearchRequest],
+        embeddings: Sequence[Sequence[float] | None],
+    ) -> List[Sequence[float]]:
+        """Known or caller-supplied embeddings, plus one embedder call for the rest."""
+        known = [
+            embedding or request.embedding
+            for request, embedding in zip(requests, embeddings)
+        ]
+        missing = [
+            request.query
+            for request, embedding in zip(requests, known)
+            if not embedding
+        ]
+        computed = iter(await self._embedder.embed_many(missing) if missing else [])
+        return [embedding or next(computed) for embedding in known]
 
     async def _query_pgvector(
-        self, request: RAGSearchRequest, top_k: int
+        self, request: RAGSearchRequest, embedding: Sequence[float], top_k: int
     ) -> List[asyncpg.Record]:
-        pool = await self._get_pool()
-        embedding = request.embedding or self._fake_embed(request.query)
-        embedding_literal = "[" + ",".join(f"{value:.4f}" for value in embedding) + "]"
-
-        sql = (
-            f"SELECT id, {self._settings.rag_text_column}, "
-            f"{self._settings.rag_metadata_column}, "
-            f"1 - ({self._settings.rag_vector_column} <=> $1::vector) AS score "
-            f"FROM {self._settings.rag_table} "
-            f"ORDER BY {self._settings.rag_vector_column} <=> $1::vector "
-            "LIMIT $2"
+        async with limiter_slot(self._db_limiter):
+            return await self._fetch_pgvector(request, embedding, top_k)
+
+    async def _fetch_pgvector(
+        self, request: RAGSearchRequest, embedding: Sequence[float], top_k: int
+    ) -> List[asyncpg.Record]:
+        if request.filters:
+            return await self._fetch(
+                self._filtered_sql,
+                (embedding, top_k, request.filters),
+                self._tuning([request]),
+            )
+        return await self._fetch(
+            self._search_sql, (embedding, top_k), self._tuning([request])
+        )
+
+    async def _query_pgvector_many(
+        self,
+        requests: Sequence[RAGSearchRequest],
+        embeddings: Sequence[Sequence[float]],
+        top_ks: Sequence[int],
+    ) -> List[asyncpg.Record]:
+        async with limiter_slot(self._db_limiter):
+            return await self._fetch_pgvector_many(requests, embeddings, top_ks)
+
+    async def _fetch_pgvector_many(
+        self,
+        requests: Sequence[RAGSearchRequest],
+        embeddings: Sequence[Sequence[float]],
+        top_ks: Sequence[int],
+    ) -> List[asyncpg.Record]:
+        """Nearest neighbours for every query via a LATERAL join over the batch."""
+        vectors = [Vector(embedding) for embedding in embeddings]
+        filters = [request.filters or {} for request in requests]
+        return await self._fetch(
+            self._batch_sql, (vectors, list(top_ks), filters), self._tuning(requests)
+        )
+
+    async def _fetch(
+        self, sql: str, args: Tuple[Any, ...], tuning: Dict[str, int]
+    ) -> List[asyncpg.Record]:
+        async with self._acquire() as connection:
+            with metrics.timed("db_query"):
+                if not tuning:
+                    return await connection.fetch(sql, *args)
+                # Per-request ANN breadth only lasts for this transaction.
+                async with connection.transaction():
+                    for name, value in tuning.items():
+                        await connection.execute(f"SET LOCAL {name} = {int(value)}")
+                    return await connection.fetch(sql, *args)
+
+    @staticmethod
+    def _build_sql(settings: Settings) -> Tuple[str, str, str]:
+        table = settings.rag_table
+        text_column = settings.rag_text_column
+        metadata_column = settings.rag_metadata_column
+        vector_column = settings.rag_vector_column
+        columns = (
+            f"id, {text_column}, {metadata_column}, "
+            f"1 - ({vector_column} <=> $1::vector) AS score "
+        )
+        order = f"ORDER BY {vector_column} <=> $1::vector LIMIT $2"
+        search_sql = f"SELECT {columns}FROM {table} {order}"
+        # ``@>`` containment can use a GIN (jsonb_path_ops) index on metadata.
+        filtered_sql = (
+            f"SELECT {columns}FROM {table} "
+            f"WHERE {metadata_column} @> $3::jsonb {order}"
+        )
+        batch_sql = (
+            "SELECT q.query_index, d.* "
+            "FROM unnest($1::vector[], $2::int[], $3::jsonb[]) WITH ORDINALITY "
+            "AS q(embedding, top_k, filters, query_index) "
+            "CROSS JOIN LATERAL ("
+            f"SELECT t.id, t.{text_column}, t.{metadata_column}, "
+            f"1 - (t.{vector_column} <=> q.embedding) AS score "
+            f"FROM {table} t "
+            # Unfiltered queries must keep rows with NULL metadata, as search_sql does.
+            f"WHERE (q.filters = '{{}}'::jsonb OR t.{metadata_column} @> q.filters) "
+            f"ORDER BY t.{vector_column} <=> q.embedding "
+            "LIMIT q.top_k) d "
+            "ORDER BY q.query_index, d.score DESC"
         )
+        return search_sql, filtered_sql, batch_sql
 
+    async def start(self) -> None:
+        """Open the pool and prepare the search statements on every connection."""
+        if self._invalidator is not None:
+            await self._invalidator.start()
+        try:
+            pool = await self._get_pool()
+            connections = [
+                await pool.acquire() for _ in range(self._settings.rag_pool_min_size)
+            ]
+            try:
+                for connection in connections:
+                    # LIMIT 0 prepares and caches the statements without a scan.
+                    await connection.fetch(self._search_sql, [0.0], 0)
+                    await connection.fetch(self._filtered_sql, [0.0], 0, {})
+                    await connection.fetch(self._batch_sql, [], [], [])
+            finally:
+                for connection in connections:
+                    await pool.release(connection)
+        except Exception as exc:  # pragma: no cover - demo fallback
+            logger.warning("RAG pool warm-up failed, connecting lazily: %s", exc)
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        pool = await self._get_pool()
+        started = time.monotonic()
         async with pool.acquire() as connection:
-            return await connection.fetch(sql, embedding_literal, top_k)
+            waited = time.monotonic() - started
+            metrics.observe_stage("db_acquire", waited)
+            self.acquires += 1
+            self.acquire_wait_seconds_total += waited
+            self.acquire_wait_seconds_max = max(self.acquire_wait_seconds_max, waited)
+            yield connection
 
     async def _get_pool(self) -> asyncpg.Pool:
         if self._pool is None:
             async with self._pool_lock:
                 if self._pool is None:
+                    settings = self._settings
                     self._pool = await asyncpg.create_pool(
-                        dsn=self._settings.database_url,
-                        min_size=1,
-                        max_size=4,
+                        dsn=settings.database_url,
+                        min_size=settings.rag_pool_min_size,
+                        max_size=settings.rag_pool_max_size,
+                        max_inactive_connection_lifetime=(
+                            settings.rag_pool_max_inactive_lifetime
+                        ),
+                        statement_cache_size=settings.rag_pool_statement_cache_size,
+                        command_timeout=settings.rag_pool_command_timeout,
+                        timeout=settings.rag_pool_connect_timeout,
+                        server_settings={
+                            "hnsw.ef_search": str(settings.rag_hnsw_ef_search),
+                            "ivfflat.probes": str(settings.rag_ivfflat_probes),
+                        },
+                        init=self._init_connection,
                     )
         return self._pool
 
+    def pool_stats(self) -> Dict[str, float]:
+        pool = self._pool
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        return {
+            "min_size": self._settings.rag_pool_min_size,
+            "max_size": self._settings.rag_pool_max_size,
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "acquires": self.acquires,
+            "acquire_wait_seconds_total": round(self.acquire_wait_seconds_total, 6),
+            "acquire_wait_seconds_max": round(self.acquire_wait_seconds_max, 6),
+        }
+
+    @staticmethod
+    async def _init_connection(connection: asyncpg.Connection) -> None:
+        # Decode JSONB metadata into dicts rather than raw strings.
+        await connection.set_type_codec(
+            "jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+        await register_vector_codec(connection)
+
+    def result_filter_stats(self) -> Dict[str, int]:
+        return {
+            "checked": self.results_checked,
+            "filtered": self.results_filtered,
+        }
+
+    @property
+    def embedder(self) -> Embedder:
+        return self._embedder
+
+    @property
+    def result_cache(self) -> RAGResultCache | None:
+        return self._cache
+
+    @property
+    def local_index(self) -> VectorIndex | None:
+        return self._local_index
+
     async def close(self) -> None:
+        if self._invalidator is not None:
+            await self._invalidator.close()
+        await self._embedder.close()
         if self._pool is not None:
             await self._pool.close()
             self._pool = None
 
-    @staticmethod
-    def _fake_embed(text: str, dims: int = 6) -> List[float]:
-        # Deterministic toy embedding based on character codes.
-        values = [0.0] * dims
-        for index, ch in enumerate(text[: dims * 4]):
-            values[index % dims] += (ord(ch) % 32) / 100.0
-        return values
-
     def _fallback_results(self, query: str, top_k: int) -> List[RAGSearchResult]:
         base_content = "Demo knowledge base entry related to"
         return [
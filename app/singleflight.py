@@ -0,0 +1,71 @@
+"""
+Single-flight deduplication of identical concurrent async calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[T]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers using the same key.
+
+    The call runs in its own task so a cancelled caller (e.g. a disconnected
+    client) does not cancel it for the others. Results and exceptions are
+    delivered to every caller. Once ``max_waiters`` callers are attached to
+    a flight, further callers run the call themselves.
+    """
+
+    def __init__(self, max_waiters: int = 100) -> None:
+        self._max_waiters = max_waiters
+        self._flights: Dict[str, _Flight[Any]] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.overflow = 0
+        self.errors = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is not None:
+            if flight.waiters >= self._max_waiters:
+                self.overflow += 1
+                return await call()
+            flight.waiters += 1
+            self.coalesced += 1
+            return await asyncio.shield(flight.task)
+
+        task: asyncio.Task[T] = asyncio.ensure_future(call())
+        self._flights[key] = _Flight(task)
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        self._flights.pop(key, None)
+        # Mark the exception as retrieved even if every caller went away.
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "overflow": self.overflow,
+            "errors": self.errors,
+        }
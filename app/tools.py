@@ -0,0 +1,210 @@
+"""
+Registry of agent tools and the executors they run on.
+
+Each tool declares how it runs: ``async`` handlers are awaited on the event
+loop, ``thread`` handlers (blocking I/O) run on a shared thread pool, and
+``process`` handlers (CPU-bound) on a process pool, so neither stalls other
+requests. Every tool has its own concurrency limit and timeout, and a tool
+whose output depends only on its input can declare a ``cache_ttl`` to reuse
+that output for identical input.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Literal
+
+from app import metrics
+from app.admission import ConcurrencyLimiter
+from app.policy_input import dumps
+from app.policy_resilience import LatencyTracker
+from app.response_cache import MemoryResponseStore
+from app.services.exceptions import ToolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+ExecutionMode = Literal["async", "thread", "process"]
+# ``async`` handlers return an awaitable; the others return the output directly.
+ToolHandler = Callable[[Dict[str, str]], Any]
+
+
+class Tool:
+    """A registered handler with its execution mode, limit, timeout and stats."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: ToolHandler,
+        mode: ExecutionMode,
+        limiter: ConcurrencyLimiter,
+        timeout: float,
+        cache: MemoryResponseStore | None = None,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.mode = mode
+        self.limiter = limiter
+        self.timeout = timeout
+        self.cache = cache
+        self.latency = LatencyTracker(window=500, min_samples=1)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.cache_hits = 0
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency.quantile(0.5)
+        p99 = self.latency.quantile(0.99)
+        return {
+            "mode": self.mode,
+            "limit": self.limiter.stats()["limit"],
+            "active": self.limiter.active,
+            "queue_depth": self.limiter.waiting,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "cache_hits": self.cache_hits,
+            "cache_entries": None if self.cache is None else len(self.cache),
+            "rejected": self.limiter.rejected + self.limiter.timeouts,
+            "latency_p50_seconds": None if p50 is None else round(p50, 6),
+            "latency_p99_seconds": None if p99 is None else round(p99, 6),
+        }
+
+
+class ToolRegistry:
+    """
+    Named tools plus the lazily created thread and process pools they share.
+
+    A call waits up to the tool's timeout for one of its ``max_concurrent``
+    slots (``OverloadedError`` past that or when ``max_queue`` callers are
+    already waiting), then up to the timeout again for the handler
+    (``ToolTimeoutError``). A thread or process that overruns is abandoned,
+    not killed: it keeps its pool worker until the handler returns.
+    Process handlers and their input must be picklable. A cache hit skips
+    the limiter and the handler altogether.
+    """
+
+    def __init__(
+        self,
+        *,
+        default_timeout: float = 10.0,
+        default_max_concurrent: int = 16,
+        max_queue: int = 256,
+        thread_workers: int = 8,
+        process_workers: int = 2,
+        cache_max_entries: int = 1_000,
+    ) -> None:
+        self._default_timeout = default_timeout
+        self._default_max_concurrent = default_max_concurrent
+        self._max_queue = max_queue
+        self._thread_workers = thread_workers
+        self._process_workers = process_workers
+        self._cache_max_entries = cache_max_entries
+        self._tools: Dict[str, Tool] = {}
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+
+    def register(
+        self,
+        name: str,
+        handler: ToolHandler,
+        *,
+        mode: ExecutionMode = "async",
+        max_concurrent: int | None = None,
+        timeout: float | None = None,
+        cache_ttl: float = 0.0,
+    ) -> Tool:
+        """Register ``handler``; ``cache_ttl`` > 0 reuses outputs by input hash."""
+        timeout = self._default_timeout if timeout is None else timeout
+        tool = Tool(
+            name,
+            handler,
+            mode,
+            ConcurrencyLimiter(
+                f"agent tool {name}",
+                max_concurrent or self._default_max_concurrent,
+                max_queue=self._max_queue,
+                queue_timeout=timeout,
+            ),
+            timeout,
+            (
+                MemoryResponseStore(self._cache_max_entries, cache_ttl)
+                if cache_ttl > 0
+                else None
+            ),
+        )
+        self._tools[name] = tool
+        return tool
+
+    def get(self, name: str) -> Tool | None:
+        return self._tools.get(name)
+
+    def _executor(self, mode: ExecutionMode) -> Executor:
+        if mode == "thread":
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(
+                    self._thread_workers, thread_name_prefix="agent-tool"
+                )
+            return self._threads
+        if self._processes is None:
+            # Fork is unsafe once the server's threads are running.
+            self._processes = ProcessPoolExecutor(
+                self._process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    async def run(self, name: str, arguments: Dict[str, str]) -> Dict[str, str]:
+        """Run tool ``name``; it must be registered."""
+        tool = self._tools[name]
+        cache_key = None
+        if tool.cache is not None:
+            cache_key = hashlib.sha256(dumps(arguments, sort_keys=True)).hexdigest()
+            cached = await tool.cache.get(cache_key)
+            if cached is not None:
+                tool.cache_hits += 1
+                return json.loads(cached)
+        async with tool.limiter.slot():
+            tool.calls += 1
+            started = time.perf_counter()
+            try:
+                if tool.mode == "async":
+                    pending = tool.handler(arguments)
+                else:
+                    pending = asyncio.get_running_loop().run_in_executor(
+                        self._executor(tool.mode), tool.handler, arguments
+                    )
+                output = await asyncio.wait_for(pending, tool.timeout)
+            except asyncio.TimeoutError:
+                tool.timeouts += 1
+                raise ToolTimeoutError(name, tool.timeout) from None
+            except asyncio.CancelledError:
+                tool.cancelled += 1
+                raise
+            except Exception:
+                tool.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                tool.latency.observe(elapsed)
+                metrics.observe_stage("tool", elapsed)
+        if cache_key is not None and tool.cache is not None:
+            await tool.cache.set(cache_key, dumps(output))
+        return output
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: tool.stats() for name, tool in self._tools.items()}
+
+    def close(self) -> None:
+        """Shut the pools down without waiting for abandoned calls."""
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
@@ -0,0 +1,74 @@
+"""
+Shared, connection-pooled HTTP clients for upstream model providers.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Dict
+
+import httpx
+
+from app.admission import ConcurrencyLimiter
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClientPool:
+    """Keeps one long-lived ``httpx.AsyncClient`` per upstream origin."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        transport: httpx.AsyncBaseTransport | None = None,
+        limiter: ConcurrencyLimiter | None = None,
+    ) -> None:
+        self._settings = settings
+        self._transport = transport
+        self.limiter = limiter
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        """Return the pooled client for ``base_url``, creating it on first use."""
+        key = base_url.rstrip("/")
+        client = self._clients.get(key)
+        if client is None:
+            client = self._build_client(key)
+            self._clients[key] = client
+        return client
+
+    def _build_client(self, base_url: str) -> httpx.AsyncClient:
+        settings = self._settings
+        max_connections = settings.upstream_pool_limits.get(
+            base_url, settings.upstream_max_connections
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(
+                settings.upstream_max_keepalive_connections, max_connections
+            ),
+            keepalive_expiry=settings.upstream_keepalive_expiry,
+        )
+        logger.debug(
+            "Creating upstream client for %s (max_connections=%s, http2=%s)",
+            base_url,
+            max_connections,
+            settings.upstream_http2,
+        )
+        return httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            http2=settings.upstream_http2,
+            timeout=httpx.Timeout(
+                settings.upstream_timeout, connect=settings.upstream_connect_timeout
+            ),
+            transport=self._transport,
+        )
+
+    async def close(self) -> None:
+        """Close every pooled client."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
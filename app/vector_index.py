@@ -0,0 +1,251 @@
+"""
+In-process vector index over a snapshot of the RAG table.
+
+A snapshot is one file: a header, the unit-normalised embeddings as
+little-endian float32 rows, and the documents as JSON. It is memory-mapped,
+so several workers on one host share the vectors through the page cache.
+
+Export one with ``python -m app.vector_index --output documents.asbvec``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import json
+import logging
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Protocol, Sequence
+
+import asyncpg  # type: ignore[import-untyped]
+
+from app.config import Settings, get_settings
+from app.models.rag import RAGSearchResult
+from app.pgvector import register_vector_codec
+
+try:
+    import numpy as np  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore[assignment, unused-ignore]
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ASBVEC01"
+# magic, document count, dimensions, byte offset of the JSON documents
+_HEADER = struct.Struct("<8sIIQ")
+
+
+class VectorIndex(Protocol):
+    """Nearest-neighbour search by cosine similarity over a loaded snapshot."""
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        filters: Dict[str, str] | None = None,
+    ) -> List[RAGSearchResult]: ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+
+def _normalise(values: Sequence[float]) -> array:
+    vector = array("f", values)
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm:
+        for index, value in enumerate(vector):
+            vector[index] = value / norm
+    return vector
+
+
+def write_snapshot(path: str, documents: Sequence[Dict[str, Any]]) -> int:
+    """
+    Write ``documents`` (id, content, metadata, embedding) as a snapshot.
+
+    Returns the number of documents written.
+    """
+    dims = len(documents[0]["embedding"]) if documents else 0
+    vectors = array("f")
+    for document in documents:
+        if len(document["embedding"]) != dims:
+            raise ValueError(f"Document {document['id']} is not {dims}-dimensional")
+        vectors.extend(_normalise(document["embedding"]))
+    if sys.byteorder != "little":  # pragma: no cover - big-endian hosts
+        vectors.byteswap()
+    payload = json.dumps(
+        [
+            {
+                "id": str(document["id"]),
+                "content": document["content"],
+                "metadata": document.get("metadata") or {},
+            }
+            for document in documents
+        ]
+    ).encode()
+    docs_offset = _HEADER.size + len(vectors) * 4
+    with open(path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, len(documents), dims, docs_offset))
+        handle.write(vectors.tobytes())
+        handle.write(payload)
+    return len(documents)
+
+
+class BruteForceIndex:
+    """Exact search in pure Python; fine for a few thousand documents."""
+
+    def __init__(self, vectors: Any, dims: int, documents: List[Dict[str, Any]]):
+        self._vectors = vectors
+        self._dims = dims
+        self._documents = documents
+        self.searches = 0
+
+    def _scores(self, query: array, candidates: range | List[int]) -> List[tuple]:
+        dims = self._dims
+        vectors = self._vectors
+        return [
+            (
+                sum(map(operator.mul, query, vectors[row * dims : (row + 1) * dims])),
+                row,
+            )
+            for row in candidates
+        ]
+
+    def _candidates(self, filters: Dict[str, str] | None) -> range | List[int]:
+        if not filters:
+            return range(len(self._documents))
+        items = filters.items()
+        return [
+            row
+            for row, document in enumerate(self._documents)
+            if items <= document["metadata"].items()
+        ]
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        filters: Dict[str, str] | None = None,
+    ) -> List[RAGSearchResult]:
+        self.searches += 1
+        if len(embedding) != self._dims:
+            raise ValueError(f"Expected a {self._dims}-dimensional embedding")
+        query = _normalise(embedding)
+        best = heapq.nlargest(top_k, self._scores(query, self._candidates(filters)))
+        return [self._result(row, score) for score, row in best]
+
+    def _result(self, row: int, score: float) -> RAGSearchResult:
+        document = self._documents[row]
+        return RAGSearchResult(
+            id=document["id"],
+            content=document["content"],
+            score=float(score),
+            metadata=document["metadata"],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": type(self).__name__,
+            "documents": len(self._documents),
+            "dims": self._dims,
+            "searches": self.searches,
+        }
+
+
+class NumpyIndex(BruteForceIndex):
+    """Exact search as one matrix-vector product; used when NumPy is installed."""
+
+    def __init__(self, vectors: Any, dims: int, documents: List[Dict[str, Any]]):
+        matrix = np.frombuffer(vectors, dtype="<f4").reshape(len(documents), dims)
+        super().__init__(matrix, dims, documents)
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        filters: Dict[str, str] | None = None,
+    ) -> List[RAGSearchResult]:
+        self.searches += 1
+        if len(embedding) != self._dims:
+            raise ValueError(f"Expected a {self._dims}-dimensional embedding")
+        query = np.asarray(_normalise(embedding), dtype=np.float32)
+        rows = None
+        if filters:
+            rows = np.asarray(self._candidates(filters), dtype=np.intp)
+            if not rows.size:
+                return []
+            scores = self._vectors[rows] @ query
+        else:
+            scores = self._vectors @ query
+        top_k = min(top_k, scores.size)
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            self._result(int(i if rows is None else rows[i]), float(scores[i]))
+            for i in best
+        ]
+
+
+def load_index(path: str) -> VectorIndex:
+    """Memory-map the snapshot at ``path``; NumPy is used when available."""
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"{path} is truncated or corrupt")
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, count, dims, docs_offset = _HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a vector index snapshot")
+    if docs_offset != _HEADER.size + count * dims * 4 or docs_offset > len(mapped):
+        raise ValueError(f"{path} is truncated or corrupt")
+    documents = json.loads(mapped[docs_offset:])
+    if len(documents) != count:
+        raise ValueError(f"{path} lists {len(documents)} documents, expected {count}")
+    raw = memoryview(mapped)[_HEADER.size : docs_offset]
+    if np is not None:
+        return NumpyIndex(raw, dims, documents)
+    vectors: Any = raw.cast("f")
+    if sys.byteorder != "little":  # pragma: no cover - big-endian hosts
+        vectors = array("f", vectors)
+        vectors.byteswap()
+    return BruteForceIndex(vectors, dims, documents)
+
+
+async def export_snapshot(settings: Settings, path: str) -> int:
+    """Dump the RAG table into a snapshot file; returns the document count."""
+    connection = await asyncpg.connect(dsn=settings.database_url)
+    try:
+        await register_vector_codec(connection)
+        rows = await connection.fetch(
+            f"SELECT id, {settings.rag_text_column} AS content, "
+            f"{settings.rag_metadata_column}::text AS metadata, "
+            f"{settings.rag_vector_column} AS embedding "
+            f"FROM {settings.rag_table} "
+            f"WHERE {settings.rag_vector_column} IS NOT NULL ORDER BY id"
+        )
+    finally:
+        await connection.close()
+    documents = [
+        {
+            "id": row["id"],
+            "content": row["content"],
+            "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+            "embedding": row["embedding"],
+        }
+        for row in rows
+    ]
+    return write_snapshot(path, documents)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the RAG table snapshot.")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    written = asyncio.run(export_snapshot(get_settings(), args.output))
+    print(f"wrote {written} documents to {args.output}")
@@ -0,0 +1 @@
+"""Local micro-benchmarks for the ASB Secure Gateway."""
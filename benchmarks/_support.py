@@ -0,0 +1,212 @@
+"""
+Shared helpers for the local benchmarks: stand-in servers and latency summaries.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import socket
+import statistics
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import uvicorn
+
+ASGIApp = Callable[..., Awaitable[None]]
+
+_BATCH_EXPRESSION = re.compile(
+    r"(r\d+) := \[x \| x := data\[(.+?)\] with input as input\.(q\d+)\]"
+)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def serve_in_thread(app: ASGIApp) -> tuple[str, Callable[[], None]]:
+    """Run ``app`` with uvicorn on a background thread; return (base_url, stop)."""
+    port = _free_port()
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def fake_chat_upstream(
+    delay: float = 0.0,
+    chunks: int = 1,
+    chunk_delay: float = 0.0,
+    *,
+    error_rate: float = 0.0,
+    seed: int = 7,
+) -> ASGIApp:
+    """
+    Minimal OpenAI-compatible ``/v1/chat/completions`` stand-in.
+
+    ``delay`` is the time before the first token and ``chunk_delay`` the time
+    per generated chunk; non-streaming requests wait for all ``chunks``. An
+    ``error_rate`` fraction of requests fail with HTTP 500.
+    """
+    import asyncio
+    import random
+
+    rng = random.Random(seed)
+
+    body = json.dumps(
+        {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "bench-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "pong " * chunks},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 5,
+                "completion_tokens": chunks,
+                "total_tokens": 5 + chunks,
+            },
+        }
+    ).encode()
+    event = json.dumps(
+        {
+            "id": "chatcmpl-bench",
+            "choices": [{"index": 0, "delta": {"content": "pong "}}],
+        }
+    )
+    sse_chunk = f"data: {event}\n\n".encode()
+
+    async def app(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return
+        chunks_in = []
+        while True:
+            message = await receive()
+            chunks_in.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        stream = json.loads(b"".join(chunks_in) or b"{}").get("stream", False)
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            await send({"type": "http.response.start", "status": 500, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        content_type = b"text/event-stream" if stream else b"application/json"
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", content_type)],
+            }
+        )
+        if not stream:
+            if chunk_delay:
+                await asyncio.sleep(chunk_delay * chunks)
+            await send({"type": "http.response.body", "body": body})
+            return
+        for _ in range(chunks):
+            await send(
+                {"type": "http.response.body", "body": sse_chunk, "more_body": True}
+            )
+            if chunk_delay:
+                await asyncio.sleep(chunk_delay)
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+    return app
+
+
+def fake_opa(
+    delay: float = 0.0,
+    *,
+    slow_rate: float = 0.0,
+    slow_delay: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 7,
+) -> ASGIApp:
+    """
+    OPA Data API stand-in answering ``POST /v1/data/<path>`` in-process.
+
+    A ``slow_rate`` fraction of requests take ``slow_delay`` extra seconds and
+    an ``error_rate`` fraction fail with HTTP 500, to exercise fault handling.
+    """
+    import asyncio
+    import random
+
+    rng = random.Random(seed)
+
+    from app.policy_engine import EmbeddedPolicyEngine
+
+    engine = EmbeddedPolicyEngine()
+
+    async def app(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        roll = rng.random()
+        if delay or roll < slow_rate:
+            await asyncio.sleep(delay + (slow_delay if roll < slow_rate else 0.0))
+        if rng.random() < error_rate:
+            await send({"type": "http.response.start", "status": 500, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        request = json.loads(b"".join(chunks) or b"{}")
+        if scope["path"] == "/v1/query":
+            # Only understands the batch form emitted by HTTPPolicyBackend.
+            bindings = {}
+            for name, ref, key in _BATCH_EXPRESSION.findall(request["query"]):
+                policy_path = "/".join(json.loads(f"[{ref.replace('][', ',')}]"))
+                result = engine.evaluate(policy_path, request["input"][key])
+                bindings[name] = [] if result is None else [result]
+            body = json.dumps({"result": [bindings]}).encode()
+        else:
+            policy_path = scope["path"].removeprefix("/v1/data/")
+            result = engine.evaluate(policy_path, request.get("input", {}))
+            body = json.dumps({} if result is None else {"result": result}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Return p50/p95/p99 latency (ms) and throughput for a run."""
+    ordered = sorted(latencies)
+    p95_index = max(0, int(len(ordered) * 0.95) - 1)
+    p99_index = max(0, int(len(ordered) * 0.99) - 1)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[p95_index] * 1000, 3),
+        "p99_ms": round(ordered[p99_index] * 1000, 3),
+        "req_per_s": round(len(ordered) / elapsed, 1),
+    }
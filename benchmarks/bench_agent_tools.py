@@ -0,0 +1,171 @@
+"""
+Agent tool execution: batching and executor placement.
+
+``batch`` runs ``--actions`` calls to an I/O-bound tool (``--io-delay``
+seconds each, thread pool) one HTTP-equivalent call at a time and then as a
+single ``execute_many``. ``cpu`` runs the CPU-bound ``sha256`` tool inline on
+the event loop and then in the process pool while a ticker measures how late
+the loop wakes up (the delay every other request would see). ``retry``
+repeats one ``sha256`` call: re-executed, answered from the tool's result
+cache (policy still evaluated), and replayed for its ``Idempotency-Key``.
+
+Run with ``python -m benchmarks.bench_agent_tools --actions 16``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List
+
+from app.config import Settings
+from app.idempotency import IdempotencyStore
+from app.models.agent import AgentActionRequest
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.response_cache import MemoryResponseStore
+from app.services.agent_service import AgentService
+
+
+def _tool_sha256(arguments: Dict[str, str]) -> Dict[str, str]:
+    """CPU-bound tool: ``rounds`` iterations of SHA-256 over ``text``."""
+    digest = arguments.get("text", "").encode()
+    for _ in range(int(arguments.get("rounds", "1"))):
+        digest = hashlib.sha256(digest).digest()
+    return {"sha256": digest.hex()}
+
+
+def _io_tool(delay: float):
+    def handler(_: Dict[str, str]) -> Dict[str, str]:
+        time.sleep(delay)
+        return {"ok": "true"}
+
+    return handler
+
+
+async def _inline_sha256(arguments: Dict[str, str]) -> Dict[str, str]:
+    return _tool_sha256(arguments)
+
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.005) -> List[float]:
+    lags: List[float] = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+
+async def _bench_batch(service: AgentService, actions: int) -> Dict[str, Any]:
+    requests = [AgentActionRequest(tool="io", input={}) for _ in range(actions)]
+    started = time.perf_counter()
+    for request in requests:
+        await service.execute(request)
+    sequential = time.perf_counter() - started
+    started = time.perf_counter()
+    response = await service.execute_many(requests)
+    batch = time.perf_counter() - started
+    assert all(item.status == "success" for item in response.results)
+    return {
+        "sequential_ms": round(sequential * 1000, 1),
+        "batch_ms": round(batch * 1000, 1),
+        "speedup": round(sequential / batch, 1),
+    }
+
+
+async def _bench_cpu(service: AgentService, tool: str, calls: int, rounds: int):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_loop_lag(stop))
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    await service.execute_many(
+        [
+            AgentActionRequest(
+                tool=tool, input={"text": f"cpu-{index}", "rounds": str(rounds)}
+            )
+            for index in range(calls)
+        ]
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = sorted(await ticker)
+    return {
+        "wall_ms": round(elapsed * 1000, 1),
+        "loop_lag_max_ms": round(lags[-1] * 1000, 1),
+        "loop_lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+    }
+
+
+async def _bench_retry(service: AgentService, rounds: int, retries: int):
+    idempotency = IdempotencyStore(MemoryResponseStore(retries + 1, 60.0))
+    timings: Dict[str, float] = {}
+    for variant in ("execute", "tool_cache", "idempotent"):
+        ttl = 0.0 if variant == "execute" else 300.0
+        service.register_tool("sha256", _tool_sha256, mode="process", cache_ttl=ttl)
+        request = AgentActionRequest(
+            tool="sha256", input={"text": f"retry-{variant}", "rounds": str(rounds)}
+        )
+        await service.execute(request)
+        await idempotency.run(variant, None, request, lambda: service.execute(request))
+        started = time.perf_counter()
+        for _ in range(retries):
+            if variant == "idempotent":
+                await idempotency.run(
+                    variant, None, request, lambda: service.execute(request)
+                )
+            else:
+                await service.execute(request)
+        timings[f"{variant}_us"] = round(
+            (time.perf_counter() - started) / retries * 1e6, 1
+        )
+    return timings
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    settings = Settings(
+        agent_allowed_tools=["io", "sha256", "sha256_inline"],
+        agent_tool_timeout=60.0,
+        agent_tool_max_concurrent=args.actions,
+        agent_thread_workers=args.actions,
+        agent_process_workers=args.process_workers,
+    )
+    service = AgentService(
+        settings, OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    service.register_tool("io", _io_tool(args.io_delay), mode="thread")
+    service.register_tool("sha256", _tool_sha256, mode="process")
+    service.register_tool("sha256_inline", _inline_sha256)
+    try:
+        # Start the worker processes before timing anything.
+        await asyncio.gather(
+            *(
+                service.tools.run("sha256", {"text": "warmup"})
+                for _ in range(args.process_workers)
+            )
+        )
+        report: Dict[str, Any] = {
+            "batch": await _bench_batch(service, args.actions),
+            "cpu": {
+                mode: await _bench_cpu(service, tool, args.cpu_calls, args.rounds)
+                for mode, tool in (("inline", "sha256_inline"), ("process", "sha256"))
+            },
+            "retry": await _bench_retry(service, args.rounds, args.retries),
+        }
+        report["tools"] = service.tools.stats()
+        return report
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--actions", type=int, default=16)
+    parser.add_argument("--io-delay", type=float, default=0.02)
+    parser.add_argument("--cpu-calls", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200_000)
+    parser.add_argument("--process-workers", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=20)
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
@@ -0,0 +1,115 @@
+"""
+Policy decision latency with the audit pipeline off, buffered, or written inline.
+
+Uses the embedded policy engine so the measured difference is the audit cost
+alone. ``buffered`` is the gateway's ring buffer with the background flusher;
+``inline`` writes every record to the sink before returning, for contrast.
+Pass ``--database-url`` to also measure the Postgres ``COPY`` sink.
+
+Run with ``python -m benchmarks.bench_audit --requests 20000``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from app.audit import AuditLog, AuditRecord, AuditSink, JSONLFileSink, PostgresCopySink
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+
+from ._support import summarize
+
+EVENT = SecurityEvent(
+    subject=EventSubject(user_id="bench"),
+    operation=EventOperation(action="execute", component="agent_gateway"),
+    resource=EventResource(type="tool", name="ping"),
+    context=EventContext(metadata={"top_k": 5, "query_length": 42}),
+)
+
+
+class _InlineAudit(AuditLog):
+    """Writes each record before the decision is returned."""
+
+    async def record(self, policy_path, event, allow, reason=None) -> bool:
+        record = AuditRecord(time.time(), policy_path, event, allow, reason)
+        await self.sink.write([record])
+        self.written += 1
+        return True
+
+
+async def _measure(audit: AuditLog | None, total: int, concurrency: int) -> dict:
+    client = OPAClient("http://unused", backend=EmbeddedPolicyBackend(), audit=audit)
+    latencies: List[float] = []
+    queue = iter(range(total))
+
+    async def worker() -> None:
+        for _ in queue:
+            call_started = time.perf_counter()
+            await client.evaluate("agent/allow", EVENT)
+            latencies.append(time.perf_counter() - call_started)
+            # Stands in for the request's own I/O, which lets the flusher run.
+            await asyncio.sleep(0)
+
+    if audit is not None:
+        audit.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    report: dict = summarize(latencies, elapsed)
+    if audit is not None:
+        close_started = time.perf_counter()
+        await audit.close()
+        report["close_ms"] = round((time.perf_counter() - close_started) * 1000, 1)
+        report["audit"] = audit.stats()
+    return report
+
+
+async def main(args: argparse.Namespace) -> None:
+    report: dict = {}
+    with tempfile.TemporaryDirectory() as directory:
+        sinks: dict[str, AuditSink] = {
+            "file": JSONLFileSink(os.path.join(directory, "buffered")),
+            "file_inline": JSONLFileSink(os.path.join(directory, "inline")),
+        }
+        if args.database_url:
+            sinks["postgres"] = PostgresCopySink(args.database_url, args.table)
+            sinks["postgres_inline"] = PostgresCopySink(args.database_url, args.table)
+        report["off"] = await _measure(None, args.requests, args.concurrency)
+        for name, sink in sinks.items():
+            audit_class = _InlineAudit if name.endswith("_inline") else AuditLog
+            audit = audit_class(
+                sink, capacity=args.buffer_size, batch_size=args.batch_size
+            )
+            # Inline writes are far slower; a tenth of the requests is enough.
+            total = args.requests // 10 if name.endswith("_inline") else args.requests
+            report[name] = await _measure(audit, total, args.concurrency)
+        report["file_bytes"] = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory)
+            for name in names
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--buffer-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url")
+    parser.add_argument("--table", default="asb_audit_events_bench")
+    asyncio.run(main(parser.parse_args()))
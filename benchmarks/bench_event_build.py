@@ -0,0 +1,199 @@
+"""
+Cost of building and encoding one policy input per route.
+
+``model`` is the previous path: Pydantic event models, ``model_dump`` and
+the stdlib encoder httpx uses for ``json=``. ``fast`` is what the services
+do now: ``app.policy_input`` builders plus the cached encoding (orjson when
+installed). Both produce the same document.
+
+Run with ``python -m benchmarks.bench_event_build --iterations 50000``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+from uuid import uuid4
+
+from app import policy_input
+from app.config import Settings
+from app.models.asb_events import SecurityEventLlmInput
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.models.llm import ChatCompletionRequest, ChatMessage
+from app.models.rag import RAGSearchRequest, RAGSearchResult
+from app.services.llm_proxy import _build_output_event, _build_security_event
+from app.services.rag_service import RAGService
+
+SETTINGS = Settings()
+RAG = RAGService(SETTINGS, opa_client=None)
+RAG_REQUEST = RAGSearchRequest(query="how do I rotate credentials?")
+RESULTS = [
+    RAGSearchResult(
+        id=str(index),
+        content="...",
+        score=0.9,
+        metadata={"tenant_id": "acme", "classification": "internal"},
+    )
+    for index in range(10)
+]
+CHAT = ChatCompletionRequest(
+    model="gpt-4o-mini",
+    messages=[
+        ChatMessage(role="system", content="You are a helpful assistant."),
+        ChatMessage(role="user", content="Summarise our security policy." * 4),
+        ChatMessage(role="assistant", content="Here is a summary ..." * 4),
+        ChatMessage(role="user", content="Shorter please."),
+    ],
+    temperature=0.2,
+)
+
+
+def _encode(document: Dict[str, Any]) -> bytes:
+    # What httpx does with ``json={"input": ...}``.
+    return json.dumps({"input": document}).encode()
+
+
+def _model_agent() -> bytes:
+    event = SecurityEvent(
+        subject=EventSubject(user_id="agent"),
+        operation=EventOperation(action="execute", component="agent_gateway"),
+        resource=EventResource(type="tool", name="ping"),
+        context=EventContext(metadata={"host": "example.com"}),
+    )
+    return _encode(event.model_dump(mode="json"))
+
+
+def _model_rag_search() -> bytes:
+    event = SecurityEvent(
+        subject=EventSubject(user_id="rag-user", tenant_id="acme"),
+        operation=EventOperation(action="search", component="rag_gateway"),
+        resource=EventResource(type="collection", name="documents"),
+        context=EventContext(metadata={"top_k": 5, "query_length": 28}),
+    )
+    return _encode(event.model_dump(mode="json"))
+
+
+def _model_rag_results() -> bytes:
+    event = SecurityEvent(
+        subject=EventSubject(user_id="rag-user", tenant_id="acme"),
+        operation=EventOperation(action="retrieve", component="rag_gateway"),
+        resource=EventResource.model_validate(
+            {
+                "type": "documents",
+                "name": "documents",
+                "documents": [
+                    {"id": result.id, "metadata": result.metadata} for result in RESULTS
+                ],
+            }
+        ),
+        context=EventContext(metadata={"query_length": 28}),
+    )
+    return _encode(event.model_dump(mode="json"))
+
+
+def _model_llm(direction: str) -> bytes:
+    if direction == "input":
+        resource: Dict[str, Any] = {
+            "llm": {"messages": [message.model_dump() for message in CHAT.messages]}
+        }
+        context: Dict[str, Any] = {
+            "metadata": {
+                "message_roles": [message.role for message in CHAT.messages],
+                "temperature": CHAT.temperature,
+            }
+        }
+    else:
+        resource, context = {"llm": {"output": "partial output " * 16}}, {}
+    event = SecurityEventLlmInput(
+        event_id=str(uuid4()),
+        timestamp=datetime.now(tz=timezone.utc),
+        app_id=SETTINGS.app_name,
+        env=SETTINGS.app_env,
+        subject={"user_id": "alice"},
+        operation={
+            "category": "llm_completion",
+            "name": "chat_completion",
+            "direction": direction,
+            "stage": "pre" if direction == "input" else "streaming",
+            "model": {"name": CHAT.model, "provider": "upstream", "mode": "chat"},
+        },
+        resource=resource,
+        context=context,
+    )
+    return _encode(event.model_dump(mode="json"))
+
+
+def _fast(document: Callable[[], policy_input.PolicyInput]) -> Callable[[], bytes]:
+    return lambda: b'{"input":' + document().encoded() + b"}"
+
+
+CASES: Dict[str, Dict[str, Callable[[], bytes]]] = {
+    "agent_execute": {
+        "model": _model_agent,
+        "fast": _fast(
+            lambda: policy_input.security_event(
+                "agent",
+                {"action": "execute", "component": "agent_gateway"},
+                {"type": "tool", "name": "ping"},
+                {"host": "example.com"},
+            )
+        ),
+    },
+    "rag_search": {
+        "model": _model_rag_search,
+        "fast": _fast(lambda: RAG._event(RAG_REQUEST, 5, "acme")),
+    },
+    "rag_results": {
+        "model": _model_rag_results,
+        "fast": _fast(lambda: RAG._results_event(RAG_REQUEST, RESULTS, "acme")),
+    },
+    "llm_input": {
+        "model": lambda: _model_llm("input"),
+        "fast": _fast(lambda: _build_security_event(CHAT, SETTINGS, "alice")),
+    },
+    "llm_output": {
+        "model": lambda: _model_llm("output"),
+        "fast": _fast(
+            lambda: _build_output_event(CHAT, SETTINGS, "alice", "partial output " * 16)
+        ),
+    },
+}
+
+
+def _per_call_us(call: Callable[[], bytes], iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        call()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(args: argparse.Namespace) -> None:
+    report: Dict[str, Any] = {
+        "encoder": "stdlib" if policy_input.orjson is None else "orjson"
+    }
+    for route, variants in CASES.items():
+        timings = {
+            f"{name}_us": round(_per_call_us(call, args.iterations), 2)
+            for name, call in variants.items()
+        }
+        timings["speedup"] = round(timings["model_us"] / timings["fast_us"], 1)
+        timings["bytes"] = len(variants["fast"]())
+        report[route] = timings
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50000)
+    main(parser.parse_args())
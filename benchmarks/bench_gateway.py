@@ -0,0 +1,398 @@
+"""
+End-to-end load test of the gateway against local stand-ins.
+
+Boots ``app.main:app`` under uvicorn in its own process, pointed at a fake
+OPA server and a fake OpenAI-compatible upstream (run together in a second
+process, with injectable latency and error rates). RAG is served from a
+synthetic memory-mapped snapshot (``RAG_LOCAL_INDEX_MODE=primary``) unless
+``--database-url`` points at a pgvector database loaded from ``docker/init``.
+
+Each route is driven either closed-loop (``--concurrency`` workers sending
+``--requests`` requests) or open-loop (``--rate`` requests/s for
+``--duration`` seconds, with latency measured from the scheduled send time so
+a slow gateway cannot hide queueing). The report lists p50/p95/p99, req/s,
+errors and the gateway's CPU and peak RSS per route (needs ``psutil``);
+``--output`` saves it and ``--baseline`` adds the change against an earlier
+report, for comparing commits.
+
+Run with ``python -m benchmarks.bench_gateway --requests 2000 --output run.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import uvicorn
+
+from app.vector_index import write_snapshot
+
+from ._support import _free_port, fake_chat_upstream, fake_opa, summarize
+
+try:
+    import psutil  # type: ignore[import-untyped]
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
+CHAT = {
+    "model": "bench-model",
+    "messages": [{"role": "user", "content": "Summarise the security policy."}],
+}
+RAG_QUERY = {"query": "how do I rotate credentials?", "top_k": 5}
+
+# name -> (path, JSON body, streamed response)
+ROUTES: Dict[str, Tuple[str, Dict[str, Any], bool]] = {
+    "chat": ("/v1/chat/completions", CHAT, False),
+    "chat_stream": ("/v1/chat/completions", {**CHAT, "stream": True}, True),
+    "rag_search": ("/v1/rag/search_safe", RAG_QUERY, False),
+    "rag_batch": ("/v1/rag/search_batch", {"queries": [RAG_QUERY] * 4}, False),
+    "agent_execute": ("/v1/agent/action/execute", {"tool": "ping"}, False),
+}
+
+
+def _serve_stand_ins(opa_port: int, upstream_port: int, profile: Dict) -> None:
+    """Child process: serve the fake OPA and upstream until terminated."""
+    apps = (
+        (
+            fake_opa(
+                profile["opa_delay"],
+                slow_rate=profile["opa_slow_rate"],
+                slow_delay=profile["opa_slow_delay"],
+                error_rate=profile["opa_error_rate"],
+            ),
+            opa_port,
+        ),
+        (
+            fake_chat_upstream(
+                profile["upstream_delay"],
+                profile["upstream_chunks"],
+                profile["upstream_chunk_delay"],
+                error_rate=profile["upstream_error_rate"],
+            ),
+            upstream_port,
+        ),
+    )
+    servers = [
+        uvicorn.Server(
+            uvicorn.Config(
+                app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+            )
+        )
+        for app, port in apps
+    ]
+
+    async def serve() -> None:
+        await asyncio.gather(*(server.serve() for server in servers))
+
+    asyncio.run(serve())
+
+
+def _wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def _write_documents(path: str, count: int, dims: int) -> None:
+    rng = random.Random(7)
+    write_snapshot(
+        path,
+        [
+            {
+                "id": index,
+                "content": f"synthetic document {index}",
+                "metadata": {"tenant_id": f"t{index % 8}"},
+                "embedding": [rng.uniform(-1, 1) for _ in range(dims)],
+            }
+            for index in range(count)
+        ],
+    )
+
+
+class _ResourceSampler:
+    """CPU share and peak RSS of the gateway process while a route runs."""
+
+    def __init__(self, pid: int) -> None:
+        self._process = psutil.Process(pid) if psutil is not None else None
+        self._task: asyncio.Task[None] | None = None
+        self._peak_rss = 0
+
+    async def _sample(self) -> None:
+        assert self._process is not None
+        while True:
+            self._peak_rss = max(self._peak_rss, self._process.memory_info().rss)
+            await asyncio.sleep(0.1)
+
+    def start(self) -> None:
+        if self._process is None:
+            return
+        self._cpu = self._process.cpu_times()
+        self._started = time.perf_counter()
+        self._peak_rss = 0
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> Dict[str, float | None]:
+        if self._process is None or self._task is None:
+            return {"cpu_percent": None, "rss_mb_peak": None}
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        cpu = self._process.cpu_times()
+        busy = (cpu.user - self._cpu.user) + (cpu.system - self._cpu.system)
+        return {
+            "cpu_percent": round(100 * busy / (time.perf_counter() - self._started), 1),
+            "rss_mb_peak": round(self._peak_rss / 2**20, 1),
+        }
+
+
+async def _send(client: httpx.AsyncClient, route: str) -> bool:
+    path, body, stream = ROUTES[route]
+    try:
+        if stream:
+            async with client.stream("POST", path, json=body) as response:
+                await response.aread()
+        else:
+            response = await client.post(path, json=body)
+    except httpx.HTTPError:
+        return False
+    return response.status_code < 400
+
+
+async def _closed_loop(
+    client: httpx.AsyncClient, route: str, total: int, concurrency: int
+) -> Tuple[List[float], int, float]:
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in queue:
+            call_started = time.perf_counter()
+            if not await _send(client, route):
+                errors += 1
+            latencies.append(time.perf_counter() - call_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def _open_loop(
+    client: httpx.AsyncClient, route: str, rate: float, duration: float
+) -> Tuple[List[float], int, float]:
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+    errors = 0
+
+    async def call(scheduled: float) -> None:
+        nonlocal errors
+        if not await _send(client, route):
+            errors += 1
+        latencies.append(loop.time() - scheduled)
+
+    tasks = []
+    started = loop.time()
+    for index in range(int(rate * duration)):
+        scheduled = started + index / rate
+        if scheduled > loop.time():
+            await asyncio.sleep(scheduled - loop.time())
+        tasks.append(asyncio.create_task(call(scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies, errors, loop.time() - started
+
+
+async def _run_route(
+    base_url: str, route: str, pid: int, args: argparse.Namespace
+) -> Dict[str, Any]:
+    connections = args.concurrency if args.rate is None else 1000
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        limits=httpx.Limits(max_connections=connections),
+        timeout=30.0,
+        headers={"X-ASB-User-Id": "t1"},
+    ) as client:
+        await _closed_loop(client, route, args.warmup, args.concurrency)
+        sampler = _ResourceSampler(pid)
+        sampler.start()
+        if args.rate is None:
+            latencies, errors, elapsed = await _closed_loop(
+                client, route, args.requests, args.concurrency
+            )
+        else:
+            latencies, errors, elapsed = await _open_loop(
+                client, route, args.rate, args.duration
+            )
+        resources = await sampler.stop()
+    return {**summarize(latencies, elapsed), "errors": errors, **resources}
+
+
+def _compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Add each route's percentage change against ``baseline``."""
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        current["vs_baseline_pct"] = {
+            key: round(100 * (current[key] - previous[key]) / previous[key], 1)
+            for key in ("p50_ms", "p95_ms", "p99_ms", "req_per_s")
+            if previous.get(key)
+        }
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args: argparse.Namespace) -> None:
+    profile = {
+        key: getattr(args, key)
+        for key in (
+            "opa_delay",
+            "opa_slow_rate",
+            "opa_slow_delay",
+            "opa_error_rate",
+            "upstream_delay",
+            "upstream_chunks",
+            "upstream_chunk_delay",
+            "upstream_error_rate",
+        )
+    }
+    opa_port, upstream_port, gateway_port = _free_port(), _free_port(), _free_port()
+    stand_ins = multiprocessing.get_context("spawn").Process(
+        target=_serve_stand_ins,
+        args=(opa_port, upstream_port, profile),
+        daemon=True,
+    )
+    stand_ins.start()
+    workdir = tempfile.TemporaryDirectory()
+    env = {
+        **os.environ,
+        "OPA_URL": f"http://127.0.0.1:{opa_port}",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        "LOG_LEVEL": "WARNING",
+    }
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        snapshot = os.path.join(workdir.name, "documents.asbvec")
+        _write_documents(snapshot, args.documents, 6)
+        env.update(
+            {
+                "DATABASE_URL": "postgresql://bench@127.0.0.1:1/unused",
+                "RAG_LOCAL_INDEX_PATH": snapshot,
+                "RAG_LOCAL_INDEX_MODE": "primary",
+                "RAG_POOL_MIN_SIZE": "0",
+            }
+        )
+    env.update(item.split("=", 1) for item in args.env)
+    gateway = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(gateway_port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    report: Dict[str, Any] = {
+        "commit": _commit(),
+        "mode": "closed" if args.rate is None else "open",
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "rate": args.rate,
+        "duration": args.duration,
+        "profile": profile,
+        "rag": "postgres" if args.database_url else f"snapshot:{args.documents}",
+        "env": args.env,
+        "routes": {},
+    }
+    try:
+        _wait_for_port(opa_port)
+        _wait_for_port(upstream_port)
+        _wait_for_port(gateway_port)
+        base_url = f"http://127.0.0.1:{gateway_port}"
+        for route in args.routes:
+            report["routes"][route] = asyncio.run(
+                _run_route(base_url, route, gateway.pid, args)
+            )
+    finally:
+        gateway.terminate()
+        gateway.wait(timeout=10)
+        stand_ins.terminate()
+        stand_ins.join(timeout=5)
+        workdir.cleanup()
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            _compare(report, json.load(handle))
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(rendered + "\n")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--routes", nargs="+", choices=sorted(ROUTES), default=list(ROUTES)
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument(
+        "--rate", type=float, help="open-loop requests/s (default: closed loop)"
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--opa-delay", type=float, default=0.001)
+    parser.add_argument("--opa-slow-rate", type=float, default=0.0)
+    parser.add_argument("--opa-slow-delay", type=float, default=0.0)
+    parser.add_argument("--opa-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-delay", type=float, default=0.05)
+    parser.add_argument("--upstream-chunks", type=int, default=10)
+    parser.add_argument("--upstream-chunk-delay", type=float, default=0.005)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--database-url")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="extra gateway setting, e.g. --env POLICY_BACKEND=embedded",
+    )
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Time-to-first-token of streamed versus buffered chat completions.
+
+Boots the gateway against a local fake upstream that emits ``--chunks`` SSE
+chunks ``--chunk-delay`` seconds apart, then compares the time until the first
+response bytes arrive with ``stream`` on and off.
+
+Run with ``python -m benchmarks.bench_llm_streaming``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+
+from app.config import Settings, get_settings
+from app.container import get_opa_client
+from app.main import app
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+
+from ._support import fake_chat_upstream, serve_in_thread, summarize
+
+
+async def _measure(client: httpx.AsyncClient, stream: bool, total: int) -> dict:
+    payload = {
+        "model": "bench-model",
+        "messages": [{"role": "user", "content": "ping"}],
+        "stream": stream,
+    }
+    first_byte: List[float] = []
+    complete: List[float] = []
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        async with client.stream("POST", "/v1/chat/completions", json=payload) as resp:
+            resp.raise_for_status()
+            seen_first = False
+            async for _chunk in resp.aiter_bytes():
+                if not seen_first:
+                    first_byte.append(time.perf_counter() - call_started)
+                    seen_first = True
+        complete.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    return {
+        "time_to_first_byte": summarize(first_byte, elapsed),
+        "complete": summarize(complete, elapsed),
+    }
+
+
+async def main(total: int, chunks: int, chunk_delay: float, window: int) -> None:
+    upstream_url, stop_upstream = serve_in_thread(
+        fake_chat_upstream(delay=0.05, chunks=chunks, chunk_delay=chunk_delay)
+    )
+    settings = Settings(openai_api_key="bench", openai_base_url=upstream_url)
+    app.dependency_overrides[get_settings] = lambda: settings
+    opa = OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    app.dependency_overrides[get_opa_client] = lambda: opa
+    gateway_url, stop_gateway = serve_in_thread(app)
+    report = {}
+    try:
+        async with httpx.AsyncClient(base_url=gateway_url, timeout=60) as client:
+            report["buffered"] = await _measure(client, False, total)
+            report["streamed"] = await _measure(client, True, total)
+            settings.stream_output_policy = "output/allow"
+            settings.stream_output_window_chars = window
+            report[f"streamed_output_policy_w{window}"] = await _measure(
+                client, True, total
+            )
+    finally:
+        stop_gateway()
+        stop_upstream()
+        app.dependency_overrides.clear()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--window", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.chunks, args.chunk_delay, args.window))
@@ -0,0 +1,101 @@
+"""
+Throughput cost of the Prometheus instrumentation.
+
+Serves the gateway with the embedded policy backend and drives the agent
+execute endpoint with metrics recording switched on and off in alternating
+rounds, so drift in the host affects both sides equally. Also reports the
+cost of a single stage observation in nanoseconds.
+
+Run with ``python -m benchmarks.bench_metrics_overhead --requests 3000``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+
+from app import metrics
+from app.config import Settings
+from app.container import get_agent_service
+from app.main import app
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.services.agent_service import AgentService
+
+from ._support import serve_in_thread, summarize
+
+
+async def _measure(base_url: str, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    queue = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+        async def worker() -> None:
+            for _ in queue:
+                call_started = time.perf_counter()
+                response = await client.post(
+                    "/v1/agent/action/execute", json={"tool": "ping"}
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - call_started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _observe_ns(iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        with metrics.timed("bench"):
+            pass
+    return (time.perf_counter_ns() - started) / iterations
+
+
+async def main(args: argparse.Namespace) -> None:
+    service = AgentService(
+        Settings(), OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    app.dependency_overrides[get_agent_service] = lambda: service
+    base_url, stop = serve_in_thread(app)
+    runs: dict = {"enabled": [], "disabled": []}
+    try:
+        await _measure(base_url, args.requests // 4, args.concurrency)  # warm-up
+        for _ in range(args.rounds):
+            for name in ("disabled", "enabled"):
+                metrics.set_enabled(name == "enabled")
+                runs[name].append(
+                    await _measure(base_url, args.requests, args.concurrency)
+                )
+    finally:
+        metrics.set_enabled(True)
+        stop()
+        app.dependency_overrides.clear()
+
+    report: dict = {}
+    for name, results in runs.items():
+        report[name] = {
+            "req_per_s": round(sum(r["req_per_s"] for r in results) / len(results), 1),
+            "p50_ms": round(sum(r["p50_ms"] for r in results) / len(results), 3),
+            "p99_ms": round(sum(r["p99_ms"] for r in results) / len(results), 3),
+        }
+    report["throughput_overhead_pct"] = round(
+        100 * (1 - report["enabled"]["req_per_s"] / report["disabled"]["req_per_s"]),
+        2,
+    )
+    report["observe_ns"] = round(_observe_ns(200_000), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Compare policy decision latency of the OPA HTTP backend and the embedded engine.
+
+Run with ``python -m benchmarks.bench_policy_backends [--opa-url URL]``. Without
+``--opa-url`` a local OPA stand-in is started so only the HTTP hop is measured.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+
+from ._support import fake_opa, serve_in_thread, summarize
+
+EVENT = SecurityEvent(
+    subject=EventSubject(user_id="bench"),
+    operation=EventOperation(action="execute", component="agent_gateway"),
+    resource=EventResource(type="tool", name="ping"),
+    context=EventContext(metadata={"top_k": 5, "query_length": 42}),
+)
+
+
+async def _measure(client: OPAClient, total: int) -> dict:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        await client.evaluate("agent/allow", EVENT)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def _measure_batch(client: OPAClient, total: int, size: int) -> dict:
+    """Latency of ``size`` checks sent one by one versus one evaluate_many call."""
+    checks = [("agent/allow", EVENT)] * size
+    sequential: List[float] = []
+    batched: List[float] = []
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        for policy_path, event in checks:
+            await client.evaluate(policy_path, event)
+        sequential.append(time.perf_counter() - call_started)
+    sequential_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        await client.evaluate_many(checks)
+        batched.append(time.perf_counter() - call_started)
+    return {
+        f"sequential_x{size}": summarize(sequential, sequential_elapsed),
+        f"evaluate_many_x{size}": summarize(batched, time.perf_counter() - started),
+    }
+
+
+async def main(total: int, opa_url: str | None) -> None:
+    stop = None
+    if opa_url is None:
+        opa_url, stop = serve_in_thread(fake_opa())
+    http_client = OPAClient(opa_url)
+    embedded_client = OPAClient(opa_url, backend=EmbeddedPolicyBackend())
+    try:
+        report = {
+            "opa_http": await _measure(http_client, total),
+            "embedded": await _measure(embedded_client, total),
+            "opa_http_batch": await _measure_batch(http_client, total // 4, 4),
+        }
+    finally:
+        await http_client.close()
+        await embedded_client.close()
+        if stop is not None:
+            stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--opa-url", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.opa_url))
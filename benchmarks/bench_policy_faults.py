@@ -0,0 +1,121 @@
+"""
+Policy decision latency and error rate while OPA is slow or failing.
+
+Starts a local OPA stand-in that delays a fraction of requests and fails
+another fraction with HTTP 500, then compares the plain HTTP backend with the
+resilient one (adaptive timeout, retry, hedging) under the same faults. A
+final phase stops answering entirely to show the circuit breaker failing fast.
+
+Run with ``python -m benchmarks.bench_policy_faults --requests 2000``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import HTTPPolicyBackend, OPAClient
+from app.policy_resilience import CircuitBreaker, ResilientPolicyBackend
+
+from ._support import fake_opa, serve_in_thread, summarize
+
+EVENT = SecurityEvent(
+    subject=EventSubject(user_id="bench"),
+    operation=EventOperation(action="execute", component="agent_gateway"),
+    resource=EventResource(type="tool", name="ping"),
+    context=EventContext(metadata={}),
+)
+
+
+async def _measure(client: OPAClient, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in queue:
+            call_started = time.perf_counter()
+            try:
+                await client.evaluate("agent/allow", EVENT)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - call_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**summarize(latencies, time.perf_counter() - started), "errors": errors}
+
+
+def _resilient(url: str, **options: float) -> OPAClient:
+    backend = ResilientPolicyBackend(
+        HTTPPolicyBackend(url, timeout=5.0),
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1.0),
+        retries=1,
+        retry_backoff=0.01,
+        min_timeout=0.02,
+        hedge=True,
+        **options,
+    )
+    return OPAClient(url, backend=backend)
+
+
+async def main(args: argparse.Namespace) -> None:
+    faulty_url, stop_faulty = serve_in_thread(
+        fake_opa(
+            slow_rate=args.slow_rate,
+            slow_delay=args.slow_delay,
+            error_rate=args.error_rate,
+        )
+    )
+    # Every request hangs for longer than the plain client's timeout.
+    down_url, stop_down = serve_in_thread(fake_opa(delay=10.0))
+    clients = {
+        "plain": OPAClient(faulty_url, timeout=5.0),
+        "resilient": _resilient(faulty_url),
+        "plain_down": OPAClient(down_url, timeout=1.0),
+        "resilient_down": _resilient(down_url, max_timeout=1.0),
+    }
+    report: dict = {
+        "faults": {
+            "slow_rate": args.slow_rate,
+            "slow_delay_s": args.slow_delay,
+            "error_rate": args.error_rate,
+        }
+    }
+    try:
+        for name in ("plain", "resilient"):
+            report[name] = await _measure(
+                clients[name], args.requests, args.concurrency
+            )
+        for name in ("plain_down", "resilient_down"):
+            report[name] = await _measure(clients[name], 50, args.concurrency)
+        resilient = clients["resilient"].backend
+        assert isinstance(resilient, ResilientPolicyBackend)
+        report["resilient_stats"] = resilient.stats()
+    finally:
+        for client in clients.values():
+            await client.close()
+        stop_faulty()
+        stop_down()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=0.25)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""
+Compare a fresh AsyncClient per chat completion with the shared upstream pool.
+
+Run with ``python -m benchmarks.bench_upstream_pool [--requests N] [--concurrency C]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List
+
+from app.config import Settings
+from app.models.llm import ChatCompletionRequest, ChatMessage
+from app.services.llm_proxy import _forward_to_upstream
+from app.upstream import UpstreamClientPool
+
+from ._support import fake_chat_upstream, serve_in_thread, summarize
+
+
+async def _drive(
+    call: Callable[[], Awaitable[object]], total: int, concurrency: int
+) -> dict:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(total: int, concurrency: int) -> None:
+    base_url, stop = serve_in_thread(fake_chat_upstream())
+    settings = Settings(openai_api_key="bench", openai_base_url=base_url)
+    request = ChatCompletionRequest(
+        model="bench-model", messages=[ChatMessage(role="user", content="ping")]
+    )
+
+    async def per_request_client() -> object:
+        pool = UpstreamClientPool(settings)
+        try:
+            return await _forward_to_upstream(request, settings, pool)
+        finally:
+            await pool.close()
+
+    shared = UpstreamClientPool(settings)
+
+    async def pooled_client() -> object:
+        return await _forward_to_upstream(request, settings, shared)
+
+    try:
+        report = {
+            "per_request_client": await _drive(per_request_client, total, concurrency),
+            "pooled_client": await _drive(pooled_client, total, concurrency),
+        }
+    finally:
+        await shared.close()
+        stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
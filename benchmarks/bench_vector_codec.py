@@ -0,0 +1,95 @@
+"""
+Cost of sending embeddings as text literals versus the binary vector codec.
+
+Measures client-side encoding for 6-dim and 1536-dim embeddings and, with
+``--database-url``, the ``SELECT $1::vector`` round-trip both ways.
+
+Run with ``python -m benchmarks.bench_vector_codec [--database-url DSN]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, List, Sequence
+
+import asyncpg  # type: ignore[import-untyped]
+
+from app.pgvector import encode_vector, register_vector_codec
+
+from ._support import summarize
+
+
+def _text_literal(embedding: Sequence[float]) -> str:
+    # The encoding the RAG service used before the binary codec.
+    return "[" + ",".join(f"{value:.4f}" for value in embedding) + "]"
+
+
+def _measure_encode(
+    encode: Callable[[Any], Any], embedding: List[float], total: int
+) -> dict:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        encode(embedding)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def _measure_query(
+    connection: asyncpg.Connection, sql: str, value: Any, total: int
+) -> dict:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(total):
+        call_started = time.perf_counter()
+        await connection.fetchval(sql, value)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(total: int, database_url: str | None) -> None:
+    report: dict = {}
+    for dims in (6, 1536):
+        embedding = [random.uniform(-1, 1) for _ in range(dims)]
+        report[f"encode_{dims}d"] = {
+            "text": _measure_encode(_text_literal, embedding, total),
+            "binary": _measure_encode(encode_vector, embedding, total),
+        }
+        if database_url is None:
+            continue
+        text_conn = await asyncpg.connect(database_url)
+        binary_conn = await asyncpg.connect(database_url)
+        await register_vector_codec(binary_conn)
+        try:
+            # Both sides return the dimension count so only the input differs.
+            report[f"query_{dims}d"] = {
+                "text": await _measure_query(
+                    text_conn,
+                    "SELECT vector_dims($1::text::vector)",
+                    _text_literal(embedding),
+                    total // 10,
+                ),
+                "binary": await _measure_query(
+                    binary_conn,
+                    "SELECT vector_dims($1::vector)",
+                    embedding,
+                    total // 10,
+                ),
+            }
+        finally:
+            await text_conn.close()
+            await binary_conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.database_url))
@@ -0,0 +1,7 @@
+-- Shared token buckets used when RATE_LIMIT_BACKEND=postgres.
+CREATE TABLE IF NOT EXISTS asb_rate_limits (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL,
+    allowed BOOLEAN NOT NULL
+);
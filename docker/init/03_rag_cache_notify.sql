@@ -0,0 +1,11 @@
+-- Tell gateways to drop cached RAG results whenever the corpus changes.
+CREATE OR REPLACE FUNCTION asb_notify_documents_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('asb_documents_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER documents_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON documents
+    FOR EACH STATEMENT EXECUTE FUNCTION asb_notify_documents_changed();
@@ -0,0 +1,8 @@
+-- ANN and metadata indexes for RAG search. Names match the ones the gateway
+-- manages when RAG_INDEX_TYPE is set, so it will not build duplicates.
+CREATE INDEX IF NOT EXISTS documents_metadata_gin
+    ON documents USING gin (metadata jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS documents_embedding_hnsw
+    ON documents USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,10 @@
+-- Security events and decisions written when AUDIT_BACKEND=postgres.
+CREATE TABLE IF NOT EXISTS asb_audit_events (
+    id BIGSERIAL PRIMARY KEY,
+    ts TIMESTAMPTZ NOT NULL,
+    policy TEXT NOT NULL,
+    allow BOOLEAN NOT NULL,
+    reason TEXT,
+    event JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS asb_audit_events_ts_idx ON asb_audit_events (ts);
@@ -0,0 +1,14 @@
+package output
+
+default allow = {"allow": true}
+
+allow = {"allow": false, "reason": reason} {
+    reasons := deny_reasons
+    count(reasons) > 0
+    reason := concat("; ", reasons)
+}
+
+deny_reasons[reason] {
+    contains(lower(input.resource.llm.output), "-----begin")
+    reason := "private key material in output"
+}
@@ -25,3 +25,8 @@ deny_reasons[reason] {
     reason := "too many messages"
 }
 
+
+deny_reasons[reason] {
+    input.context.metadata.max_tokens > input.context.budget.tokens_remaining
+    reason := "max_tokens exceeds token budget"
+}
@@ -18,3 +18,16 @@ deny_reasons[reason] {
     reason := "query too long"
 }
 
+
+# Retrieved rows, judged together: input.resource.documents holds every
+# candidate and "denied" lists the positions the subject may not see.
+results = {"allow": true, "denied": sort(denied_results)}
+
+denied_results[index] {
+    document := input.resource.documents[index]
+    document.metadata.tenant_id != input.subject.tenant_id
+}
+
+denied_results[index] {
+    input.resource.documents[index].metadata.classification == "restricted"
+}
@@ -0,0 +1,62 @@
+"""Tests for per-route and per-backend admission control."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController, ConcurrencyLimiter
+from app.config import Settings
+from app.container import get_admission
+from app.main import app
+from app.services.exceptions import OverloadedError
+
+
+def test_limiter_queues_then_sheds_load():
+    """Callers queue up to the bound, then get rejected or time out."""
+    limiter = ConcurrencyLimiter("test", 1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 1
+        with pytest.raises(OverloadedError):
+            await limiter.acquire()
+        with pytest.raises(OverloadedError):
+            await queued
+        limiter.release()
+        async with limiter.slot():
+            assert limiter.active == 1
+
+    asyncio.run(run())
+
+    stats = limiter.stats()
+    assert stats["rejected"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["active"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_saturated_route_returns_503_with_retry_after():
+    """A full route limiter should answer immediately with Retry-After."""
+    settings = Settings(
+        admission_limits={"agent_execute": 1},
+        admission_queue_limits={"agent_execute": 0},
+        admission_retry_after=3,
+    )
+    admission = AdmissionController(settings)
+    limiter = admission.get("agent_execute")
+    assert limiter is not None
+    asyncio.run(limiter.acquire())
+    app.dependency_overrides[get_admission] = lambda: admission
+    try:
+        response = TestClient(app).post(
+            "/v1/agent/action/execute", json={"tool": "ping"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert limiter.stats()["rejected"] == 1
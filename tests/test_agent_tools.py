@@ -0,0 +1,190 @@
+"""Tests for the agent tool registry and the batch agent endpoint."""
+
+import asyncio
+import hashlib
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.config import Settings
+from app.container import get_agent_service, get_config
+from app.main import app
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.routes.agent import _cancel_on_disconnect, _ClientDisconnected
+from app.services.agent_service import AgentService
+from app.services.exceptions import ToolTimeoutError
+from app.tools import ToolRegistry
+
+
+async def _slow(arguments):
+    await asyncio.sleep(float(arguments.get("seconds", "0.2")))
+    return {"slept": arguments.get("seconds", "0.2")}
+
+
+def _blocking(arguments):
+    time.sleep(float(arguments["seconds"]))
+    return {"slept": arguments["seconds"]}
+
+
+def _sha256(arguments):
+    # Module level so the process pool can pickle it.
+    digest = arguments["text"].encode()
+    for _ in range(int(arguments["rounds"])):
+        digest = hashlib.sha256(digest).digest()
+    return {"sha256": digest.hex()}
+
+
+async def _broken(_):
+    raise RuntimeError("boom")
+
+
+def test_tools_run_in_their_declared_mode():
+    registry = ToolRegistry(process_workers=1)
+    registry.register("slow", _slow)
+    registry.register("blocking", _blocking, mode="thread")
+    registry.register("sha256", _sha256, mode="process")
+
+    async def run():
+        started = time.perf_counter()
+        # The blocking tool must not stall the event loop for the async one.
+        outputs = await asyncio.gather(
+            registry.run("blocking", {"seconds": "0.2"}),
+            registry.run("slow", {"seconds": "0.2"}),
+        )
+        elapsed = time.perf_counter() - started
+        digest = await registry.run("sha256", {"text": "a", "rounds": "2"})
+        return outputs, elapsed, digest
+
+    try:
+        outputs, elapsed, digest = asyncio.run(run())
+    finally:
+        registry.close()
+    assert outputs == [{"slept": "0.2"}, {"slept": "0.2"}]
+    assert elapsed < 0.35
+    expected = hashlib.sha256(hashlib.sha256(b"a").digest()).hexdigest()
+    assert digest == {"sha256": expected}
+    stats = registry.stats()
+    assert stats["blocking"]["mode"] == "thread"
+    assert stats["sha256"]["calls"] == 1
+    assert stats["slow"]["latency_p50_seconds"] >= 0.2
+
+
+def test_timeouts_and_concurrency_limits():
+    registry = ToolRegistry()
+    registry.register("slow", _slow, max_concurrent=2, timeout=0.5)
+    registry.register("stuck", _blocking, mode="thread", timeout=0.05)
+    peak = 0
+
+    async def tracked(_):
+        nonlocal peak
+        peak = max(peak, registry.get("tracked").limiter.active)
+        await asyncio.sleep(0.02)
+        return {}
+
+    registry.register("tracked", tracked, max_concurrent=2)
+
+    async def run():
+        await asyncio.gather(*(registry.run("tracked", {}) for _ in range(6)))
+        with pytest.raises(ToolTimeoutError):
+            await registry.run("stuck", {"seconds": "0.3"})
+        with pytest.raises(ToolTimeoutError):
+            await registry.run("slow", {"seconds": "1"})
+
+    try:
+        asyncio.run(run())
+    finally:
+        registry.close()
+    assert peak == 2
+    assert registry.stats()["tracked"]["calls"] == 6
+    assert registry.stats()["stuck"]["timeouts"] == 1
+    assert registry.stats()["slow"]["timeouts"] == 1
+
+
+def test_disconnect_cancels_running_tools():
+    registry = ToolRegistry()
+    registry.register("slow", _slow)
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def run():
+        request = Request({"type": "http"}, receive)
+        with pytest.raises(_ClientDisconnected):
+            await _cancel_on_disconnect(request, registry.run("slow", {"seconds": "5"}))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - started < 1
+    assert registry.stats()["slow"]["cancelled"] == 1
+
+
+@pytest.fixture
+def agent_client():
+    settings = Settings(
+        agent_allowed_tools=["ping", "slow", "broken"],
+        agent_tool_timeouts={"slow": 0.3},
+        agent_batch_max_actions=6,
+    )
+    service = AgentService(
+        settings, OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    service.register_tool("slow", _slow)
+    service.register_tool("broken", _broken)
+    app.dependency_overrides[get_agent_service] = lambda: service
+    app.dependency_overrides[get_config] = lambda: settings
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        service.close()
+
+
+def test_batch_runs_actions_concurrently_and_reports_each(agent_client):
+    started = time.perf_counter()
+    response = agent_client.post(
+        "/v1/agent/action/batch",
+        json={
+            "actions": [
+                {"tool": "slow", "input": {"seconds": "0.2"}},
+                {"tool": "slow", "input": {"seconds": "0.2"}},
+                {"tool": "http_get"},
+                {"tool": "ping", "user": "suspended"},
+                {"tool": "slow", "input": {"seconds": "2"}},
+                {"tool": "broken"},
+            ]
+        },
+    )
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["status"] for item in results] == [
+        "success",
+        "success",
+        "denied",
+        "denied",
+        "timeout",
+        "error",
+    ]
+    assert results[0]["output"] == {"slept": "0.2"}
+    assert results[2]["reason"] == "Tool 'http_get' is not allowed"
+    assert results[3]["reason"] == "subject suspended"
+    assert results[5]["reason"] == "Tool failed: RuntimeError"
+    assert elapsed < 0.6
+
+
+def test_batch_size_limit_and_single_execute_timeout(agent_client):
+    too_many = agent_client.post(
+        "/v1/agent/action/batch", json={"actions": [{"tool": "ping"}] * 7}
+    )
+    assert too_many.status_code == 422
+
+    timed_out = agent_client.post(
+        "/v1/agent/action/execute", json={"tool": "slow", "input": {"seconds": "2"}}
+    )
+    assert timed_out.status_code == 504
+    assert "timed out" in timed_out.json()["detail"]["message"]
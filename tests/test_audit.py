@@ -0,0 +1,180 @@
+"""Tests for the background security-event audit pipeline."""
+
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+from app.audit import AuditLog, JSONLFileSink, PostgresCopySink
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+
+DATABASE_URL = os.environ.get("ASB_TEST_DATABASE_URL")
+
+
+class ListSink:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.batches: list = []
+        self.closed = False
+
+    async def write(self, records):
+        await asyncio.sleep(self.delay)
+        self.batches.append([record.as_dict() for record in records])
+
+    async def close(self):
+        self.closed = True
+
+
+def _event(tool: str = "ping", user: str = "alice") -> SecurityEvent:
+    return SecurityEvent(
+        subject=EventSubject(user_id=user),
+        operation=EventOperation(action="execute", component="agent_gateway"),
+        resource=EventResource(type="tool", name=tool),
+        context=EventContext(metadata={}),
+    )
+
+
+def test_policy_decisions_are_recorded_and_flushed_on_close():
+    sink = ListSink()
+    audit = AuditLog(sink, batch_size=2, flush_interval=60)
+    client = OPAClient("http://unused", backend=EmbeddedPolicyBackend(), audit=audit)
+
+    async def run():
+        audit.start()
+        await client.evaluate("agent/allow", _event())
+        await client.evaluate_many(
+            [("agent/allow", _event("http_get")), ("agent/allow", _event())]
+        )
+        await audit.close()
+
+    asyncio.run(run())
+    records = [record for batch in sink.batches for record in batch]
+    assert [r["event"]["resource"]["name"] for r in records] == [
+        "ping",
+        "http_get",
+        "ping",
+    ]
+    assert [r["event"]["decision"]["allow"] for r in records] == [True, False, True]
+    assert records[1]["event"]["decision"]["reason"] == "network access disabled"
+    assert records[0]["policy"] == "agent/allow"
+    assert sink.closed
+    assert audit.stats()["written"] == 3
+    assert audit.stats()["buffered"] == 0
+
+
+@pytest.mark.parametrize(
+    "overflow, kept",
+    [("drop_newest", ["a", "b"]), ("drop_oldest", ["b", "c"])],
+)
+def test_full_buffer_drops_by_policy(overflow, kept):
+    sink = ListSink()
+    audit = AuditLog(sink, capacity=2, overflow=overflow)
+
+    async def run():
+        results = [await audit.record(path, {}, True) for path in "abc"]
+        await audit.close()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [True, True, overflow == "drop_oldest"]
+    assert [record["policy"] for record in sink.batches[0]] == kept
+    assert audit.stats()["dropped"] == 1
+
+
+def test_block_waits_for_the_flusher_instead_of_dropping():
+    sink = ListSink(delay=0.01)
+    audit = AuditLog(
+        sink, capacity=2, batch_size=2, overflow="block", block_timeout=1.0
+    )
+
+    async def run():
+        audit.start()
+        results = [await audit.record(str(i), {}, True) for i in range(6)]
+        await audit.close()
+        return results
+
+    assert asyncio.run(run()) == [True] * 6
+    stats = audit.stats()
+    assert stats["written"] == 6
+    assert stats["dropped"] == 0
+    assert stats["blocked"] >= 1
+
+
+def test_failed_writes_are_counted_not_raised():
+    class BrokenSink(ListSink):
+        async def write(self, records):
+            raise OSError("disk full")
+
+    audit = AuditLog(BrokenSink())
+
+    async def run():
+        await audit.record("agent/allow", {}, True)
+        await audit.close()
+
+    asyncio.run(run())
+    assert audit.stats()["failed"] == 1
+
+
+def test_file_sink_rotates_gzip_jsonl(tmp_path):
+    now = [1_700_000_000.0]
+    sink = JSONLFileSink(str(tmp_path), max_bytes=1, clock=lambda: now[0])
+    audit = AuditLog(sink, clock=lambda: now[0])
+
+    async def run():
+        for index in range(3):
+            await audit.record("agent/allow", {"n": index}, index != 1, "why")
+            await audit.flush()
+            now[0] += 1
+        await audit.close()
+
+    asyncio.run(run())
+    files = sorted(tmp_path.iterdir())
+    assert [path.name for path in files] == [
+        "audit-20231114T221320.jsonl.gz",
+        "audit-20231114T221321.jsonl.gz",
+        "audit-20231114T221322.jsonl.gz",
+    ]
+    lines = []
+    for path in files:
+        with gzip.open(path, "rt") as handle:
+            lines.extend(json.loads(line) for line in handle)
+    assert [line["event"]["n"] for line in lines] == [0, 1, 2]
+    assert lines[1]["event"]["decision"] == {"allow": False, "reason": "why"}
+    assert lines[0]["ts"] == "2023-11-14T22:13:20+00:00"
+
+
+@pytest.mark.skipif(DATABASE_URL is None, reason="ASB_TEST_DATABASE_URL not set")
+def test_postgres_sink_copies_batches():
+    import asyncpg
+
+    table = "asb_audit_events_test"
+    sink = PostgresCopySink(DATABASE_URL, table)
+    audit = AuditLog(sink)
+    client = OPAClient("http://unused", backend=EmbeddedPolicyBackend(), audit=audit)
+
+    async def run():
+        connection = await asyncpg.connect(DATABASE_URL)
+        try:
+            await connection.execute(f"DROP TABLE IF EXISTS {table}")
+            await client.evaluate("agent/allow", _event(user="suspended"))
+            await audit.close()
+            return await connection.fetch(
+                f"SELECT policy, allow, event->'subject'->>'user_id' AS user_id "
+                f"FROM {table}"
+            )
+        finally:
+            await connection.execute(f"DROP TABLE IF EXISTS {table}")
+            await connection.close()
+
+    rows = asyncio.run(run())
+    assert [tuple(row) for row in rows] == [("agent/allow", False, "suspended")]
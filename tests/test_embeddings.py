@@ -0,0 +1,123 @@
+"""Tests for the query embedder: caching, micro-batching and providers."""
+
+import asyncio
+from array import array
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.embeddings import Embedder, LocalEmbeddingProvider, OpenAIEmbeddingProvider
+from app.upstream import UpstreamClientPool
+
+
+class CountingProvider(LocalEmbeddingProvider):
+    def __init__(self) -> None:
+        super().__init__(dimensions=4)
+        self.calls: list = []
+
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        return await super().embed(texts)
+
+
+def test_concurrent_misses_are_batched_and_then_cached():
+    """Concurrent queries share one provider call; repeats are served from cache."""
+    provider = CountingProvider()
+    embedder = Embedder(provider, batch_wait=0.01)
+
+    async def run():
+        first = await asyncio.gather(
+            embedder.embed("alpha"), embedder.embed("beta"), embedder.embed("alpha")
+        )
+        again = await embedder.embed_many(["beta", "alpha"])
+        return first, again
+
+    first, again = asyncio.run(run())
+
+    assert provider.calls == [["alpha", "beta"]]
+    assert isinstance(first[0], array) and first[0].typecode == "f"
+    assert first[0] == first[2] == again[1]
+    assert embedder.stats() == {
+        "entries": 2,
+        "hits": 2,
+        "misses": 3,
+        "hit_rate": 0.4,
+        "batches": 1,
+        "avg_batch_size": 2.0,
+    }
+
+
+def test_full_batch_is_sent_without_waiting_and_lru_is_bounded():
+    provider = CountingProvider()
+    embedder = Embedder(provider, max_entries=2, batch_size=2, batch_wait=60)
+
+    async def run():
+        await asyncio.wait_for(embedder.embed_many(["a", "b", "c", "d"]), timeout=1)
+
+    asyncio.run(run())
+
+    assert provider.calls == [["a", "b"], ["c", "d"]]
+    assert embedder.stats()["entries"] == 2
+
+
+def test_provider_errors_reach_every_waiter():
+    class FailingProvider(LocalEmbeddingProvider):
+        async def embed(self, texts):
+            raise RuntimeError("model offline")
+
+    embedder = Embedder(FailingProvider())
+
+    async def run():
+        return await asyncio.gather(
+            embedder.embed("x"), embedder.embed("y"), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    assert [str(error) for error in errors] == ["model offline"] * 2
+    assert embedder.stats()["entries"] == 0
+
+
+def test_openai_provider_posts_one_request_per_batch():
+    requests: list = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "data": [
+                    {"index": 1, "embedding": [0.0, 1.0]},
+                    {"index": 0, "embedding": [1.0, 0.0]},
+                ]
+            },
+        )
+
+    settings = Settings(
+        openai_api_key="sk-test",
+        openai_base_url="http://upstream",
+        embedding_dimensions=2,
+    )
+    upstream = UpstreamClientPool(settings, transport=httpx.MockTransport(handler))
+    provider = OpenAIEmbeddingProvider(settings, upstream)
+
+    async def run():
+        try:
+            return await provider.embed(["first", "second"])
+        finally:
+            await upstream.close()
+
+    vectors = asyncio.run(run())
+
+    assert vectors == [array("f", [1.0, 0.0]), array("f", [0.0, 1.0])]
+    assert len(requests) == 1
+    assert requests[0].url.path == "/v1/embeddings"
+    assert requests[0].headers["Authorization"] == "Bearer sk-test"
+
+
+@pytest.mark.parametrize("text", ["", "hello world", "x" * 100])
+def test_local_provider_is_deterministic(text):
+    provider = LocalEmbeddingProvider(dimensions=6)
+    assert provider.embed_one(text) == provider.embed_one(text)
+    assert len(provider.embed_one(text)) == 6
@@ -13,3 +13,13 @@ def test_health_endpoint():
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+
+
+def test_stats_endpoint_reports_rag_pool():
+    """Pool metrics are available before the pool has been opened."""
+    response = TestClient(app).get("/stats")
+
+    assert response.status_code == 200
+    pool = response.json()["rag_pool"]
+    assert pool["size"] == pool["in_use"] == pool["acquires"] == 0
+    assert pool["max_size"] == 10
@@ -0,0 +1,185 @@
+"""Tests for agent idempotency keys and cached tool results."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.container import get_agent_service, get_idempotency_store
+from app.idempotency import IdempotencyStore
+from app.main import app
+from app.models.agent import AgentActionRequest, AgentActionResponse
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.response_cache import MemoryResponseStore, SQLiteResponseStore
+from app.services.agent_service import AgentService
+from app.services.exceptions import IdempotencyKeyReusedError, PolicyDeniedError
+from app.tools import ToolRegistry
+
+
+def _service(**overrides):
+    settings = Settings(agent_allowed_tools=["counter", "ping", "whoami"], **overrides)
+    service = AgentService(
+        settings, OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    calls = []
+
+    async def counter(arguments):
+        calls.append(arguments)
+        return {"count": str(len(calls))}
+
+    service.register_tool("counter", counter)
+    return service, calls
+
+
+@pytest.fixture
+def client():
+    service, calls = _service()
+    store = IdempotencyStore(MemoryResponseStore(100, 60.0))
+    app.dependency_overrides[get_agent_service] = lambda: service
+    app.dependency_overrides[get_idempotency_store] = lambda: store
+    try:
+        yield TestClient(app), calls, store
+    finally:
+        app.dependency_overrides.clear()
+        service.close()
+
+
+def test_repeated_key_replays_the_stored_response(client):
+    http, calls, store = client
+    body = {"tool": "counter", "input": {"n": "1"}}
+    headers = {"Idempotency-Key": "abc", "X-ASB-User-Id": "alice"}
+
+    first = http.post("/v1/agent/action/execute", json=body, headers=headers)
+    second = http.post("/v1/agent/action/execute", json=body, headers=headers)
+    other_user = http.post(
+        "/v1/agent/action/execute",
+        json=body,
+        headers={"Idempotency-Key": "abc", "X-ASB-User-Id": "bob"},
+    )
+    no_key = http.post("/v1/agent/action/execute", json=body)
+
+    assert first.json()["output"] == {"count": "1"}
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert other_user.json()["output"] == {"count": "2"}
+    assert no_key.json()["output"] == {"count": "3"}
+    assert len(calls) == 3
+    assert store.stats()["replayed"] == 1
+
+
+def test_key_reused_with_another_body_is_rejected(client):
+    http, calls, _ = client
+    headers = {"Idempotency-Key": "abc"}
+    http.post("/v1/agent/action/execute", json={"tool": "counter"}, headers=headers)
+
+    response = http.post(
+        "/v1/agent/action/execute",
+        json={"tool": "counter", "input": {"n": "2"}},
+        headers=headers,
+    )
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicates_join_and_failures_are_not_stored():
+    store = IdempotencyStore(MemoryResponseStore(100, 60.0))
+    request = AgentActionRequest(tool="slow")
+    runs = []
+
+    async def slow():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return AgentActionResponse(tool="slow", output={"run": str(len(runs))})
+
+    async def denied():
+        raise PolicyDeniedError("no")
+
+    async def run():
+        results = await asyncio.gather(
+            *(store.run("k", None, request, slow) for _ in range(3))
+        )
+        with pytest.raises(IdempotencyKeyReusedError):
+            await store.run("k", None, AgentActionRequest(tool="other"), slow)
+        for _ in range(2):
+            with pytest.raises(PolicyDeniedError):
+                await store.run("d", None, request, denied)
+        return results
+
+    results = asyncio.run(run())
+    assert len(runs) == 1
+    assert [replayed for _, replayed in results] == [False, True, True]
+    assert {response.output["run"] for response, _ in results} == {"1"}
+    stats = store.stats()
+    assert stats["joined"] == 2
+    assert stats["executed"] == 3  # one "k" run plus two "d" attempts
+    assert stats["entries"] == 1
+
+
+def test_sqlite_store_replays_after_restart(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite3")
+    request = AgentActionRequest(tool="ping")
+    response = AgentActionResponse(tool="ping", output={"message": "pong"})
+
+    async def call():
+        return response
+
+    async def fail():
+        raise AssertionError("should have been replayed")
+
+    async def run():
+        first = IdempotencyStore(SQLiteResponseStore(path, 100, 60.0))
+        await first.run("k", "alice", request, call)
+        await first.close()
+        second = IdempotencyStore(SQLiteResponseStore(path, 100, 60.0))
+        try:
+            return await second.run("k", "alice", request, fail)
+        finally:
+            await second.close()
+
+    assert asyncio.run(run()) == (response, True)
+
+
+def test_cacheable_tools_reuse_output_for_identical_input():
+    registry = ToolRegistry()
+    calls = []
+
+    async def pure(arguments):
+        calls.append(arguments)
+        return {"echo": arguments["x"]}
+
+    registry.register("pure", pure, cache_ttl=60.0)
+    registry.register("impure", pure)
+
+    async def run():
+        return [
+            await registry.run("pure", {"x": "1"}),
+            await registry.run("pure", {"x": "1"}),
+            await registry.run("pure", {"x": "2"}),
+            await registry.run("impure", {"x": "1"}),
+            await registry.run("impure", {"x": "1"}),
+        ]
+
+    outputs = asyncio.run(run())
+    assert (
+        outputs == [{"echo": "1"}, {"echo": "1"}, {"echo": "2"}] + [{"echo": "1"}] * 2
+    )
+    assert len(calls) == 4
+    stats = registry.stats()
+    assert stats["pure"]["cache_hits"] == 1
+    assert stats["pure"]["cache_entries"] == 2
+    assert stats["impure"]["cache_entries"] is None
+
+
+def test_settings_override_declared_cache_ttl():
+    service, _ = _service(agent_tool_cache_ttls={"whoami": 0, "ping": 5})
+    try:
+        stats = service.tools.stats()
+        assert stats["whoami"]["cache_entries"] is None
+        assert stats["ping"]["cache_entries"] == 0
+        assert stats["counter"]["cache_entries"] is None
+    finally:
+        service.close()
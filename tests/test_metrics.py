@@ -0,0 +1,125 @@
+"""Tests for the Prometheus registry and the /metrics endpoint."""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.config import Settings
+from app.container import get_agent_service, get_rate_limiter
+from app.main import app
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.services.agent_service import AgentService
+
+
+def test_histogram_and_counter_exposition():
+    histogram = metrics.Histogram("t_seconds", "Test.", ["stage"], buckets=(0.1, 1))
+    series = histogram.labels('a"b')
+    for value in (0.05, 0.1, 0.5, 3):
+        series.observe(value)
+    counter = metrics.Counter("t_total", "Test.", ["kind"])
+    counter.inc("x")
+    counter.inc("x", amount=2)
+
+    assert list(histogram.render()) == [
+        "# HELP t_seconds Test.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="a\\"b",le="0.1"} 2',
+        't_seconds_bucket{stage="a\\"b",le="1"} 3',
+        't_seconds_bucket{stage="a\\"b",le="+Inf"} 4',
+        't_seconds_sum{stage="a\\"b"} 3.65',
+        't_seconds_count{stage="a\\"b"} 4',
+    ]
+    assert list(counter.render())[-1] == 't_total{kind="x"} 3'
+
+    metrics.set_enabled(False)
+    try:
+        series.observe(1)
+        counter.inc("x")
+    finally:
+        metrics.set_enabled(True)
+    assert series.count == 4
+    assert counter.value("x") == 3
+
+
+def test_stats_report_becomes_gauges():
+    text = metrics.render_gauges(
+        {
+            "rag_pool": {"in_use": 2, "acquire_wait_seconds_max": 0.25},
+            "admission": {"opa": {"active": 1}, "chat": {"active": 0}},
+            "policy_backend": {"state": "open", "latency_p99_seconds": None},
+        }
+    )
+    assert text.splitlines() == [
+        "# TYPE asb_rag_pool_in_use gauge",
+        "asb_rag_pool_in_use 2",
+        "# TYPE asb_rag_pool_acquire_wait_seconds_max gauge",
+        "asb_rag_pool_acquire_wait_seconds_max 0.25",
+        "# TYPE asb_admission_active gauge",
+        'asb_admission_active{name="opa"} 1',
+        'asb_admission_active{name="chat"} 0',
+        "# TYPE asb_policy_backend_state_info gauge",
+        'asb_policy_backend_state_info{value="open"} 1',
+    ]
+
+
+def test_metrics_endpoint_reports_stages_decisions_and_responses():
+    stage = metrics.STAGE_SECONDS
+    before = {
+        name: stage.labels(name).count
+        for name in ("parse", "event_build", "policy", "serialize")
+    }
+    denied = metrics.POLICY_DECISIONS.value("agent/allow", "deny")
+    route = "/v1/agent/action/execute"
+    forbidden = metrics.REQUESTS.value(route, "POST", "403")
+
+    app.dependency_overrides[get_agent_service] = lambda: AgentService(
+        Settings(), OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    try:
+        client = TestClient(app)
+        assert client.post(route, json={"tool": "ping"}).status_code == 200
+        response = client.post(route, json={"tool": "ping", "user": "suspended"})
+        assert response.status_code == 403
+        exposition = client.get("/metrics")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert exposition.status_code == 200
+    assert exposition.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for name, count in before.items():
+        assert stage.labels(name).count >= count + 2, name
+    assert metrics.POLICY_DECISIONS.value("agent/allow", "deny") == denied + 1
+    assert metrics.REQUESTS.value(route, "POST", "403") == forbidden + 1
+    assert 'asb_policy_decisions_total{policy="agent/allow",decision="allow"}' in (
+        exposition.text
+    )
+    assert "asb_rag_pool_max_size 10" in exposition.text
+
+
+class SlowRateLimiter:
+    async def admit(self, tenant_id, *, llm=False):
+        await asyncio.sleep(0.2)
+        return None
+
+
+def test_dependency_wait_is_reported_apart_from_parse():
+    stage = metrics.STAGE_SECONDS
+    parse, rate_limit = stage.labels("parse"), stage.labels("rate_limit")
+    parse_before, rate_limit_before = parse.sum, rate_limit.sum
+
+    app.dependency_overrides[get_rate_limiter] = lambda: SlowRateLimiter()
+    app.dependency_overrides[get_agent_service] = lambda: AgentService(
+        Settings(), OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    try:
+        response = TestClient(app).post(
+            "/v1/agent/action/execute", json={"tool": "ping"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert rate_limit.sum - rate_limit_before >= 0.2
+    assert parse.sum - parse_before < 0.1
@@ -0,0 +1,155 @@
+"""Tests for OPA decision parsing and the pooled OPA client."""
+
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.container import get_opa_client, get_rate_limiter, get_upstream_pool
+from app.main import app
+from app.models.events import (
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import OPAClient, OPADecision
+from app.policy_engine import EmbeddedPolicyBackend
+from app.rate_limit import MemoryBucketBackend, RateLimiter
+from app.upstream import UpstreamClientPool
+
+
+def _event() -> SecurityEvent:
+    return SecurityEvent(
+        subject=EventSubject(user_id="alice"),
+        operation=EventOperation(action="execute", component="agent_gateway"),
+        resource=EventResource(type="tool", name="ping"),
+    )
+
+
+def test_decision_from_result_variants():
+    """Boolean, object and missing results should all map to a decision."""
+    assert OPADecision.from_result(True).allow is True
+    denied = OPADecision.from_result({"allow": False, "reason": "nope"})
+    assert (denied.allow, denied.reason) == (False, "nope")
+    missing = OPADecision.from_result(None)
+    assert missing.allow is False
+    assert missing.reason == "Policy returned no decision"
+
+
+def test_evaluate_posts_event_as_input():
+    """The client should post the serialized event and parse the result."""
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["path"] = request.url.path
+        seen["input"] = json.loads(request.content)["input"]
+        return httpx.Response(200, json={"result": {"allow": True}})
+
+    client = OPAClient("http://opa", transport=httpx.MockTransport(handler))
+
+    async def run() -> OPADecision:
+        try:
+            return await client.evaluate("agent/allow", _event())
+        finally:
+            await client.close()
+
+    decision = asyncio.run(run())
+
+    assert decision.allow is True
+    assert seen["path"] == "/v1/data/agent/allow"
+    assert seen["input"]["subject"]["user_id"] == "alice"
+
+
+def test_evaluate_many_uses_one_round_trip():
+    """Batched checks should be sent as a single query and mapped back in order."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append((request.url.path, body))
+        return httpx.Response(
+            200,
+            json={
+                "result": [
+                    {"r0": [{"allow": True}], "r1": [], "r2": [{"allow": False}]}
+                ]
+            },
+        )
+
+    client = OPAClient("http://opa", transport=httpx.MockTransport(handler))
+
+    async def run():
+        try:
+            return await client.evaluate_many(
+                [
+                    ("agent/allow", _event()),
+                    ("missing/allow", _event()),
+                    ("rag/allow", _event()),
+                ]
+            )
+        finally:
+            await client.close()
+
+    decisions = asyncio.run(run())
+
+    assert [decision.allow for decision in decisions] == [True, False, False]
+    assert decisions[1].reason == "Policy returned no decision"
+    assert len(requests) == 1
+    path, body = requests[0]
+    assert path == "/v1/query"
+    assert 'r0 := [x | x := data["agent"]["allow"] with input as input.q0]' in (
+        body["query"]
+    )
+    assert body["input"]["q2"]["subject"]["user_id"] == "alice"
+
+
+def test_chat_route_applies_the_prompt_policy():
+    """Chat events carry what ``prompt.rego`` reads, so its deny rules fire."""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request)
+        return httpx.Response(
+            200, json={"choices": [{"index": 0, "message": {"content": "pong"}}]}
+        )
+
+    settings = Settings(
+        openai_api_key="test", openai_base_url="http://upstream", llm_token_budget=100
+    )
+    pool = UpstreamClientPool(settings, transport=httpx.MockTransport(handler))
+    limiter = RateLimiter(settings, MemoryBucketBackend())
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[get_upstream_pool] = lambda: pool
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    app.dependency_overrides[get_opa_client] = lambda: OPAClient(
+        "http://opa", backend=EmbeddedPolicyBackend()
+    )
+    client = TestClient(app)
+
+    def chat(user: str, **options) -> httpx.Response:
+        payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+        return client.post(
+            "/v1/chat/completions",
+            json={**payload, **options},
+            headers={"X-ASB-User-Id": user},
+        )
+
+    try:
+        blocked = chat("blocked")
+        hot = chat("alice", temperature=1.9)
+        greedy = chat("alice", max_tokens=500)
+        allowed = chat("alice", temperature=0.7, max_tokens=50)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert blocked.status_code == 403
+    assert blocked.json()["detail"]["message"] == "blocked user"
+    assert hot.status_code == 403
+    assert hot.json()["detail"]["message"] == "temperature too high"
+    assert greedy.status_code == 403
+    assert greedy.json()["detail"]["message"] == "max_tokens exceeds token budget"
+    assert allowed.status_code == 200
+    assert len(upstream_calls) == 1
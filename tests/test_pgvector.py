@@ -0,0 +1,20 @@
+"""Tests for the pgvector binary codec."""
+
+import struct
+from array import array
+
+from app.pgvector import Vector, decode_vector, encode_vector
+
+
+def test_encode_matches_pgvector_binary_format():
+    """int16 dims, int16 unused, then big-endian float32 values."""
+    data = encode_vector([1.0, -2.5, 0.25])
+    assert data == struct.pack(">HH3f", 3, 0, 1.0, -2.5, 0.25)
+    assert encode_vector(Vector([1.0, -2.5, 0.25])) == data
+
+
+def test_round_trip_keeps_float32_precision():
+    values = [index / 1536 for index in range(1536)]
+    decoded = decode_vector(encode_vector(values))
+    assert decoded == array("f", values)
+    assert len(decoded) == 1536
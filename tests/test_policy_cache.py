@@ -0,0 +1,145 @@
+"""Tests for the OPA decision cache."""
+
+import asyncio
+
+import httpx
+
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import OPAClient, OPADecision
+from app.policy_cache import PolicyDecisionCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _event(tool: str = "ping") -> SecurityEvent:
+    return SecurityEvent(
+        subject=EventSubject(user_id="alice"),
+        operation=EventOperation(action="execute", component="agent_gateway"),
+        resource=EventResource(type="tool", name=tool),
+        context=EventContext(metadata={"q": "1"}),
+    )
+
+
+def test_key_ignores_volatile_fields():
+    """Event ids and timestamps should not split cache entries."""
+    first = {"event_id": "a", "timestamp": "t1", "subject": {"id": "u"}}
+    second = {"event_id": "b", "timestamp": "t2", "subject": {"id": "u"}}
+    other = {"event_id": "a", "timestamp": "t1", "subject": {"id": "v"}}
+
+    key = PolicyDecisionCache.key("agent/allow", first)
+    assert key == PolicyDecisionCache.key("/agent/allow", second)
+    assert key != PolicyDecisionCache.key("agent/allow", other)
+    assert key != PolicyDecisionCache.key("rag/allow", first)
+
+
+def test_ttl_and_lru_eviction():
+    """Entries expire after the TTL and the oldest entry is evicted first."""
+    clock = FakeClock()
+    cache = PolicyDecisionCache(
+        ["agent/allow"], max_entries=2, ttl_seconds=10, clock=clock
+    )
+    cache.put("a", OPADecision(allow=True))
+    cache.put("b", OPADecision(allow=True))
+    assert cache.get("a") is not None
+    cache.put("c", OPADecision(allow=False))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 2
+
+
+def test_revision_change_clears_cache():
+    """A new bundle revision should invalidate every cached decision."""
+    cache = PolicyDecisionCache(["agent/allow"])
+    cache.observe_revision({"bundles": {"main": {"revision": "r1"}}})
+    cache.put("a", OPADecision(allow=True))
+    cache.observe_revision({"bundles": {"main": {"revision": "r1"}}})
+    assert cache.get("a") is not None
+
+    cache.observe_revision({"bundles": {"main": {"revision": "r2"}}})
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_client_serves_opted_in_paths_from_cache():
+    """Only opted-in policy paths should skip the OPA round-trip."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        body = {"result": {"allow": True}}
+        if request.url.params.get("provenance") == "true":
+            body["provenance"] = {"revision": "r1"}
+        return httpx.Response(200, json=body)
+
+    client = OPAClient(
+        "http://opa",
+        transport=httpx.MockTransport(handler),
+        cache=PolicyDecisionCache(["agent/allow"]),
+    )
+
+    async def run() -> None:
+        for _ in range(3):
+            await client.evaluate("agent/allow", _event())
+            await client.evaluate("rag/allow", _event())
+        await client.evaluate("agent/allow", _event("whoami"))
+        await client.close()
+
+    asyncio.run(run())
+
+    assert calls.count("/v1/data/agent/allow") == 2
+    assert calls.count("/v1/data/rag/allow") == 3
+    assert client.cache is not None
+    assert client.cache.stats()["hits"] == 2
+
+
+def test_batch_decisions_follow_the_policy_revision():
+    """Batched misses are cached only with a revision, and a new one clears them."""
+    state = {"revision": "r1", "allow": True, "provenance": True}
+    queries = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        queries.append(request.url.params.get("provenance"))
+        body = {"result": [{"r0": [{"allow": state["allow"]}]}]}
+        if state["provenance"]:
+            body["provenance"] = {"bundles": {"main": {"revision": state["revision"]}}}
+        return httpx.Response(200, json=body)
+
+    client = OPAClient(
+        "http://opa",
+        transport=httpx.MockTransport(handler),
+        cache=PolicyDecisionCache(["agent/allow"]),
+    )
+
+    async def allowed(tool: str = "ping") -> bool:
+        [decision] = await client.evaluate_many([("agent/allow", _event(tool))])
+        return decision.allow
+
+    async def run() -> list:
+        outcomes = [await allowed(), await allowed()]  # miss, then hit
+        state.update(revision="r2", allow=False)
+        outcomes.append(await allowed("whoami"))  # miss reporting r2
+        outcomes.append(await allowed())  # r1 decision was cleared
+        state["provenance"] = False
+        outcomes += [await allowed("shell"), await allowed("shell")]
+        await client.close()
+        return outcomes
+
+    assert asyncio.run(run()) == [True, True, False, False, False, False]
+    assert queries == ["true"] * 5
+    assert client.cache is not None
+    assert client.cache.stats()["invalidations"] == 1
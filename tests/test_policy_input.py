@@ -0,0 +1,95 @@
+"""Parity of the fast policy input builders with the ASB event models."""
+
+import json
+
+import pytest
+
+from app import policy_input
+from app.config import Settings
+from app.models.asb_events import SecurityEventLlmInput
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.models.llm import ChatCompletionRequest, ChatMessage
+from app.models.rag import RAGSearchRequest, RAGSearchResult
+from app.services.llm_proxy import _build_output_event, _build_security_event
+from app.services.rag_service import RAGService
+
+
+def test_security_event_matches_model_dump():
+    document = policy_input.security_event(
+        "alice",
+        {"action": "execute", "component": "agent_gateway"},
+        {"type": "tool", "name": "ping"},
+        {"q": "1"},
+        tenant_id="acme",
+    )
+    model = SecurityEvent(
+        subject=EventSubject(user_id="alice", tenant_id="acme"),
+        operation=EventOperation(action="execute", component="agent_gateway"),
+        resource=EventResource(type="tool", name="ping"),
+        context=EventContext(metadata={"q": "1"}),
+    )
+    assert document == model.model_dump(mode="json")
+    assert list(document) == list(model.model_dump(mode="json"))
+
+
+def test_rag_events_round_trip_through_the_model():
+    service = RAGService(Settings(), opa_client=None)
+    request = RAGSearchRequest(query="hello")
+    results = [RAGSearchResult(id="1", content="c", score=1.0, metadata={"a": "b"})]
+    for document in (
+        service._event(request, 3, "acme"),
+        service._results_event(request, results, "acme"),
+    ):
+        model = SecurityEvent.model_validate(document)
+        assert model.model_dump(mode="json") == document
+
+
+def test_llm_events_round_trip_through_the_model():
+    request = ChatCompletionRequest(
+        model="gpt",
+        messages=[ChatMessage(role="user", content="héllo")],
+        temperature=0.2,
+    )
+    for document in (
+        _build_security_event(request, Settings(), "alice"),
+        _build_output_event(request, Settings(), None, "partial"),
+    ):
+        model = SecurityEventLlmInput.model_validate(document)
+        assert model.model_dump(mode="json") == document
+    assert (
+        "max_tokens"
+        not in _build_security_event(request, Settings(), None)["context"]["metadata"]
+    )
+
+
+def test_encoding_is_cached_and_valid_json():
+    document = policy_input.security_event(
+        "alice", {"action": "x", "component": "y"}, {"type": "t", "name": "ü"}
+    )
+    encoded = document.encoded()
+    assert document.encoded() is encoded
+    assert json.loads(encoded) == document
+    assert policy_input.encode_input({"a": 1}) == b'{"a":1}'
+    body = policy_input.batch_body("q", [document, {"b": None}])
+    assert json.loads(body) == {
+        "query": "q",
+        "input": {"q0": document, "q1": {"b": None}},
+    }
+
+
+@pytest.mark.skipif(policy_input.orjson is None, reason="orjson not installed")
+def test_orjson_and_stdlib_encoders_agree():
+    value = {"b": [1, 2.5, None, True], "a": {"ü": "x"}, "c": object}
+    for sort_keys in (False, True):
+        fast = policy_input._orjson_dumps(value, sort_keys=sort_keys)
+        slow = policy_input._stdlib_dumps(value, sort_keys=sort_keys)
+        assert json.loads(fast) == json.loads(slow)
+    assert policy_input._orjson_dumps(value, sort_keys=True) == (
+        policy_input._stdlib_dumps(value, sort_keys=True)
+    )
@@ -0,0 +1,267 @@
+"""Tests for the circuit breaker, retries, hedging and fail modes of policy calls."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.container import get_agent_service
+from app.main import app
+from app.models.events import (
+    EventContext,
+    EventOperation,
+    EventResource,
+    EventSubject,
+    SecurityEvent,
+)
+from app.opa_client import HTTPPolicyBackend, OPAClient
+from app.policy_cache import PolicyDecisionCache
+from app.policy_engine import EmbeddedPolicyEngine
+from app.policy_resilience import CircuitBreaker, ResilientPolicyBackend
+from app.services.agent_service import AgentService
+from app.services.exceptions import PolicyUnavailableError
+
+
+class FakeOPA:
+    """
+    OPA Data API stand-in that injects faults.
+
+    Each request takes the next ``(delay, outcome)`` from ``faults`` (then
+    answers promptly): outcome is an HTTP status or ``"drop"`` for a refused
+    connection. Successful answers come from the embedded policy engine.
+    """
+
+    def __init__(self, *faults) -> None:
+        self.faults = list(faults)
+        self.requests = 0
+        self._engine = EmbeddedPolicyEngine()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        delay, outcome = self.faults.pop(0) if self.faults else (0.0, 200)
+        if delay:
+            await asyncio.sleep(delay)
+        if outcome == "drop":
+            raise httpx.ConnectError("connection refused", request=request)
+        if outcome != 200:
+            return httpx.Response(outcome)
+        policy_path = request.url.path.removeprefix("/v1/data/")
+        input_doc = json.loads(request.content)["input"]
+        result = self._engine.evaluate(policy_path, input_doc)
+        body = {} if result is None else {"result": result}
+        if request.url.params.get("provenance") == "true":
+            body["provenance"] = {"revision": "fake"}
+        return httpx.Response(200, json=body)
+
+    def client(self, **options) -> OPAClient:
+        http = HTTPPolicyBackend(
+            "http://opa", transport=httpx.MockTransport(self.handler)
+        )
+        options.setdefault("rng", lambda: 0.0)
+        cache = options.pop("cache", None)
+        return OPAClient(
+            "http://opa", backend=ResilientPolicyBackend(http, **options), cache=cache
+        )
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _event(user="alice", **metadata) -> SecurityEvent:
+    return SecurityEvent(
+        subject=EventSubject(user_id=user),
+        operation=EventOperation(action="execute", component="test"),
+        resource=EventResource(type="tool", name="ping"),
+        context=EventContext(metadata=metadata),
+    )
+
+
+def test_breaker_opens_then_probes_once_after_reset():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 5
+
+    clock.now = 5
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # everyone else while it is in flight
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats() == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "opened": 2,
+        "rejected": 2,
+    }
+
+
+def test_errors_are_retried_then_fail_closed_and_short_circuit():
+    opa = FakeOPA((0, 500), (0, "drop"), (0, 503), (0, 502))
+    client = opa.client(
+        retries=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    )
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(PolicyUnavailableError) as raised:
+                await client.evaluate("agent/allow", _event())
+        assert raised.value.policy_path == "agent/allow"
+        # The circuit is open now: no request reaches OPA.
+        with pytest.raises(PolicyUnavailableError) as raised:
+            await client.evaluate("agent/allow", _event())
+        assert raised.value.retry_after == 60
+
+    asyncio.run(run())
+    assert opa.requests == 4
+    stats = client.backend.stats()
+    assert (stats["state"], stats["retries"], stats["failed_closed"]) == (
+        "open",
+        2,
+        3,
+    )
+
+
+def test_cancelled_probe_frees_the_half_open_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    opa = FakeOPA((0, "drop"), (1.0, 200))
+    client = opa.client(retries=0, breaker=breaker)
+
+    async def run():
+        with pytest.raises(PolicyUnavailableError):
+            await client.evaluate("agent/allow", _event())
+        assert breaker.state == "open"
+        clock.now = 5
+        probe = asyncio.ensure_future(client.evaluate("agent/allow", _event()))
+        await asyncio.sleep(0.05)
+        probe.cancel()  # e.g. the client disconnected
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        clock.now = 105
+        return await client.evaluate("agent/allow", _event())
+
+    decision = asyncio.run(run())
+    assert decision.allow
+    assert breaker.state == "closed"
+
+
+def test_fail_modes_serve_last_known_decision_or_allow():
+    opa = FakeOPA((0, 200), (0, 200), *[(0, 500)] * 6)
+    client = opa.client(
+        retries=0,
+        fail_modes={"rag/allow": "cached", "prompt/allow": "open"},
+    )
+
+    async def run():
+        allowed = await client.evaluate("rag/allow", _event(top_k=3))
+        denied = await client.evaluate("rag/allow", _event(top_k=50))
+        # OPA is down from here on.
+        assert (await client.evaluate("rag/allow", _event(top_k=3))).allow
+        stale = await client.evaluate("rag/allow", _event(top_k=50))
+        assert (stale.allow, stale.reason) == (False, denied.reason)
+        with pytest.raises(PolicyUnavailableError):
+            await client.evaluate("rag/allow", _event(top_k=4))
+        assert (await client.evaluate("prompt/allow", _event(user="blocked"))).allow
+        with pytest.raises(PolicyUnavailableError):
+            await client.evaluate("agent/allow", _event())
+        return allowed
+
+    assert asyncio.run(run()).allow
+    stats = client.backend.stats()
+    assert (stats["served_cached"], stats["failed_open"], stats["failed_closed"]) == (
+        2,
+        1,
+        2,
+    )
+
+
+def test_fail_open_decision_is_not_cached_past_the_outage():
+    opa = FakeOPA((0, 500))
+    client = opa.client(
+        retries=0,
+        fail_modes={"rag/allow": "open"},
+        cache=PolicyDecisionCache(["rag/allow"], ttl_seconds=300),
+    )
+
+    async def run():
+        assert (await client.evaluate("rag/allow", _event(top_k=50))).allow
+        # OPA is back: the real deny is served, not the fail-open allow.
+        return await client.evaluate("rag/allow", _event(top_k=50))
+
+    decision = asyncio.run(run())
+    assert not decision.allow
+    assert opa.requests == 2
+    assert client.backend.stats()["failed_open"] == 1
+
+
+def test_timeout_adapts_to_observed_latency():
+    opa = FakeOPA(*[(0, 200)] * 20, (2.0, 200), (2.0, 200))
+    client = opa.client(retries=1, min_timeout=0.05, max_timeout=5.0)
+
+    async def run():
+        assert client.backend.timeout() == 5.0
+        for _ in range(20):
+            await client.evaluate("agent/allow", _event())
+        assert client.backend.timeout() == 0.05
+        started = time.perf_counter()
+        with pytest.raises(PolicyUnavailableError):
+            await client.evaluate("agent/allow", _event())
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.5
+    assert client.backend.stats()["timeouts"] == 2
+
+
+def test_hedged_request_answers_when_the_first_is_slow():
+    opa = FakeOPA(*[(0, 200)] * 20, (1.0, 200), (0, 200))
+    client = opa.client(hedge=True, retries=0, min_timeout=2.0)
+
+    async def run():
+        for _ in range(20):
+            await client.evaluate("agent/allow", _event())
+        started = time.perf_counter()
+        decision = await client.evaluate("agent/allow", _event())
+        return decision, time.perf_counter() - started
+
+    decision, elapsed = asyncio.run(run())
+    assert decision.allow
+    assert elapsed < 0.5
+    assert client.backend.stats()["hedges"] == 1
+    assert opa.requests == 22
+
+
+def test_unavailable_policy_returns_503_with_retry_after():
+    opa = FakeOPA(*[(0, "drop")] * 2)
+    client = opa.client(
+        retries=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    )
+    app.dependency_overrides[get_agent_service] = lambda: AgentService(
+        Settings(), client
+    )
+    try:
+        response = TestClient(app).post(
+            "/v1/agent/action/execute", json={"tool": "ping", "input": {}}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
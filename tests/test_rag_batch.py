@@ -0,0 +1,156 @@
+"""Tests for the batched RAG search endpoint."""
+
+import asyncio
+import os
+
+import asyncpg
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.container import get_config, get_rag_service
+from app.main import app
+from app.opa_client import OPAClient
+from app.models.rag import RAGSearchRequest
+from app.services.rag_service import RAGService
+
+DATABASE_URL = os.environ.get("ASB_TEST_DATABASE_URL")
+
+
+class RecordingRAGService(RAGService):
+    """Answers from canned rows and records each database round-trip."""
+
+    def __init__(self, settings: Settings, opa: OPAClient) -> None:
+        super().__init__(settings, opa)
+        self.batches: list = []
+
+    async def _fetch_pgvector_many(self, requests, embeddings, top_ks):
+        self.batches.append(list(top_ks))
+        return [
+            {
+                "query_index": position,
+                "id": f"{position}-{rank}",
+                "content": f"{embedding[0]:g}",
+                "metadata": {"source": "test"},
+                "score": 1.0 - rank / 10,
+            }
+            for position, (embedding, top_k) in enumerate(zip(embeddings, top_ks), 1)
+            for rank in range(top_k)
+        ]
+
+
+def _opa_client(paths: list) -> OPAClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        return httpx.Response(
+            200,
+            json={
+                "result": [
+                    {
+                        "r0": [{"allow": True}],
+                        "r1": [{"allow": False, "reason": "top_k too large"}],
+                        "r2": [{"allow": True}],
+                    }
+                ]
+            },
+        )
+
+    return OPAClient("http://opa", transport=httpx.MockTransport(handler))
+
+
+def test_search_batch_uses_one_policy_and_one_db_round_trip():
+    """Denied queries are reported in place; the rest share one SQL call."""
+    opa_paths: list = []
+    service = RecordingRAGService(Settings(), _opa_client(opa_paths))
+    app.dependency_overrides[get_rag_service] = lambda: service
+    try:
+        response = TestClient(app).post(
+            "/v1/rag/search_batch",
+            json={
+                "queries": [
+                    {"query": "first", "top_k": 2},
+                    {"query": "second", "top_k": 50},
+                    {"query": "third", "top_k": 1, "embedding": [0.5] * 6},
+                ]
+            },
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    items = response.json()["results"]
+    assert opa_paths == ["/v1/query"]
+    assert service.batches == [[2, 1]]
+    assert [item["allow"] for item in items] == [True, False, True]
+    assert items[1] == {
+        "allow": False,
+        "reason": "top_k too large",
+        "results": [],
+        "filtered": 0,
+    }
+    assert [r["id"] for r in items[0]["results"]] == ["1-0", "1-1"]
+    assert [r["content"] for r in items[2]["results"]] == ["0.5"]
+    # Only the allowed query without an embedding went to the embedder.
+    assert service.embedder.stats()["misses"] == 1
+
+
+def test_search_batch_rejects_oversized_batches():
+    app.dependency_overrides[get_config] = lambda: Settings(rag_batch_max_queries=2)
+    try:
+        response = TestClient(app).post(
+            "/v1/rag/search_batch",
+            json={"queries": [{"query": str(index)} for index in range(3)]},
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 422
+
+
+@pytest.mark.skipif(DATABASE_URL is None, reason="ASB_TEST_DATABASE_URL not set")
+def test_batch_and_single_search_return_the_same_rows():
+    """Rows with NULL metadata match unfiltered queries on both paths."""
+    table = "asb_test_batch_parity"
+    settings = Settings(database_url=DATABASE_URL, rag_table=table)
+    service = RAGService(settings, opa_client=None)
+    requests = [
+        RAGSearchRequest(query="a", top_k=3),
+        RAGSearchRequest(query="b", top_k=3, filters={"tenant_id": "acme"}),
+    ]
+    embedding = [1.0, 0.0, 0.0]
+
+    async def run():
+        connection = await asyncpg.connect(DATABASE_URL)
+        try:
+            await connection.execute(f"DROP TABLE IF EXISTS {table}")
+            await connection.execute(
+                f"CREATE TABLE {table} (id TEXT PRIMARY KEY, content TEXT, "
+                "metadata JSONB, embedding vector(3))"
+            )
+            await connection.execute(
+                f"INSERT INTO {table} VALUES "
+                "('1', 'one', NULL, '[1,0,0]'), "
+                """('2', 'two', '{"tenant_id": "acme"}', '[0.9,0.1,0]'), """
+                """('3', 'three', '{"tenant_id": "other"}', '[0,1,0]')"""
+            )
+            single = [
+                await service._fetch_pgvector(request, embedding, 3)
+                for request in requests
+            ]
+            batch = await service._fetch_pgvector_many(
+                requests, [embedding] * 2, [3, 3]
+            )
+        finally:
+            await connection.execute(f"DROP TABLE IF EXISTS {table}")
+            await connection.close()
+            await service.close()
+        return single, batch
+
+    single, batch = asyncio.run(run())
+    assert [row["id"] for row in single[0]] == ["1", "2", "3"]
+    assert [row["id"] for row in single[1]] == ["2"]
+    for position, rows in enumerate(single, 1):
+        assert [row["id"] for row in batch if row["query_index"] == position] == [
+            row["id"] for row in rows
+        ]
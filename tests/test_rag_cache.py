@@ -0,0 +1,142 @@
+"""Tests for the RAG result cache and its write-aware invalidation."""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.models.rag import RAGSearchRequest, RAGSearchResult
+from app.opa_client import OPAClient
+from app.rag_cache import NotifyInvalidator, RAGResultCache
+from app.services.exceptions import PolicyDeniedError
+from app.services.rag_service import RAGService
+
+DATABASE_URL = os.environ.get("ASB_TEST_DATABASE_URL")
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _result(doc_id: str) -> RAGSearchResult:
+    return RAGSearchResult(id=doc_id, content=doc_id, score=1.0)
+
+
+def test_entries_expire_and_stale_generations_are_not_stored():
+    clock = FakeClock()
+    cache = RAGResultCache(max_entries=2, ttl_seconds=10, clock=clock)
+    key = cache.key("documents", [0.1, 0.2], 3)
+    assert key != cache.key("documents", [0.1, 0.2], 4)
+    assert key != cache.key("documents", [0.1, 0.2], 3, {"source": "docs"})
+
+    cache.put(key, [_result("1")], cache.generation)
+    assert [r.id for r in cache.get(key)] == ["1"]
+    clock.now = 10
+    assert cache.get(key) is None
+
+    # A search that began before a write must not repopulate the cache.
+    generation = cache.generation
+    cache.invalidate()
+    cache.put(key, [_result("stale")], generation)
+    assert cache.get(key) is None
+    assert cache.stats() == {
+        "entries": 0,
+        "hits": 1,
+        "misses": 2,
+        "invalidations": 1,
+    }
+
+
+class CountingRAGService(RAGService):
+    def __init__(self, settings: Settings, opa: OPAClient, cache) -> None:
+        super().__init__(settings, opa, result_cache=cache)
+        self.queries = 0
+
+    async def _fetch_pgvector(self, request, embedding, top_k):
+        self.queries += 1
+        return [
+            {"id": 1, "content": "doc", "metadata": {}, "score": 0.9},
+        ]
+
+
+def _opa_client(decisions: list) -> OPAClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"result": decisions.pop(0)})
+
+    return OPAClient("http://opa", transport=httpx.MockTransport(handler))
+
+
+def test_policy_is_checked_before_every_cached_result():
+    """A cached search is still refused once policy starts denying it."""
+    decisions = [{"allow": True}, {"allow": True}, {"allow": False, "reason": "no"}]
+    cache = RAGResultCache()
+    service = CountingRAGService(
+        Settings(rag_cache_notify_channel=""), _opa_client(decisions), cache
+    )
+    request = RAGSearchRequest(query="faq", top_k=1)
+
+    async def run():
+        first = await service.search(request)
+        second = await service.search(request)
+        with pytest.raises(PolicyDeniedError):
+            await service.search(request)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert service.queries == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_is_bypassed_until_invalidation_is_listening():
+    cache = RAGResultCache()
+    service = CountingRAGService(
+        Settings(), _opa_client([{"allow": True}, {"allow": True}]), cache
+    )
+    request = RAGSearchRequest(query="faq", top_k=1)
+
+    async def run():
+        await service.search(request)
+        await service.search(request)
+
+    asyncio.run(run())
+    assert service.queries == 2
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.skipif(DATABASE_URL is None, reason="ASB_TEST_DATABASE_URL not set")
+def test_notify_from_documents_trigger_clears_the_cache():
+    """Needs a database initialised with docker/init (including the trigger)."""
+    import asyncpg
+
+    cache = RAGResultCache()
+    invalidator = NotifyInvalidator(DATABASE_URL, "asb_documents_changed", cache)
+
+    async def run():
+        await invalidator.start()
+        assert invalidator.listening
+        key = cache.key("documents", [0.0], 1)
+        cache.put(key, [_result("1")], cache.generation)
+        connection = await asyncpg.connect(DATABASE_URL)
+        try:
+            await connection.execute(
+                "UPDATE documents SET content = content WHERE id = 1"
+            )
+            for _ in range(50):
+                if cache.get(key) is None:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await connection.close()
+            await invalidator.close()
+        return key
+
+    key = asyncio.run(run())
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] >= 2
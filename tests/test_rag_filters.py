@@ -0,0 +1,79 @@
+"""Tests for metadata filters and per-request ANN tuning in RAG search."""
+
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings
+from app.models.rag import RAGSearchRequest
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.rag_indexes import ensure_indexes, index_statements
+from app.services.rag_service import RAGService
+
+
+class RecordingRAGService(RAGService):
+    def __init__(self, settings: Settings) -> None:
+        super().__init__(
+            settings, OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+        )
+        self.calls: list = []
+
+    async def _fetch(self, sql, args, tuning):
+        self.calls.append((sql, args, tuning))
+        return []
+
+
+def test_filters_use_jsonb_containment_and_tuning_only_when_non_default():
+    service = RecordingRAGService(Settings(rag_hnsw_ef_search=40))
+    requests = [
+        RAGSearchRequest(query="a", embedding=[0.1], top_k=2),
+        RAGSearchRequest(
+            query="b",
+            embedding=[0.2],
+            top_k=3,
+            filters={"source": "docs"},
+            ef_search=100,
+        ),
+        RAGSearchRequest(query="c", embedding=[0.3], ef_search=40, probes=8),
+    ]
+
+    async def run():
+        for request in requests:
+            await service.search(request)
+        await service.search_many(requests)
+
+    asyncio.run(run())
+
+    (plain, _, plain_tuning), (filtered, args, tuning), (_, _, default_ef), batch = (
+        service.calls
+    )
+    assert "@>" not in plain and plain_tuning == {}
+    assert "metadata @> $3::jsonb" in filtered
+    assert args[2] == {"source": "docs"}
+    assert tuning == {"hnsw.ef_search": 100}
+    assert default_ef == {"ivfflat.probes": 8}
+    # One statement for the batch, with the widest tuning any query asked for.
+    assert batch[1][2] == [{}, {"source": "docs"}, {}]
+    assert batch[2] == {"hnsw.ef_search": 100, "ivfflat.probes": 8}
+
+
+def test_ann_tuning_is_bounded():
+    with pytest.raises(ValidationError):
+        RAGSearchRequest(query="a", ef_search=0)
+    with pytest.raises(ValidationError):
+        RAGSearchRequest(query="a", probes=100_000)
+
+
+def test_index_statements_build_one_ann_kind_and_drop_the_other():
+    statements = index_statements(Settings(rag_index_type="hnsw", rag_hnsw_m=8))
+    assert "USING gin (metadata jsonb_path_ops)" in statements[0]
+    assert "documents_embedding_hnsw" in statements[1]
+    assert "WITH (m = 8, ef_construction = 64)" in statements[1]
+    assert statements[2].endswith("IF EXISTS documents_embedding_ivfflat")
+
+
+def test_index_type_none_leaves_the_database_alone():
+    # Would fail to connect if it tried to run any DDL.
+    asyncio.run(ensure_indexes(Settings(database_url="postgresql://invalid")))
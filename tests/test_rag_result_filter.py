@@ -0,0 +1,135 @@
+"""Tests for bulk post-retrieval policy filtering of RAG results."""
+
+import asyncio
+
+from app.config import Settings
+from app.models.rag import RAGSearchRequest
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.services.rag_service import RAGService
+
+# Only every fourth row (n % 4 == 0) is visible to tenant "acme".
+METADATA = [
+    {"tenant_id": "acme"},
+    {"tenant_id": "acme", "classification": "restricted"},
+    {"tenant_id": "other"},
+    {"tenant_id": "other", "classification": "restricted"},
+]
+
+
+class RecordingBackend(EmbeddedPolicyBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list = []
+
+    async def query_many(self, queries, *, provenance=False):
+        self.batches.append([path for path, _ in queries])
+        return await super().query_many(queries, provenance=provenance)
+
+
+def _rows(top_k: int, position: int = 1) -> list:
+    return [
+        {
+            "query_index": position,
+            "id": str(row),
+            "content": f"doc {row}",
+            "metadata": METADATA[row % 4],
+            "score": 1.0 - row / 100,
+        }
+        for row in range(top_k)
+    ]
+
+
+class FilteringRAGService(RAGService):
+    def __init__(self, settings: Settings, backend: RecordingBackend) -> None:
+        super().__init__(settings, OPAClient("http://unused", backend=backend))
+        self.fetched: list = []
+
+    async def _fetch_pgvector(self, request, embedding, top_k):
+        self.fetched.append(top_k)
+        return _rows(min(top_k, 30))
+
+    async def _fetch_pgvector_many(self, requests, embeddings, top_ks):
+        self.fetched.append(list(top_ks))
+        return [
+            row
+            for position, top_k in enumerate(top_ks, 1)
+            for row in _rows(top_k, position)
+        ]
+
+
+def _settings(**overrides) -> Settings:
+    values = {
+        "rag_result_policy": "rag/results",
+        "rag_result_overfetch": 3,
+        "rag_result_max_candidates": 24,
+    }
+    return Settings(**{**values, **overrides})
+
+
+def test_denied_rows_are_removed_with_one_policy_call():
+    backend = RecordingBackend()
+    service = FilteringRAGService(_settings(), backend)
+    request = RAGSearchRequest(query="q", top_k=2)
+
+    response = asyncio.run(service.search(request, tenant_id="acme"))
+
+    # 6 candidates: rows 0 and 4 are visible to acme. Of the 2 nearest, only
+    # row 1 was withheld; rows 2, 3 and 5 were over-fetched and not counted.
+    assert service.fetched == [6]
+    assert [r.id for r in response.results] == ["0", "4"]
+    assert response.filtered == 1
+    assert backend.batches == [["rag/results"]]
+    assert service.result_filter_stats() == {"checked": 6, "filtered": 1}
+
+
+def test_candidates_widen_until_top_k_rows_survive():
+    service = FilteringRAGService(_settings(), RecordingBackend())
+
+    response = asyncio.run(
+        service.search(RAGSearchRequest(query="q", top_k=3), tenant_id="acme")
+    )
+    assert service.fetched == [9]
+    assert [r.id for r in response.results] == ["0", "4", "8"]
+
+    # 15 candidates leave 4 visible rows, so the window doubles (capped at 24).
+    service.fetched.clear()
+    response = asyncio.run(
+        service.search(RAGSearchRequest(query="q", top_k=5), tenant_id="acme")
+    )
+    assert service.fetched == [15, 24]
+    assert [r.id for r in response.results] == ["0", "4", "8", "12", "16"]
+    assert response.filtered == 3
+
+
+def test_batch_filters_every_query_in_one_policy_call():
+    backend = RecordingBackend()
+    service = FilteringRAGService(_settings(), backend)
+    requests = [
+        RAGSearchRequest(query="a", top_k=1, embedding=[0.1] * 6),
+        RAGSearchRequest(query="b", top_k=2, embedding=[0.2] * 6),
+    ]
+
+    response = asyncio.run(service.search_many(requests, tenant_id="acme"))
+
+    assert service.fetched == [[3, 6]]
+    assert [[r.id for r in item.results] for item in response.results] == [
+        ["0"],
+        ["0", "4"],
+    ]
+    assert [item.filtered for item in response.results] == [0, 1]
+    assert backend.batches == [["rag/allow", "rag/allow"], ["rag/results"] * 2]
+
+
+def test_missing_result_policy_withholds_every_row():
+    settings = _settings(
+        rag_result_policy="missing/results", rag_result_max_candidates=4
+    )
+    service = FilteringRAGService(settings, RecordingBackend())
+    request = RAGSearchRequest(query="q", top_k=2)
+
+    response = asyncio.run(service.search(request, tenant_id="acme"))
+
+    assert response.results == []
+    assert service.fetched == [4]
+    assert response.filtered == 2
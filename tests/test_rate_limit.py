@@ -0,0 +1,119 @@
+"""Tests for per-tenant rate limiting and token budgets."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.container import get_agent_service, get_rate_limiter
+from app.main import app
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.rate_limit import MemoryBucketBackend, RateLimiter
+from app.services.agent_service import AgentService
+from app.services.exceptions import RateLimitedError
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_request_bucket_refills_per_tenant():
+    """Each tenant gets its own burst, refilled at the configured rate."""
+    clock = FakeClock()
+    limiter = RateLimiter(
+        Settings(rate_limit_requests_per_second=0.5, rate_limit_burst=2),
+        MemoryBucketBackend(clock=clock),
+    )
+
+    async def run():
+        await limiter.admit("a")
+        await limiter.admit("a")
+        await limiter.admit("b")
+        with pytest.raises(RateLimitedError) as excinfo:
+            await limiter.admit("a")
+        assert excinfo.value.retry_after == 2
+        clock.now = 2.0
+        quota = await limiter.admit("a")
+        assert quota.requests_remaining == 0
+
+    asyncio.run(run())
+    assert limiter.stats() == {"allowed": 4, "limited": 1}
+
+
+def test_token_budget_is_charged_from_usage():
+    """Charged usage drains the budget until the tenant is refused."""
+    limiter = RateLimiter(
+        Settings(llm_token_budget=100, llm_token_budget_period=3600),
+        MemoryBucketBackend(clock=FakeClock()),
+    )
+
+    async def run():
+        quota = await limiter.admit("a", llm=True)
+        assert quota.as_context() == {"tenant_id": "a", "tokens_remaining": 100}
+        await quota.charge_tokens(150)
+        assert quota.tokens_remaining == -50
+        with pytest.raises(RateLimitedError):
+            await limiter.admit("a", llm=True)
+        await limiter.admit("b", llm=True)
+        # Other routes are not gated by the LLM budget.
+        assert (await limiter.admit("a")).tokens_remaining is None
+
+    asyncio.run(run())
+
+
+def test_route_returns_429_before_backends():
+    """An exhausted tenant is rejected with Retry-After on every route."""
+    limiter = RateLimiter(
+        Settings(rate_limit_requests_per_second=1, rate_limit_burst=1),
+        MemoryBucketBackend(clock=FakeClock()),
+    )
+    asyncio.run(limiter.admit("alice"))
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    try:
+        response = TestClient(app).post(
+            "/v1/rag/search_safe",
+            json={"query": "hi"},
+            headers={"X-ASB-User-Id": "alice"},
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_exhausted_token_budget_only_blocks_llm_routes():
+    limiter = RateLimiter(
+        Settings(llm_token_budget=100, llm_token_budget_period=3600),
+        MemoryBucketBackend(clock=FakeClock()),
+    )
+    asyncio.run(limiter.charge_tokens("alice", 150))
+    service = AgentService(
+        Settings(), OPAClient("http://unused", backend=EmbeddedPolicyBackend())
+    )
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+    app.dependency_overrides[get_agent_service] = lambda: service
+    headers = {"X-ASB-User-Id": "alice"}
+    try:
+        client = TestClient(app)
+        chat = client.post(
+            "/v1/chat/completions",
+            json={"model": "m", "messages": [{"role": "user", "content": "hi"}]},
+            headers=headers,
+        )
+        agent = client.post(
+            "/v1/agent/action/execute", json={"tool": "ping"}, headers=headers
+        )
+    finally:
+        app.dependency_overrides.clear()
+        service.close()
+
+    assert chat.status_code == 429
+    assert chat.json()["detail"]["message"] == "LLM token budget exhausted"
+    assert agent.status_code == 200
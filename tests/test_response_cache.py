@@ -0,0 +1,123 @@
+"""Tests for the chat completion response cache."""
+
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.container import get_opa_client, get_response_cache, get_upstream_pool
+from app.main import app
+from app.models.llm import ChatCompletionRequest, ChatMessage
+from app.opa_client import OPAClient
+from app.response_cache import MemoryResponseStore, ResponseCache, SQLiteResponseStore
+from app.upstream import UpstreamClientPool
+
+
+class SwitchablePolicy:
+    """Policy backend whose verdict can be flipped between requests."""
+
+    def __init__(self) -> None:
+        self.allow = True
+        self.calls = 0
+
+    async def query(self, policy_path, input_doc, *, provenance=False):
+        self.calls += 1
+        return {"result": {"allow": self.allow, "reason": "denied in test"}}
+
+    async def query_many(self, queries, *, provenance=False):
+        raise NotImplementedError
+
+    async def close(self):
+        return None
+
+
+def _request(temperature=0.0, content="hi") -> ChatCompletionRequest:
+    return ChatCompletionRequest(
+        model="m",
+        messages=[ChatMessage(role="user", content=content)],
+        temperature=temperature,
+    )
+
+
+def test_key_is_isolated_per_tenant():
+    """Identical prompts from different tenants must not share entries."""
+    request = _request()
+    assert ResponseCache.key(request, "a") == ResponseCache.key(_request(), "a")
+    assert ResponseCache.key(request, "a") != ResponseCache.key(request, "b")
+    assert ResponseCache.key(request, "a") != ResponseCache.key(
+        _request(content="other"), "a"
+    )
+    assert ResponseCache.cacheable(request)
+    assert not ResponseCache.cacheable(_request(temperature=0.7))
+
+
+def test_sqlite_store_round_trip_and_eviction(tmp_path):
+    """The on-disk store should persist values and evict least recently used."""
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def run():
+        store = SQLiteResponseStore(path, max_entries=2, ttl_seconds=60)
+        await store.set("a", b"1")
+        await store.set("b", b"2")
+        assert await store.get("a") == b"1"
+        await store.set("c", b"3")
+        await store.close()
+        reopened = SQLiteResponseStore(path, max_entries=2, ttl_seconds=60)
+        values = [await reopened.get(key) for key in ("a", "b", "c")]
+        await reopened.close()
+        return values
+
+    assert asyncio.run(run()) == [b"1", None, b"3"]
+
+
+def test_route_serves_hits_only_after_policy_check():
+    """Second identical request is a HIT, but a deny still wins over the cache."""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "id": "up-1",
+                "model": "m",
+                "choices": [{"index": 0, "message": {"content": "pong"}}],
+            },
+        )
+
+    settings = Settings(openai_api_key="test", openai_base_url="http://upstream")
+    policy = SwitchablePolicy()
+    cache = ResponseCache(MemoryResponseStore(max_entries=10, ttl_seconds=60))
+    pool = UpstreamClientPool(settings, transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.dependency_overrides[get_upstream_pool] = lambda: pool
+    app.dependency_overrides[get_opa_client] = lambda: OPAClient(
+        "http://opa", backend=policy
+    )
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    payload = {
+        "model": "m",
+        "messages": [{"role": "user", "content": "hi"}],
+        "temperature": 0,
+    }
+    client = TestClient(app)
+    try:
+        first = client.post("/v1/chat/completions", json=payload)
+        second = client.post("/v1/chat/completions", json=payload)
+        bypass = client.post(
+            "/v1/chat/completions", json={**payload, "temperature": 0.5}
+        )
+        policy.allow = False
+        denied = client.post("/v1/chat/completions", json=payload)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert first.headers["X-ASB-Cache"] == "MISS"
+    assert second.headers["X-ASB-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert bypass.headers["X-ASB-Cache"] == "BYPASS"
+    assert denied.status_code == 403
+    assert len(upstream_calls) == 2
+    assert policy.calls == 4
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,78 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    """Identical concurrent calls should run once and fan out the result."""
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats()["coalesced"] == 4
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter():
+    """An upstream failure should be raised to the leader and all waiters."""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["errors"] == 1
+
+
+def test_waiter_cap_and_leader_cancellation():
+    """Extra callers over the cap run alone; a cancelled leader spares waiters."""
+    flights = SingleFlight(max_waiters=1)
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        call_number = calls
+        await asyncio.sleep(0.02)
+        return call_number
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flights.do("k", work))
+        overflow = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter, await overflow
+
+    waiter_result, _ = asyncio.run(run())
+
+    assert calls == 2
+    assert waiter_result == 1
+    assert flights.stats()["overflow"] == 1
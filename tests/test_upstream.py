@@ -0,0 +1,37 @@
+"""Tests for the shared upstream client pool."""
+
+import asyncio
+
+from app.config import Settings
+from app.upstream import UpstreamClientPool
+
+
+def test_pool_reuses_client_per_origin():
+    """The same origin should always map to the same pooled client."""
+    pool = UpstreamClientPool(Settings())
+
+    first = pool.get("https://api.example.com/")
+    second = pool.get("https://api.example.com")
+    other = pool.get("https://other.example.com")
+
+    assert first is second
+    assert first is not other
+    asyncio.run(pool.close())
+    assert first.is_closed and other.is_closed
+
+
+def test_pool_applies_per_upstream_limits():
+    """Per-upstream overrides should cap the connection pool size."""
+    settings = Settings(
+        upstream_max_connections=50,
+        upstream_max_keepalive_connections=20,
+        upstream_pool_limits={"https://small.example.com": 4},
+    )
+    pool = UpstreamClientPool(settings)
+
+    small = pool.get("https://small.example.com")
+    pool_limits = small._transport._pool  # type: ignore[attr-defined]
+
+    assert pool_limits._max_connections == 4
+    assert pool_limits._max_keepalive_connections == 4
+    asyncio.run(pool.close())
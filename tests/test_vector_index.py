@@ -0,0 +1,162 @@
+"""Tests for the snapshot-backed local vector index and RAG degraded mode."""
+
+import asyncio
+import json
+import math
+import os
+import struct
+
+import pytest
+
+from app.config import Settings
+from app.models.rag import RAGBatchSearchRequest, RAGSearchRequest
+from app.opa_client import OPAClient
+from app.policy_engine import EmbeddedPolicyBackend
+from app.services.rag_service import RAGService
+from app.vector_index import (
+    BruteForceIndex,
+    NumpyIndex,
+    export_snapshot,
+    load_index,
+    np,
+    write_snapshot,
+)
+
+DATABASE_URL = os.environ.get("ASB_TEST_DATABASE_URL")
+
+DOCUMENTS = [
+    {"id": 1, "content": "x", "metadata": {"source": "a"}, "embedding": [1, 0, 0]},
+    {"id": 2, "content": "xy", "metadata": {"source": "b"}, "embedding": [2, 1, 0]},
+    {"id": 3, "content": "y", "metadata": {"source": "a"}, "embedding": [0, 3, 0]},
+    {"id": 4, "content": "z", "metadata": {}, "embedding": [0, 0, 1]},
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "documents.asbvec")
+    assert write_snapshot(path, DOCUMENTS) == 4
+    return path
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+
+
+@pytest.mark.parametrize("kind", [BruteForceIndex, NumpyIndex])
+def test_search_ranks_by_cosine_and_applies_filters(snapshot, kind, monkeypatch):
+    if kind is NumpyIndex and np is None:
+        pytest.skip("numpy not installed")
+    if kind is BruteForceIndex:
+        monkeypatch.setattr("app.vector_index.np", None)
+    index = load_index(snapshot)
+    assert type(index) is kind
+
+    query = [1.0, 0.2, 0.0]
+    results = index.search(query, 3)
+    assert [r.id for r in results] == ["1", "2", "3"]
+    for result, document in zip(results, DOCUMENTS):
+        assert result.score == pytest.approx(_cosine(query, document["embedding"]))
+
+    filtered = index.search(query, 5, {"source": "a"})
+    assert [r.id for r in filtered] == ["1", "3"]
+    assert filtered[0].metadata == {"source": "a"}
+    assert index.search(query, 5, {"source": "missing"}) == []
+    assert index.stats()["documents"] == 4
+
+    with pytest.raises(ValueError):
+        index.search([1.0, 0.0], 1)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        load_index(str(path))
+
+
+@pytest.mark.parametrize("size", [0, 10])
+def test_load_rejects_files_shorter_than_the_header(snapshot, tmp_path, size):
+    path = tmp_path / "short-header.asbvec"
+    path.write_bytes(open(snapshot, "rb").read()[:size])
+    with pytest.raises(ValueError, match="truncated"):
+        load_index(str(path))
+
+
+def test_load_rejects_truncated_or_corrupt_snapshots(snapshot, tmp_path):
+    data = open(snapshot, "rb").read()
+    truncated = tmp_path / "truncated.asbvec"
+    truncated.write_bytes(data[:40])
+    with pytest.raises(ValueError, match="truncated"):
+        load_index(str(truncated))
+
+    # Same header and vectors, one document dropped from the JSON payload.
+    docs_offset = struct.unpack_from("<8sIIQ", data)[3]
+    documents = json.loads(data[docs_offset:])[:3]
+    short = tmp_path / "short.asbvec"
+    short.write_bytes(data[:docs_offset] + json.dumps(documents).encode())
+    with pytest.raises(ValueError, match="expected 4"):
+        load_index(str(short))
+
+
+class FailingRAGService(RAGService):
+    def __init__(self, settings: Settings, index) -> None:
+        super().__init__(
+            settings,
+            OPAClient("http://unused", backend=EmbeddedPolicyBackend()),
+            local_index=index,
+        )
+        self.fetches = 0
+
+    async def _fetch(self, sql, args, tuning):
+        self.fetches += 1
+        raise ConnectionError("database down")
+
+
+def test_local_index_serves_searches_when_postgres_fails(snapshot):
+    service = FailingRAGService(Settings(), load_index(snapshot))
+    request = RAGSearchRequest(query="q", embedding=[0.0, 1.0, 0.0], top_k=2)
+
+    async def run():
+        single = await service.search(request)
+        batch = await service.search_many(
+            RAGBatchSearchRequest(queries=[request, request]).queries
+        )
+        return single, batch
+
+    single, batch = asyncio.run(run())
+    assert [r.id for r in single.results] == ["3", "2"]
+    assert [[r.id for r in item.results] for item in batch.results] == [
+        ["3", "2"],
+        ["3", "2"],
+    ]
+    assert service.fetches == 2
+
+
+def test_primary_mode_never_touches_postgres(snapshot):
+    service = FailingRAGService(
+        Settings(rag_local_index_mode="primary"), load_index(snapshot)
+    )
+    request = RAGSearchRequest(
+        query="q", embedding=[1.0, 0.0, 0.0], top_k=5, filters={"source": "b"}
+    )
+
+    async def run():
+        return await service.search(request), await service.search_many([request])
+
+    single, batch = asyncio.run(run())
+    assert [r.id for r in single.results] == ["2"]
+    assert [r.id for r in batch.results[0].results] == ["2"]
+    assert service.fetches == 0
+
+
+@pytest.mark.skipif(DATABASE_URL is None, reason="ASB_TEST_DATABASE_URL not set")
+def test_export_snapshot_round_trips_the_documents_table(tmp_path):
+    """Needs a database initialised with docker/init."""
+    path = str(tmp_path / "documents.asbvec")
+    count = asyncio.run(export_snapshot(Settings(database_url=DATABASE_URL), path))
+    index = load_index(path)
+    assert count > 0
+    assert index.stats()["documents"] == count
+    assert index.search([1.0] * index.stats()["dims"], 1)